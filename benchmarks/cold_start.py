@@ -0,0 +1,130 @@
+"""Cold start benchmark of model artifacts.
+
+Trains per-station models on synthetic data shaped like the real datasets, dumps
+them with several compression settings and loads each one in a fresh process,
+reporting artifact size, load time, time to the first prediction and peak RSS
+before and after loading.
+
+Run with `python benchmarks/cold_start.py --help`.
+"""
+import os
+import json
+import time
+import resource
+import tempfile
+import multiprocessing
+from typing import Any, Dict, List, Tuple, Union, Optional
+
+import typer
+import joblib
+import pandas as pd
+
+from frame.config import JOBLIB_COMPRESSION
+from frame.train.eta import ETA_NUM_FEATURES
+from frame.constants import SERVING_JOBLIB_COMPRESSION
+from frame.train.synthetic import make_dataset, fit_eta_pipeline
+
+app = typer.Typer()
+
+SETTINGS: Dict[str, Union[int, Tuple[str, int]]] = {
+    "lzma-3": JOBLIB_COMPRESSION,
+    "lzma-1": ("lzma", 1),
+    "zlib-3": ("zlib", 3),
+    "zlib-1": ("zlib", 1),
+    "uncompressed": SERVING_JOBLIB_COMPRESSION,
+}
+
+
+def _rss_kb() -> int:
+    """Peak RSS of this process, in KB.
+
+    `ru_maxrss` is carried over from the parent on Linux, so the high water mark of
+    the process memory is read instead when available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _load(path: str, row: Dict[str, List[Any]], results: Any) -> None:
+    rss_before = _rss_kb()
+    start = time.perf_counter()
+    pipeline = joblib.load(path)
+    loaded = time.perf_counter()
+    pipeline.predict(pd.DataFrame(row))
+    predicted = time.perf_counter()
+    results.put(
+        {
+            "load_seconds": loaded - start,
+            "first_prediction_seconds": predicted - start,
+            "baseline_rss_mb": rss_before / 1024,
+            "peak_rss_mb": _rss_kb() / 1024,
+        }
+    )
+
+
+def measure(path: str, row: Dict[str, List[Any]], repeat: int) -> Dict[str, float]:
+    """Load an artifact in fresh processes, keeping the best of each measure."""
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        results = ctx.Queue()
+        process = ctx.Process(target=_load, args=(path, row, results))
+        process.start()
+        runs.append(results.get())
+        process.join()
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+@app.command()
+def main(
+    n_stations: int = typer.Option(400, help="Amount of per-station models"),
+    n_rows: int = typer.Option(400_000, help="Amount of training rows"),
+    repeat: int = typer.Option(3, help="Loads per setting, the best one is kept"),
+    output: Optional[str] = typer.Option(None, help="Write results as JSON here"),
+):
+    dataset = make_dataset(n_rows, n_stations)
+    typer.echo(f"Training {n_stations} per-station models on {n_rows} rows")
+    pipeline = fit_eta_pipeline(dataset)
+    row = {
+        col: [value]
+        for col, value in dataset[
+            ["station_id", "hod", "dow", "is_holiday", *ETA_NUM_FEATURES]
+        ]
+        .iloc[0]
+        .items()
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, compress in SETTINGS.items():
+            path = os.path.join(tmp_dir, f"{name}.joblib")
+            joblib.dump(pipeline, path, compress=compress)
+            results[name] = {
+                "size_mb": os.path.getsize(path) / 1024**2,
+                **measure(path, row, repeat),
+            }
+
+    typer.echo(
+        f"{'setting':<14}{'size MB':>10}{'load s':>10}{'first pred s':>14}"
+        f"{'baseline RSS MB':>17}{'peak RSS MB':>13}"
+    )
+    for name, result in results.items():
+        typer.echo(
+            f"{name:<14}{result['size_mb']:>10.1f}{result['load_seconds']:>10.3f}"
+            f"{result['first_prediction_seconds']:>14.3f}"
+            f"{result['baseline_rss_mb']:>17.1f}{result['peak_rss_mb']:>13.1f}"
+        )
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    app()
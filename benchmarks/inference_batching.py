@@ -0,0 +1,98 @@
+"""Throughput and latency of single row predictions, with and without batching.
+
+Trains small models on synthetic data, then has a number of threads predict for
+distinct rows through `LoadedModel.predict`, as concurrent requests do, with the
+predictions cache disabled. Reports predictions per second and latency
+percentiles at each concurrency, scoring each row on its own and through an
+`InferenceBatcher`.
+
+Run with `python benchmarks/inference_batching.py --help`.
+"""
+import json
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+import typer
+import numpy as np
+
+from frame.constants import FrameModels
+from frame.api.batching import InferenceBatcher
+from frame.api.dependencies import LoadedModel, MLFlowPredictor
+from frame.train.synthetic import make_dataset, fit_availability_pipeline
+
+app = typer.Typer()
+
+
+def load_model(batcher: Optional[InferenceBatcher]) -> LoadedModel:
+    pipeline = fit_availability_pipeline(make_dataset(40_000, 400))
+    predictor = MLFlowPredictor(
+        FrameModels.AVAILABILITY, probabilistic=True, cache_size=0, batcher=batcher
+    )
+    return predictor.load(pipeline, 1)
+
+
+def run_threads(
+    model: LoadedModel, rows: List[Dict[str, Any]], concurrency: int
+) -> Dict[str, float]:
+    """Predict for every row from concurrency threads, timing each call."""
+    latencies: List[float] = []
+    lock = threading.Lock()
+    chunks = [rows[i::concurrency] for i in range(concurrency)]
+
+    def worker(chunk: List[Dict[str, Any]]) -> None:
+        times = []
+        for row in chunk:
+            start = time.perf_counter()
+            model.predict(**row)
+            times.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(times)
+
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return {"rps": len(rows) / elapsed, "p50_ms": p50, "p99_ms": p99}
+
+
+@app.command()
+def main(
+    concurrency: List[int] = typer.Option([1, 8, 32], help="Threads predicting"),
+    rows: int = typer.Option(4000, help="Predictions per run"),
+    window: float = typer.Option(0.002, help="Batching window, in seconds"),
+    max_batch_size: int = typer.Option(32, help="Max rows per batch"),
+    output: Optional[str] = typer.Option(None, help="Write results as JSON here"),
+):
+    batcher = InferenceBatcher(window=window, max_batch_size=max_batch_size)
+    models = {"unbatched": load_model(None), "batched": load_model(batcher)}
+    features = models["unbatched"].pipeline.feature_names_in_
+    dataset = make_dataset(rows, 400, seed=1)[features]
+    X = dataset.to_dict("records")
+
+    batcher.start()
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    typer.echo(f"{'mode':<12}{'threads':>8}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for n_threads in concurrency:
+        for mode, model in models.items():
+            result = run_threads(model, X, n_threads)
+            results.setdefault(mode, {})[str(n_threads)] = result
+            typer.echo(
+                f"{mode:<12}{n_threads:>8}{result['rps']:>10.0f}"
+                f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            )
+    batcher.stop()
+    typer.echo(f"Mean batch size {batcher.stats()['mean_batch_size']:.1f}")
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    app()
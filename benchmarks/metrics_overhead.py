@@ -0,0 +1,70 @@
+"""Overhead of recording metrics.
+
+Times the operations done on the request path, a histogram observation, a timed
+block and a counter increment, against an empty block, plus the cost of rendering
+the `/metrics` page. A single prediction records 5 to 6 of these.
+
+Run with `python benchmarks/metrics_overhead.py --help`.
+"""
+import json
+import timeit
+import contextlib
+from typing import Dict, Callable, Optional
+
+import typer
+
+from frame.api.metrics import Counter, Histogram, MetricsRegistry
+
+app = typer.Typer()
+
+
+def best_ns(stmt: Callable[[], None], number: int, repeat: int) -> float:
+    """Best time per call of `stmt`, in nanoseconds."""
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number * 1e9
+
+
+@app.command()
+def main(
+    number: int = typer.Option(200_000, help="Calls per timing"),
+    repeat: int = typer.Option(5, help="Timings per operation, the best one is kept"),
+    series: int = typer.Option(200, help="Label combinations rendered"),
+    output: Optional[str] = typer.Option(None, help="Write results as JSON here"),
+):
+    registry = MetricsRegistry()
+    histogram = Histogram("phase_seconds", "Phases.", ("phase",), registry=registry)
+    counter = Counter("requests", "Requests.", ("cache", "result"), registry=registry)
+    child = histogram.labels("status_read")
+
+    def empty_block():
+        with contextlib.nullcontext():
+            pass
+
+    def timed_block():
+        with histogram.labels("status_read").time():
+            pass
+
+    operations: Dict[str, Callable[[], None]] = {
+        "empty block": empty_block,
+        "observe": lambda: child.observe(0.003),
+        "labels + observe": lambda: histogram.labels("status_read").observe(0.003),
+        "labels + timed block": timed_block,
+        "labels + counter inc": lambda: counter.labels("grid", "hit").inc(),
+    }
+    results = {name: best_ns(stmt, number, repeat) for name, stmt in operations.items()}
+
+    for i in range(series):
+        histogram.labels(f"phase_{i}").observe(0.001 * i)
+    results["render"] = best_ns(registry.render, 10, repeat)
+
+    typer.echo(f"{'operation':<24}{'ns/op':>14}")
+    for name, ns in results.items():
+        typer.echo(f"{name:<24}{ns:>14.0f}")
+    typer.echo(f"render covers {series} histogram series")
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    app()
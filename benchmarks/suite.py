@@ -0,0 +1,297 @@
+"""Microbenchmarks of the hot paths.
+
+Each benchmark builds its fixtures from synthetic data for about 400 stations,
+then is timed with `timeit`: calls are batched until a batch takes at least
+0.2 seconds, and the best and median time per call over `--repeat` batches are
+kept. Results are stored as JSON under `benchmarks/results/`, named after the
+commit, and `compare` flags the benchmarks that got slower than a baseline, such
+as the reference run in `benchmarks/results/baseline.json`.
+
+Run with `python benchmarks/suite.py run --help`.
+"""
+import sys
+import json
+import time
+import timeit
+import platform
+import functools
+import statistics
+import subprocess
+from pathlib import Path
+from unittest import mock
+from datetime import datetime
+from typing import Any, Dict, List, Tuple, Callable, Optional
+
+import typer
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import Session, sessionmaker
+
+from frame.models import Station
+from frame.models.base import Base
+from frame.constants import FrameModels
+from frame.train.enrich import add_holidays
+from frame.api.dependencies import MLFlowPredictor
+from frame.api.schemas.stations import PredictionParams
+from frame.api.services import stations as station_service
+from frame.train.availability import (
+    DEFAULT_MINUTES_TO_EVAL_AVAILABILITY,
+    postprocess_dataset_availability,
+)
+from frame.train.synthetic import (
+    make_dataset,
+    fit_eta_pipeline,
+    make_stations_info,
+    make_stations_status,
+    make_availability_rows,
+    fit_availability_pipeline,
+)
+
+app = typer.Typer()
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+N_STATIONS = 400
+TRAIN_ROWS = 40_000
+
+Setup = Callable[[float], Callable[[], Any]]
+BENCHMARKS: Dict[str, Setup] = {}
+
+
+def benchmark(name: str) -> Callable[[Setup], Setup]:
+    """Register a benchmark.
+
+    The decorated function takes the scale of the fixtures and returns the callable
+    to time.
+    """
+
+    def register(setup: Setup) -> Setup:
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+@functools.lru_cache(maxsize=None)
+def pipelines() -> Tuple[Any, Any]:
+    dataset = make_dataset(TRAIN_ROWS, N_STATIONS)
+    return fit_eta_pipeline(dataset), fit_availability_pipeline(dataset)
+
+
+def make_db() -> Session:
+    """An in-memory SQLite DB with the synthetic stations."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    columns = Station.__table__.columns.keys()
+    db.bulk_insert_mappings(
+        Station,
+        [
+            {col: station[col] for col in columns if col in station}
+            for station in make_stations_info(N_STATIONS)
+        ],
+    )
+    db.commit()
+    return db
+
+
+def stations_status(seed: int) -> List[Dict[str, Any]]:
+    """Synthetic status, with station ids parsed as `fetch_stations_status` does."""
+    status = make_stations_status(N_STATIONS, seed=seed)
+    for station_status in status:
+        station_status["station_id"] = int(station_status["station_id"])
+    return status
+
+
+def make_predictor(model: FrameModels, compiled: bool = True) -> MLFlowPredictor:
+    """A predictor with a trained model and no predictions cache."""
+    eta_pipeline, availability_pipeline = pipelines()
+    probabilistic = model == FrameModels.AVAILABILITY
+    predictor = MLFlowPredictor(
+        model, probabilistic=probabilistic, compile_pipeline=compiled, cache_size=0
+    )
+    pipeline = availability_pipeline if probabilistic else eta_pipeline
+    predictor.publish(predictor.load(pipeline, 1))
+    return predictor
+
+
+@benchmark("station_service.predict")
+def bench_service_predict(scale: float):
+    db = make_db()
+    with mock.patch.object(
+        station_service, "fetch_stations_status", lambda: stations_status(0)
+    ):
+        station_service.update_stations_status(db)
+    eta_predictor = make_predictor(FrameModels.ETA)
+    availability_predictor = make_predictor(FrameModels.AVAILABILITY)
+    params = PredictionParams(user_eta=5, user_lat=-34.6, user_lon=-58.4)
+    station_ids = iter(np.random.default_rng(0).integers(1, N_STATIONS + 1, 10**7))
+
+    def predict():
+        station_service.predict(
+            int(next(station_ids)), params, db, eta_predictor, availability_predictor
+        )
+
+    return predict
+
+
+def predictor_row(predictor: MLFlowPredictor) -> Dict[str, Any]:
+    dataset = make_dataset(1, N_STATIONS, seed=1)
+    features = predictor.pipeline.feature_names_in_
+    return {col: dataset[col].iloc[0].item() for col in features}
+
+
+@benchmark("MLFlowPredictor.predict[compiled]")
+def bench_predictor_compiled(scale: float):
+    predictor = make_predictor(FrameModels.AVAILABILITY)
+    row = predictor_row(predictor)
+    return lambda: predictor.predict(**row)
+
+
+@benchmark("MLFlowPredictor.predict[pipeline]")
+def bench_predictor_pipeline(scale: float):
+    predictor = make_predictor(FrameModels.AVAILABILITY, compiled=False)
+    row = predictor_row(predictor)
+    return lambda: predictor.predict(**row)
+
+
+@benchmark("PartitionedMetaEstimator.fit")
+def bench_meta_fit(scale: float):
+    dataset = make_dataset(int(TRAIN_ROWS * scale), N_STATIONS)
+    return lambda: fit_eta_pipeline(dataset)
+
+
+@benchmark("PartitionedMetaEstimator.predict")
+def bench_meta_predict(scale: float):
+    eta_pipeline, _ = pipelines()
+    X = make_dataset(int(N_STATIONS * 10 * scale), N_STATIONS, seed=1)
+    X = X[eta_pipeline.feature_names_in_]
+    return lambda: eta_pipeline.predict(X)
+
+
+@benchmark("PartitionedMetaEstimator.predict_proba")
+def bench_meta_predict_proba(scale: float):
+    _, availability_pipeline = pipelines()
+    X = make_dataset(int(N_STATIONS * 10 * scale), N_STATIONS, seed=1)
+    X = X[availability_pipeline.feature_names_in_]
+    return lambda: availability_pipeline.predict_proba(X)
+
+
+@benchmark("update_stations_status[sqlite]")
+def bench_update_stations_status(scale: float):
+    db = make_db()
+    feeds = [stations_status(seed) for seed in range(2)]
+    calls = iter(range(10**9))
+
+    def update():
+        feed = feeds[next(calls) % 2]
+        with mock.patch.object(station_service, "fetch_stations_status", lambda: feed):
+            station_service.update_stations_status(db)
+
+    update()
+    return update
+
+
+@benchmark("postprocess_dataset_availability")
+def bench_postprocess_availability(scale: float):
+    rows = make_availability_rows(
+        int(200_000 * scale), N_STATIONS, DEFAULT_MINUTES_TO_EVAL_AVAILABILITY
+    )
+    return lambda: postprocess_dataset_availability(rows.copy())
+
+
+@benchmark("add_holidays")
+def bench_add_holidays(scale: float):
+    rows = make_availability_rows(int(1_000_000 * scale), N_STATIONS, [])
+    return lambda: add_holidays(rows)
+
+
+def time_benchmark(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "best_seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@app.command()
+def run(
+    only: Optional[str] = typer.Option(None, help="Run benchmarks containing this"),
+    repeat: int = typer.Option(5, help="Timed batches per benchmark"),
+    scale: float = typer.Option(1.0, help="Scale of the fixtures row counts"),
+    output: Optional[Path] = typer.Option(None, help="Defaults to results/<commit>"),
+):
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if only is not None and only not in name:
+            continue
+        start = time.perf_counter()
+        fn = setup(scale)
+        setup_seconds = time.perf_counter() - start
+        results[name] = time_benchmark(fn, repeat)
+        typer.echo(
+            f"{name:<40}{results[name]['best_seconds'] * 1e3:>12.3f} ms"
+            f"{results[name]['median_seconds'] * 1e3:>12.3f} ms"
+            f"   (setup {setup_seconds:.1f}s)"
+        )
+
+    commit = git_commit()
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{commit}.json"
+    report = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "machine": platform.platform(),
+        "scale": scale,
+        "results": results,
+    }
+    output.write_text(json.dumps(report, indent=4) + "\n")
+    typer.echo(f"Results written to {output}")
+
+
+@app.command()
+def compare(
+    baseline: Path = typer.Argument(..., help="Results of the baseline"),
+    candidate: Path = typer.Argument(..., help="Results to compare"),
+    threshold: float = typer.Option(0.1, help="Slowdown flagged as a regression"),
+):
+    """Compare best times, exiting with an error if any benchmark regressed."""
+    base = json.loads(baseline.read_text())["results"]
+    cand = json.loads(candidate.read_text())["results"]
+    regressions = []
+    for name in cand.keys() & base.keys():
+        ratio = cand[name]["best_seconds"] / base[name]["best_seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        typer.echo(f"{name:<40}{ratio:>8.2f}x{flag}")
+    if regressions:
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
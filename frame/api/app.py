@@ -1,24 +1,143 @@
+import asyncio
+import threading
+from pathlib import Path
+from datetime import datetime
+from functools import partial
+from typing import Dict, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+
 import youconfigme as ycm
 from fastapi import FastAPI
+from sqlalchemy.orm import Session
 from redis import asyncio as aioredis
 from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
 from fastapi_utils.tasks import repeat_every
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
 from fastapi_cache.backends.redis import RedisBackend
 from fastapi_cache.backends.inmemory import InMemoryBackend
 
 from frame.config import cfg
 from frame import __version__
 from frame.utils import get_logger
-from frame.models.base import SessionLocal
-from frame.constants import MODEL_RELOAD_SECONDS
+from frame.ycm_casts import to_bool
+from frame.api.grid import current_grid
+from frame.api.responses import GZipMiddleware
+from frame.api.snapshot import current_snapshot
+from frame.api.history import init_status_history
+from frame.models.base import SessionLocal, engine
+from frame.api.prediction_writer import PredictionWriter
 from frame.api.services import stations as station_service
+from frame.data.datalake import connect as connect_datalake
+from frame.api.services.predictions import archive_predictions
+from frame.api.namespaces.metrics import router as metrics_router
 from frame.api.namespaces.stations import router as stations_router
-from frame.api.dependencies import ETAPredictor, AvailabilityPredictor
+from frame.api.leader import (
+    SignalFollower,
+    RefreshNotifier,
+    bump_signal,
+    make_leader_election,
+)
+from frame.api.metrics import (
+    REFRESH_DURATION,
+    CallbackMetric,
+    MetricsMiddleware,
+    record_refresh,
+    instrument_pool,
+)
+from frame.api.dependencies import (
+    ETAPredictor,
+    InferenceExecutor,
+    PredictionBatcher,
+    PredictionsWriter,
+    AvailabilityPredictor,
+)
+from frame.constants import (
+    MODEL_SIGNAL,
+    LEADER_LOCK_KEY,
+    LEADER_LOCK_FILE,
+    GRID_MAX_USER_ETA,
+    GRID_MIN_USER_ETA,
+    MODEL_RELOAD_SECONDS,
+    STATIONS_INFO_SIGNAL,
+    STATUS_HISTORY_HOURS,
+    STATIONS_STATUS_SIGNAL,
+    PREDICTION_RETENTION_DAYS,
+    ARCHIVE_PREDICTIONS_SECONDS,
+    STATUS_HISTORY_MAX_STATIONS,
+    REFRESH_STATIONS_STATUS_SECONDS,
+)
 
 logger = get_logger(__name__)
 
+PREDICTION_GRID = cfg.api.prediction_grid(default=True, cast=to_bool)
+PREDICTION_GRID_USER_ETAS = range(
+    cfg.api.grid_min_user_eta(default=GRID_MIN_USER_ETA, cast=int),
+    cfg.api.grid_max_user_eta(default=GRID_MAX_USER_ETA, cast=int) + 1,
+)
+REFRESH_STATIONS_STATUS = cfg.api.refresh_stations_status(
+    default=REFRESH_STATIONS_STATUS_SECONDS, cast=int
+)
+try:
+    REDIS_URL: Optional[str] = cfg.redis.url()
+except ycm.ConfigItemNotFound:
+    REDIS_URL = None
+ARCHIVE_PREDICTIONS = cfg.api.archive_predictions(default=False, cast=to_bool)
+PREDICTION_RETENTION = cfg.api.prediction_retention_days(
+    default=PREDICTION_RETENTION_DAYS, cast=int
+)
+HISTORY_HOURS = cfg.api.status_history_hours(default=STATUS_HISTORY_HOURS, cast=int)
+
+if HISTORY_HOURS > 0:
+    init_status_history(
+        capacity=HISTORY_HOURS * 3600 // REFRESH_STATIONS_STATUS,
+        max_stations=cfg.api.status_history_max_stations(
+            default=STATUS_HISTORY_MAX_STATIONS, cast=int
+        ),
+    )
+
+MODEL_RELOADER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-reload")
+
+LEADER = make_leader_election(
+    engine,
+    enabled=cfg.api.leader_election(default=True, cast=to_bool),
+    lock_key=LEADER_LOCK_KEY,
+    lock_file=cfg.api.leader_lock_file(default=LEADER_LOCK_FILE, cast=Path),
+)
+FOLLOWER = SignalFollower()
+FOLLOW_LOCK = threading.Lock()
+NOTIFIER = RefreshNotifier(REDIS_URL)
+
+
+def prediction_cache_requests() -> Dict[Tuple[str, str], float]:
+    requests = {}
+    for predictor in (ETAPredictor, AvailabilityPredictor):
+        if predictor.initialized:
+            cache = predictor.current().cache
+            requests[(predictor.model.value, "hit")] = cache.hits
+            requests[(predictor.model.value, "miss")] = cache.misses
+    return requests
+
+
+def model_reload_stats(stat: str) -> Dict[Tuple[str], float]:
+    values = {}
+    for predictor in (ETAPredictor, AvailabilityPredictor):
+        value = predictor.stats()[stat]
+        if value is not None:
+            values[(predictor.model.value,)] = value
+    return values
+
+
+def prediction_writer_queue_depth(writer: PredictionWriter) -> Dict[Tuple, float]:
+    return {(): writer.queue_depth}
+
+
+def prediction_writer_rows(writer: PredictionWriter) -> Dict[Tuple[str], float]:
+    stats = writer.stats()
+    return {(result,): stats[result] for result in ("written", "dropped", "failed")}
+
+
 app = FastAPI(
     title="Frame - BicisBA API",
     description="Stations, status and predictions for the EcoBici system in Buenos Aires.",
@@ -34,6 +153,51 @@ app.add_middleware(
 app.add_middleware(GZipMiddleware, minimum_size=256)
 app.include_router(stations_router)
 
+if cfg.api.metrics(default=True, cast=to_bool):
+    app.add_middleware(MetricsMiddleware, routes=app.routes)
+    app.include_router(metrics_router)
+    instrument_pool(engine)
+    CallbackMetric(
+        "frame_prediction_cache_requests",
+        "Lookups in the predictions cache of the current models, by result.",
+        callback=prediction_cache_requests,
+        labelnames=("model", "result"),
+        kind="counter",
+    )
+    CallbackMetric(
+        "frame_model_swaps",
+        "Models swapped in by reloads.",
+        callback=partial(model_reload_stats, "swaps"),
+        labelnames=("model",),
+        kind="counter",
+    )
+    CallbackMetric(
+        "frame_model_reload_failures",
+        "Reloads that failed and kept the current model.",
+        callback=partial(model_reload_stats, "failed"),
+        labelnames=("model",),
+        kind="counter",
+    )
+    CallbackMetric(
+        "frame_model_last_swap_timestamp_seconds",
+        "Unix time of the last model swap.",
+        callback=partial(model_reload_stats, "last_swap_at"),
+        labelnames=("model",),
+    )
+    if PredictionsWriter is not None:
+        CallbackMetric(
+            "frame_prediction_writer_queue_depth",
+            "Predictions buffered by the write-behind writer.",
+            callback=partial(prediction_writer_queue_depth, PredictionsWriter),
+        )
+        CallbackMetric(
+            "frame_prediction_writer_rows",
+            "Predictions handled by the write-behind writer, by result.",
+            callback=partial(prediction_writer_rows, PredictionsWriter),
+            labelnames=("result",),
+            kind="counter",
+        )
+
 
 @app.on_event("startup")
 @repeat_every(
@@ -42,23 +206,93 @@ app.include_router(stations_router)
     logger=logger,
 )
 def refresh_stations_info() -> None:
+    if not LEADER.try_acquire():
+        return
     logger.info("Refreshing stations info")
     db = SessionLocal()
-    station_service.update_stations_info(db)
+    with REFRESH_DURATION.labels("stations_info").time():
+        stats = station_service.update_stations_info(db)
+    record_refresh("stations_info", stats)
+    if stats.changed or stats.removed:
+        signal_refresh(db, STATIONS_INFO_SIGNAL)
     db.close()
 
 
 @app.on_event("startup")
 @repeat_every(
-    seconds=cfg.api.refresh_stations_status(default=30, cast=int),
+    seconds=REFRESH_STATIONS_STATUS,
     max_repetitions=None,
     logger=logger,
 )
 def refresh_stations_status() -> None:
-    logger.info("Refreshing stations status")
     db = SessionLocal()
-    station_service.update_stations_status(db)
+    if LEADER.try_acquire():
+        logger.info("Refreshing stations status")
+        with REFRESH_DURATION.labels("stations_status").time():
+            stats = station_service.update_stations_status(db)
+        record_refresh("stations_status", stats)
+        if stats.changed:
+            signal_refresh(db, STATIONS_STATUS_SIGNAL)
+    else:
+        follow_stations(db)
     db.close()
+    refresh_prediction_grid()
+
+
+def signal_refresh(db: Session, name: str) -> None:
+    """Let followers know some data was refreshed."""
+    bump_signal(db, name)
+    NOTIFIER.notify(name)
+
+
+def follow_stations(db: Session, record_history: bool = True) -> None:
+    """Load the stations info and status refreshed by the leader, if they changed."""
+    with FOLLOW_LOCK:
+        if FOLLOWER.changed(db, STATIONS_INFO_SIGNAL):
+            logger.info("Loading stations info refreshed by the leader")
+            station_service.load_stations_index(db)
+
+        snapshot = current_snapshot()
+        if FOLLOWER.changed(db, STATIONS_STATUS_SIGNAL) or snapshot is None:
+            logger.info("Loading stations status refreshed by the leader")
+            snapshot = station_service.load_stations_status_snapshot(db)
+    if record_history:
+        station_service.record_status_history(snapshot)
+
+
+def follow_notified_stations() -> None:
+    db = SessionLocal()
+    try:
+        follow_stations(db, record_history=False)
+    finally:
+        db.close()
+    refresh_prediction_grid()
+
+
+async def on_refresh_signal(name: str) -> None:
+    """Load what the leader just refreshed, instead of waiting for the next poll."""
+    if LEADER.is_leader:
+        return
+    logger.info("Leader signaled %s", name)
+    if name in (STATIONS_INFO_SIGNAL, STATIONS_STATUS_SIGNAL):
+        await run_in_threadpool(follow_notified_stations)
+    else:
+        await asyncio.wrap_future(MODEL_RELOADER.submit(reload_models))
+
+
+@app.on_event("startup")
+async def listen_refresh_signals() -> None:
+    if NOTIFIER.enabled:
+        app.state.refresh_listener = asyncio.create_task(
+            NOTIFIER.listen(on_refresh_signal)
+        )
+
+
+@app.on_event("shutdown")
+def stop_listening_refresh_signals() -> None:
+    listener = getattr(app.state, "refresh_listener", None)
+    if listener is not None:
+        listener.cancel()
 
 
 @app.on_event("startup")
@@ -67,22 +301,117 @@ def refresh_stations_status() -> None:
     max_repetitions=None,
     logger=logger,
 )
-def refresh_models() -> None:
+async def refresh_models() -> None:
+    await asyncio.wrap_future(MODEL_RELOADER.submit(reload_models))
+
+
+def reload_models() -> None:
     logger.info("Reloading models")
-    logger.info("Reloading ETA model")
-    ETAPredictor.reload()
-    logger.info("Reloading availability model")
-    AvailabilityPredictor.reload()
+    db = SessionLocal()
+    for predictor in (ETAPredictor, AvailabilityPredictor):
+        signal = MODEL_SIGNAL.format(model=predictor.model.value)
+        if LEADER.try_acquire():
+            logger.info("Reloading %s model", predictor.model.value)
+            previous_version = predictor.model_version
+            predictor.reload()
+            if predictor.model_version != previous_version:
+                signal_refresh(db, signal)
+        elif FOLLOWER.changed(db, signal) or not predictor.initialized:
+            logger.info("Loading %s model swapped by the leader", predictor.model.value)
+            predictor.reload()
+    db.close()
     logger.info("Models reloaded")
+    refresh_prediction_grid()
 
 
 @app.on_event("startup")
-async def set_redis_cache():
+@repeat_every(
+    seconds=cfg.api.archive_predictions_seconds(
+        default=ARCHIVE_PREDICTIONS_SECONDS, cast=int
+    ),
+    max_repetitions=None,
+    logger=logger,
+)
+def refresh_predictions_archive() -> None:
+    if not ARCHIVE_PREDICTIONS or not LEADER.try_acquire():
+        return
+    logger.info("Archiving old predictions")
+    db = SessionLocal()
     try:
-        redis_url = cfg.redis.url()
-        logger.info("Setting cache on redis %s", redis_url)
-        redis = aioredis.from_url(redis_url, encoding="utf8", decode_responses=True)
-        FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache-frame")
-    except ycm.ConfigItemNotFound:
+        with REFRESH_DURATION.labels("predictions_archive").time():
+            stats = archive_predictions(db, connect_datalake(), PREDICTION_RETENTION)
+        record_refresh("predictions_archive", stats)
+    finally:
+        db.close()
+
+
+def refresh_prediction_grid() -> None:
+    if not PREDICTION_GRID:
+        return
+    grid = current_grid()
+    if grid is not None and grid.valid_for(
+        current_snapshot(),
+        datetime.now(),
+        ETAPredictor.model_version,
+        AvailabilityPredictor.model_version,
+    ):
+        logger.info("Prediction grid is up to date")
+        return
+    logger.info("Refreshing prediction grid")
+    with REFRESH_DURATION.labels("prediction_grid").time():
+        station_service.update_prediction_grid(
+            ETAPredictor, AvailabilityPredictor, PREDICTION_GRID_USER_ETAS
+        )
+
+
+@app.on_event("startup")
+def start_predictions_writer() -> None:
+    if PredictionsWriter is not None:
+        PredictionsWriter.start()
+
+
+@app.on_event("shutdown")
+def stop_predictions_writer() -> None:
+    if PredictionsWriter is not None:
+        logger.info("Flushing buffered predictions")
+        PredictionsWriter.stop()
+
+
+@app.on_event("shutdown")
+def stop_model_reloader() -> None:
+    MODEL_RELOADER.shutdown(wait=False, cancel_futures=True)
+
+
+@app.on_event("startup")
+def start_prediction_batcher() -> None:
+    if PredictionBatcher is not None:
+        PredictionBatcher.start()
+
+
+@app.on_event("shutdown")
+def stop_prediction_batcher() -> None:
+    if PredictionBatcher is not None:
+        PredictionBatcher.stop()
+
+
+@app.on_event("shutdown")
+def stop_inference_executor() -> None:
+    InferenceExecutor.shutdown(wait=False, cancel_futures=True)
+
+
+@app.on_event("shutdown")
+def release_leadership() -> None:
+    LEADER.release()
+
+
+@app.on_event("startup")
+async def set_redis_cache():
+    backend: Backend
+    if REDIS_URL is not None:
+        logger.info("Setting cache on redis %s", REDIS_URL)
+        redis = aioredis.from_url(REDIS_URL, encoding="utf8", decode_responses=True)
+        backend = RedisBackend(redis)
+    else:
         logger.info("Setting cache in memory")
-        FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache-frame")
+        backend = InMemoryBackend()
+    FastAPICache.init(backend, prefix="fastapi-cache-frame")
@@ -0,0 +1,149 @@
+"""On-disk cache of model artifacts.
+
+Artifacts are stored by model name and registry version, in a directory shared by
+every worker on the host. Downloads happen under an exclusive file lock, so only
+one process downloads each version while the others wait and then load it from
+disk. The latest version of each model and stage is also recorded, so a restart
+can load models without going to the registry.
+
+Artifacts are evicted least recently used first once the cache grows past its
+max size, but the latest version of every model is always kept.
+"""
+import os
+import fcntl
+import tempfile
+import contextlib
+from pathlib import Path
+from typing import Set, List, Tuple, Union, Callable, Iterator, Optional
+
+from frame.utils import get_logger
+
+logger = get_logger(__name__)
+
+LOCK_FILE = ".lock"
+LATEST_SUFFIX = ".latest"
+
+Version = Union[int, str]
+
+
+class ArtifactCache:
+    """Model artifacts cached on disk, shared across processes.
+
+    The root directory is only created when something is first written to it, so
+    creating a cache has no side effects.
+
+    Parameters
+    ----------
+    root: Directory where artifacts are stored
+    max_bytes: Max total size of the artifacts kept
+    """
+
+    def __init__(self, root: Union[str, Path], max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    @contextlib.contextmanager
+    def _lock(self) -> Iterator[None]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def path(self, model: str, version: Version, filename: str) -> Path:
+        return self.root / model / str(version) / filename
+
+    def get(self, model: str, version: Version, filename: str) -> Optional[Path]:
+        """Get the path of a cached artifact, if it is cached."""
+        path = self.path(model, version, filename)
+        if not path.exists():
+            return None
+        os.utime(path)
+        return path
+
+    def get_or_download(
+        self,
+        model: str,
+        version: Version,
+        filename: str,
+        download: Callable[[str], str],
+    ) -> Path:
+        """Get the path of an artifact, downloading it if it is not cached.
+
+        Parameters
+        ----------
+        download: Downloads the artifact into the given directory, returning its path
+        """
+        path = self.get(model, version, filename)
+        if path is not None:
+            return path
+
+        with self._lock():
+            path = self.get(model, version, filename)
+            if path is not None:
+                logger.info("Artifact %s was downloaded by another worker", path)
+                return path
+
+            path = self.path(model, version, filename)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=self.root) as tmp_dir:
+                logger.info("Downloading %s version %s", model, version)
+                os.replace(download(tmp_dir), path)
+            self._evict(keep=path)
+        return path
+
+    def _latest_path(self, model: str, stage: str) -> Path:
+        return self.root / f"{model}.{stage}{LATEST_SUFFIX}"
+
+    def latest(self, model: str, stage: str) -> Optional[str]:
+        """Get the latest version seen for a model and stage, if any."""
+        try:
+            return self._latest_path(model, stage).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def set_latest(self, model: str, stage: str, version: Version) -> None:
+        """Record the latest version of a model and stage."""
+        path = self._latest_path(model, stage)
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(str(version))
+        os.replace(tmp_path, path)
+
+    def _artifacts(self) -> List[Tuple[float, int, Path]]:
+        return [
+            (stat.st_mtime, stat.st_size, path)
+            for path in self.root.glob("*/*/*")
+            if path.is_file()
+            for stat in (path.stat(),)
+        ]
+
+    def _pinned(self) -> Set[str]:
+        """Latest version directories of every model, which are never evicted."""
+        pinned = set()
+        for path in self.root.glob(f"*{LATEST_SUFFIX}"):
+            model = path.name[: -len(LATEST_SUFFIX)].rsplit(".", 1)[0]
+            pinned.add(f"{model}/{path.read_text().strip()}")
+        return pinned
+
+    def _evict(self, keep: Path) -> None:
+        artifacts = sorted(self._artifacts())
+        total = sum(size for _, size, _ in artifacts)
+        pinned = self._pinned()
+        for _, size, path in artifacts:
+            if total <= self.max_bytes:
+                break
+            relative = path.parent.relative_to(self.root).as_posix()
+            if path == keep or relative in pinned:
+                continue
+            logger.info("Evicting cached artifact %s", path)
+            path.unlink(missing_ok=True)
+            with contextlib.suppress(OSError):
+                path.parent.rmdir()
+            total -= size
+
+    def size(self) -> int:
+        """Total size of the cached artifacts, in bytes."""
+        return sum(size for _, size, _ in self._artifacts())
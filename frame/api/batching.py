@@ -0,0 +1,151 @@
+"""Micro-batching of single row predictions.
+
+Rows from concurrent requests are queued, and a background thread scores the
+ones that arrive within a short window together, in a single call per model.
+"""
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Tuple, Callable, Optional
+
+from frame.utils import get_logger
+from frame.api.metrics import INFERENCE_BATCH_ROWS
+from frame.constants import INFERENCE_BATCH_SIZE, INFERENCE_BATCH_WINDOW_SECONDS
+
+logger = get_logger(__name__)
+
+Score = Callable[[Dict[str, List[Any]]], Any]
+Pending = Tuple[Score, Dict[str, Any], "Future[Any]"]
+
+
+def _score_rows(score: Score, rows: List[Dict[str, Any]]) -> Any:
+    return score({col: [row[col] for row in rows] for col in rows[0]})
+
+
+class InferenceBatcher:
+    """Scores single rows from concurrent callers in batches.
+
+    Rows are grouped by the scoring function they were submitted with, such as the
+    `predict_many` of a loaded model, so a batch never mixes model versions.
+
+    Parameters
+    ----------
+    window: Max seconds the first row of a batch waits for others to join, with 0
+        only the rows queued while the previous batch was scored are batched
+    max_batch_size: Score as soon as this many rows are pending
+    """
+
+    def __init__(
+        self,
+        window: float = INFERENCE_BATCH_WINDOW_SECONDS,
+        max_batch_size: int = INFERENCE_BATCH_SIZE,
+    ):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[Pending]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def predict(self, score: Score, row: Dict[str, Any]) -> Any:
+        """Predict for a single row, waiting for the batch it joins to be scored.
+
+        Rows are scored right away when the batcher is not running.
+        """
+        future: "Future[Any]" = Future()
+        with self._lock:
+            batching = self.running and not self._stop.is_set()
+            if batching:
+                self._queue.put((score, row, future))
+        if not batching:
+            return _score_rows(score, [row])[0]
+        return future.result()
+
+    def _collect(self) -> List[Pending]:
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            # Rows already queued join the batch even once the window is over
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score(self, batch: List[Pending]) -> None:
+        groups: Dict[Score, List[Pending]] = {}
+        for pending in batch:
+            groups.setdefault(pending[0], []).append(pending)
+
+        for score, pendings in groups.items():
+            INFERENCE_BATCH_ROWS.observe(len(pendings))
+            try:
+                predictions = _score_rows(score, [row for _, row, _ in pendings])
+            except Exception as e:  # pylint: disable=broad-except
+                logger.exception("Error scoring a batch of %s rows", len(pendings))
+                for _, _, future in pendings:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), prediction in zip(pendings, predictions):
+                future.set_result(prediction)
+        self.batches += len(groups)
+        self.rows += len(batch)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._score(batch)
+
+    def _drain(self) -> List[Pending]:
+        batch: List[Pending] = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def start(self) -> None:
+        """Start scoring batches in the background."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="inference-batcher", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            "Started inference batcher, %s ms window, up to %s rows",
+            self.window * 1000,
+            self.max_batch_size,
+        )
+
+    def stop(self) -> None:
+        """Stop the background thread, scoring whatever is still pending."""
+        with self._lock:
+            self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        pending = self._drain()
+        if pending:
+            self._score(pending)
+        logger.info("Stopped inference batcher")
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,83 @@
+"""Blocking work called from async endpoints.
+
+Endpoints serve what they can from in-memory state on the event loop, and hand
+the rest, DB queries and inference, over to threads. Concurrent requests missing
+the same state share a single computation of it.
+"""
+import asyncio
+from functools import partial
+from concurrent.futures import Executor
+from typing import Any, Dict, TypeVar, Callable, Hashable, Optional, Awaitable
+
+from starlette.concurrency import run_in_threadpool
+
+from frame.utils import get_logger
+from frame.models.base import SessionLocal
+from frame.api.metrics import CACHE_REQUESTS
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+def _with_session(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Results are read after the session is closed, so commits can't expire them
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        return fn(*args, **{**kwargs, "db": db})
+    finally:
+        db.close()
+
+
+async def run_sync(
+    fn: Callable[..., T],
+    *args: Any,
+    executor: Optional[Executor] = None,
+    with_db: bool = False,
+    **kwargs: Any,
+) -> T:
+    """Run a blocking function without blocking the event loop.
+
+    It runs in executor, or in the Starlette threadpool if none is given. With
+    with_db, it is passed a session of its own as `db`, opened and closed in the
+    thread it runs in.
+    """
+    if with_db:
+        fn = partial(_with_session, fn)
+    call = partial(fn, *args, **kwargs)
+    if executor is None:
+        return await run_in_threadpool(call)
+    return await asyncio.wrap_future(executor.submit(call))
+
+
+class SingleFlight:
+    """Coalesces concurrent computations of the same key into a single one.
+
+    The first caller for a key starts the computation as a task, and callers
+    arriving before it finishes wait for that same task. A caller giving up, such
+    as on a client disconnect, doesn't cancel it for the rest.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> "asyncio.Task[T]":
+        """Get the task computing key, starting it if there is none."""
+        task = self._tasks.get(key)
+        if task is not None:
+            CACHE_REQUESTS.labels("single_flight", "hit").inc()
+            return task
+        CACHE_REQUESTS.labels("single_flight", "miss").inc()
+        task = asyncio.ensure_future(fn())
+        self._tasks[key] = task
+        task.add_done_callback(partial(self._done, key))
+        return task
+
+    def _done(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Error computing %s", key, exc_info=task.exception())
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Compute key, or wait for the computation in flight."""
+        return await asyncio.shield(self.start(key, fn))
@@ -1,20 +1,44 @@
 """Endpoints dependencies."""
 import os
+import time
+import threading
 import operator as ops
-from typing import List, Union, Optional
+from functools import partial
+from typing import Dict, List, Union, Optional
+from dataclasses import field, asdict, dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 import joblib
 import mlflow
+import numpy as np
 import pandas as pd
 from sklearn.pipeline import Pipeline
 from mlflow.tracking import MlflowClient
 
 from frame.config import cfg
-from frame.ycm_casts import s3_or_local
 from frame.models.base import SessionLocal
-from frame.utils import with_env, get_logger
+from frame.api.batching import InferenceBatcher
+from frame.ycm_casts import to_bool, s3_or_local
+from frame.api.artifact_cache import ArtifactCache
+from frame.api.metrics import MODEL_RELOAD_DURATION
 from frame.exceptions import UninitializedPredictor
-from frame.constants import FrameModels, MLFlowStage
+from frame.utils import LRUCache, with_env, get_logger
+from frame.api.prediction_writer import PredictionWriter
+from frame.train.artifacts import artifact_name, serving_artifact_name
+from frame.train.compiled import CompiledPipeline, try_compile_pipeline
+from frame.constants import (
+    MODELS_CACHE_DIR,
+    INFERENCE_WORKERS,
+    INFERENCE_BATCH_SIZE,
+    PREDICTION_CACHE_SIZE,
+    MODELS_CACHE_MAX_BYTES,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_QUEUE_SIZE,
+    WRITE_BEHIND_FLUSH_SECONDS,
+    INFERENCE_BATCH_WINDOW_SECONDS,
+    FrameModels,
+    MLFlowStage,
+)
 
 logger = get_logger(__name__)
 
@@ -28,22 +52,154 @@ def get_db():
         db.close()
 
 
+@dataclass(frozen=True)
+class LoadedModel:
+    """A loaded model version, never mutated once published.
+
+    The pipeline, its compiled version and the model version are swapped together,
+    so predictions always report the version of the pipeline that made them.
+    """
+
+    pipeline: Pipeline
+    version: Optional[int]
+    probabilistic: bool = False
+    compiled: Optional[CompiledPipeline] = None
+    cache: LRUCache = field(default_factory=lambda: LRUCache(0), compare=False)
+    batcher: Optional[InferenceBatcher] = field(default=None, compare=False)
+    loaded_at: float = field(default_factory=time.time)
+
+    def predict(self, **kwargs) -> Union[float, bool, int]:
+        """Predict for a single row of features.
+
+        Predictions are cached by model version and features, since requests for
+        the same station between status refreshes share all of them. Misses are
+        scored along with concurrent ones if there is a batcher.
+        """
+        key = (self.version, tuple(kwargs.items()))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if self.batcher is not None:
+            prediction = self.batcher.predict(self.predict_many, kwargs)
+        else:
+            prediction = self.predict_many({k: [v] for k, v in kwargs.items()})[0]
+        self.cache.put(key, prediction)
+        return prediction
+
+    def predict_many(self, X: Union[pd.DataFrame, Dict[str, List]]) -> np.ndarray:
+        """Predict for every row of X in a single pass of the pipeline.
+
+        X can be either a frame or lists of values keyed by feature. The compiled
+        pipeline is used when available, skipping pandas altogether.
+        """
+        model: Union[Pipeline, CompiledPipeline]
+        if self.compiled is not None:
+            model = self.compiled
+        else:
+            model = self.pipeline
+            X = pd.DataFrame(X)
+        _f = model.predict_proba if self.probabilistic else model.predict
+        return _f(X)
+
+    def warm_up(self) -> None:
+        """Run a test prediction, so the first request doesn't pay for it."""
+        features = getattr(self.pipeline, "feature_names_in_", None)
+        if features is None:
+            return
+        self.predict_many({feature: [0] for feature in features})
+
+
+@dataclass
+class ReloadStats:
+    """Reloads of a predictor's model."""
+
+    reloads: int = 0
+    failed: int = 0
+    swaps: int = 0
+    last_reload_seconds: Optional[float] = None
+    last_swap_at: Optional[float] = None
+
+
 class MLFlowPredictor:
     def __init__(
         self,
         model: FrameModels,
         tracking_uri: str = cfg.mlflow.uri(),
         probabilistic: bool = False,
+        compile_pipeline: bool = cfg.models.compile(default=True, cast=to_bool),
+        cache_size: int = cfg.models.prediction_cache_size(
+            default=PREDICTION_CACHE_SIZE, cast=int
+        ),
+        artifact_cache: Optional[ArtifactCache] = None,
+        batcher: Optional[InferenceBatcher] = None,
     ):
         self.model = model
         self.tracking_uri = tracking_uri
-        self.pipeline: Optional[Pipeline] = None
-        self.model_version: Optional[int] = None
         self.probabilistic = probabilistic
+        self.compile_pipeline = compile_pipeline
+        self.cache = LRUCache(cache_size)
+        self.artifact_cache = artifact_cache
+        self.batcher = batcher
+        self.reload_stats = ReloadStats()
+        self._loaded: Optional[LoadedModel] = None
+        self._reload_lock = threading.Lock()
 
     @property
     def initialized(self):
-        return self.pipeline is not None
+        return self._loaded is not None
+
+    @property
+    def pipeline(self) -> Optional[Pipeline]:
+        loaded = self._loaded
+        return loaded.pipeline if loaded is not None else None
+
+    @property
+    def compiled(self) -> Optional[CompiledPipeline]:
+        loaded = self._loaded
+        return loaded.compiled if loaded is not None else None
+
+    @property
+    def model_version(self) -> Optional[int]:
+        loaded = self._loaded
+        return loaded.version if loaded is not None else None
+
+    def current(self) -> LoadedModel:
+        """Get the loaded model, to predict and report its version consistently."""
+        loaded = self._loaded
+        if loaded is None:
+            raise UninitializedPredictor("Predictor has not been initialized")
+        return loaded
+
+    def load(self, pipeline: Pipeline, version: Optional[int]) -> LoadedModel:
+        """Build a model from a pipeline, compiling and warming it up."""
+        loaded = LoadedModel(
+            pipeline,
+            version,
+            probabilistic=self.probabilistic,
+            compiled=try_compile_pipeline(pipeline) if self.compile_pipeline else None,
+            cache=self.cache,
+            batcher=self.batcher,
+        )
+        loaded.warm_up()
+        return loaded
+
+    def publish(self, loaded: LoadedModel) -> None:
+        """Swap the loaded model for a new one.
+
+        Readers hold a reference to the model they got, which is never mutated, so
+        rebinding the reference is enough to make the swap atomic.
+        """
+        previous_version = self.model_version
+        self._loaded = loaded
+        self.cache.clear()
+        self.reload_stats.swaps += 1
+        self.reload_stats.last_swap_at = time.time()
+        logger.info(
+            "Swapped %s model version %s for %s",
+            self.model,
+            previous_version,
+            loaded.version,
+        )
 
     @with_env(
         MLFLOW_TRACKING_USERNAME=cfg.mlflow.username(),
@@ -51,56 +207,208 @@ class MLFlowPredictor:
         #MLFLOW_TRACKING_SERVER_CERT_PATH=cfg.mlflow.cert_path(cast=s3_or_local),
     )
     def reload(self, stage: MLFlowStage = MLFlowStage.Production) -> None:
-        try:
-            mlflow.set_tracking_uri(self.tracking_uri)
-            client = MlflowClient(self.tracking_uri)
+        """Load the latest model version, if it changed, and swap it in.
 
-            versions: List[
-                mlflow.entities.model_registry.ModelVersion
-            ] = client.get_latest_versions(self.model, [stage.value])
+        The new model is downloaded, loaded and warmed up while the current one
+        keeps serving, and is only published if all of that succeeded.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            self.reload_stats.reloads += 1
+            try:
+                if self.initialized or not self._load_cached(stage):
+                    self._reload(stage)
+            except Exception:  # pylint: disable=broad-except
+                self.reload_stats.failed += 1
+                logger.error("Could not reload model %s", self.model, exc_info=True)
+            finally:
+                self.reload_stats.last_reload_seconds = time.perf_counter() - start
+                MODEL_RELOAD_DURATION.labels(FrameModels(self.model).value).observe(
+                    self.reload_stats.last_reload_seconds
+                )
+                logger.info(
+                    "Reload of %s took %.2f seconds",
+                    self.model,
+                    self.reload_stats.last_reload_seconds,
+                )
 
-            if not versions:
-                raise ValueError("No latest models found")
+    def _reload(self, stage: MLFlowStage) -> None:
+        mlflow.set_tracking_uri(self.tracking_uri)
+        client = MlflowClient(self.tracking_uri)
 
-            latest: mlflow.entities.model_registry.ModelVersion = max(
-                versions, key=ops.attrgetter("creation_timestamp")
-            )
+        versions: List[
+            mlflow.entities.model_registry.ModelVersion
+        ] = client.get_latest_versions(self.model, [stage.value])
 
-            if self.model_version is not None and self.model_version == latest.version:
-                logger.info("Already at latest model for %s", self.model)
-                return
+        if not versions:
+            raise ValueError("No latest models found")
 
-            logger.info(
-                "Current loaded version is %s, but latest is %s. Downloading from run_id %s",
-                self.model_version,
-                latest.version,
-                latest.run_id,
-            )
+        latest: mlflow.entities.model_registry.ModelVersion = max(
+            versions, key=ops.attrgetter("creation_timestamp")
+        )
 
-            latest_path = mlflow.artifacts.download_artifacts(
-                artifact_path=f"{self.model}.joblib", run_id=latest.run_id
+        if self.model_version is not None and self.model_version == latest.version:
+            logger.info("Already at latest model for %s", self.model)
+            return
+
+        logger.info(
+            "Current loaded version is %s, but latest is %s. Downloading from run_id %s",
+            self.model_version,
+            latest.version,
+            latest.run_id,
+        )
+
+        loaded = self.load(self._load_pipeline(latest), latest.version)
+        if self.artifact_cache is not None:
+            self.artifact_cache.set_latest(
+                self.model.value, stage.value, latest.version
             )
+        self.publish(loaded)
 
-            logger.info("Reloading from %s", latest_path)
-            self.pipeline = joblib.load(latest_path)
+    @property
+    def artifact_names(self) -> List[str]:
+        """Artifacts a model can be loaded from, by order of preference."""
+        return [serving_artifact_name(self.model), artifact_name(self.model)]
 
-            self.model_version = latest.version
+    def _load_pipeline(
+        self, latest: mlflow.entities.model_registry.ModelVersion
+    ) -> Pipeline:
+        """Load the pipeline of a version, preferring its serving artifact.
 
-            os.remove(latest_path)
-        except mlflow.exceptions.MlflowException:
-            logger.error(
-                "Could not fetch version for model %s", self.model, exc_info=True
-            )
+        Versions trained before serving artifacts existed only have the compressed
+        one.
+        """
+        for name in self.artifact_names:
+            try:
+                return self._load_artifact(name, latest)
+            except Exception:  # pylint: disable=broad-except
+                logger.info(
+                    "Could not load %s for version %s",
+                    name,
+                    latest.version,
+                    exc_info=True,
+                )
+        raise ValueError(f"No artifact could be loaded for version {latest.version}")
 
-    def predict(self, **kwargs) -> Union[float, bool, int]:
-        if not self.initialized or self.pipeline is None:
-            raise UninitializedPredictor("Predictor has not been initialized")
-        X = pd.DataFrame(kwargs, index=[0])
-        _f = (
-            self.pipeline.predict_proba if self.probabilistic else self.pipeline.predict
+    def _load_artifact(
+        self, name: str, latest: mlflow.entities.model_registry.ModelVersion
+    ) -> Pipeline:
+        download = partial(
+            mlflow.artifacts.download_artifacts,
+            artifact_path=name,
+            run_id=latest.run_id,
         )
-        return _f(X)[0]
+        if self.artifact_cache is None:
+            latest_path = download()
+            try:
+                logger.info("Reloading from %s", latest_path)
+                return joblib.load(latest_path)
+            finally:
+                os.remove(latest_path)
+
+        cached_path = self.artifact_cache.get_or_download(
+            self.model.value,
+            latest.version,
+            name,
+            lambda dst_path: download(dst_path=dst_path),
+        )
+        logger.info("Reloading from %s", cached_path)
+        return joblib.load(cached_path)
+
+    def _load_cached(self, stage: MLFlowStage) -> bool:
+        """Load the latest version seen for the stage from the artifact cache.
+
+        Lets a restarted worker start serving without going to the registry.
+        """
+        if self.artifact_cache is None:
+            return False
+        version = self.artifact_cache.latest(self.model.value, stage.value)
+        if version is None:
+            return False
+        for name in self.artifact_names:
+            cached_path = self.artifact_cache.get(self.model.value, version, name)
+            if cached_path is not None:
+                logger.info(
+                    "Loading %s version %s from %s", self.model, version, cached_path
+                )
+                self.publish(self.load(joblib.load(cached_path), version))
+                return True
+        return False
+
+    def predict(self, **kwargs) -> Union[float, bool, int]:
+        """Predict for a single row of features with the current model."""
+        return self.current().predict(**kwargs)
+
+    def predict_many(self, X: Union[pd.DataFrame, Dict[str, List]]) -> np.ndarray:
+        """Predict for every row of X with the current model."""
+        return self.current().predict_many(X)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        return {"model_version": self.model_version, **asdict(self.reload_stats)}
+
+
+ModelsCache = ArtifactCache(
+    cfg.models.cache_dir(default=MODELS_CACHE_DIR),
+    max_bytes=cfg.models.cache_max_bytes(default=MODELS_CACHE_MAX_BYTES, cast=int),
+)
+
+PredictionBatcher: Optional[InferenceBatcher] = (
+    InferenceBatcher(
+        window=cfg.api.inference_batch_window_seconds(
+            default=INFERENCE_BATCH_WINDOW_SECONDS, cast=float
+        ),
+        max_batch_size=cfg.api.inference_batch_size(
+            default=INFERENCE_BATCH_SIZE, cast=int
+        ),
+    )
+    if cfg.api.inference_batching(default=False, cast=to_bool)
+    else None
+)
+
+ETAPredictor = MLFlowPredictor(
+    FrameModels.ETA, artifact_cache=ModelsCache, batcher=PredictionBatcher
+)
+AvailabilityPredictor = MLFlowPredictor(
+    FrameModels.AVAILABILITY,
+    probabilistic=True,
+    artifact_cache=ModelsCache,
+    batcher=PredictionBatcher,
+)
+
+PredictionsWriter: Optional[PredictionWriter] = (
+    PredictionWriter(
+        SessionLocal,
+        max_queue_size=cfg.api.write_behind_queue_size(
+            default=WRITE_BEHIND_QUEUE_SIZE, cast=int
+        ),
+        batch_size=cfg.api.write_behind_batch_size(
+            default=WRITE_BEHIND_BATCH_SIZE, cast=int
+        ),
+        flush_interval=cfg.api.write_behind_flush_seconds(
+            default=WRITE_BEHIND_FLUSH_SECONDS, cast=float
+        ),
+    )
+    if cfg.api.write_behind(default=False, cast=to_bool)
+    else None
+)
+
+
+InferenceExecutor = ThreadPoolExecutor(
+    max_workers=cfg.api.inference_workers(default=INFERENCE_WORKERS, cast=int),
+    thread_name_prefix="inference",
+)
+
+
+async def get_eta_predictor() -> MLFlowPredictor:
+    """Get the ETA predictor."""
+    return ETAPredictor
+
+
+async def get_availability_predictor() -> MLFlowPredictor:
+    """Get the availability predictor."""
+    return AvailabilityPredictor
 
 
-ETAPredictor = MLFlowPredictor(FrameModels.ETA)
-AvailabilityPredictor = MLFlowPredictor(FrameModels.AVAILABILITY, probabilistic=True)
+async def get_prediction_writer() -> Optional[PredictionWriter]:
+    """Get the predictions writer, if write-behind is enabled."""
+    return PredictionsWriter
@@ -0,0 +1,105 @@
+"""Materialized grid of predictions.
+
+Predictions only depend on the station, its current status, the hour, the day of
+week and the user ETA. After every status refresh all of them are known but the
+user ETA, which lies in a small range. So every in service station is scored for
+every user ETA in that range ahead of time, and predictions become lookups.
+"""
+from datetime import date, datetime
+from typing import Tuple, Optional, Sequence
+
+import numpy as np
+
+from frame.utils import get_logger
+from frame.api.snapshot import StationsStatusSnapshot
+
+logger = get_logger(__name__)
+
+
+class PredictionGrid:
+    """Immutable ETA and availability predictions for a status snapshot.
+
+    Parameters
+    ----------
+    snapshot: Status snapshot the grid was computed from
+    hod: Hour of day the grid is valid for
+    dow: Day of week the grid is valid for
+    day: Date the grid is valid for, which determines holidays
+    user_etas: Contiguous range of user ETAs scored
+    bike_etas: ETA prediction per station, in snapshot order
+    availability: Availability probability per station and user ETA
+    eta_model_version: Version of the ETA model used
+    availability_model_version: Version of the availability model used
+    """
+
+    def __init__(
+        self,
+        snapshot: StationsStatusSnapshot,
+        hod: int,
+        dow: int,
+        day: date,
+        user_etas: Sequence[int],
+        bike_etas: np.ndarray,
+        availability: np.ndarray,
+        eta_model_version: Optional[int],
+        availability_model_version: Optional[int],
+    ):
+        self.snapshot = snapshot
+        self.hod = hod
+        self.dow = dow
+        self.day = day
+        self.min_user_eta = min(user_etas)
+        self.max_user_eta = max(user_etas)
+        self.bike_etas = bike_etas
+        self.availability = availability
+        self.eta_model_version = eta_model_version
+        self.availability_model_version = availability_model_version
+        for arr in (self.bike_etas, self.availability):
+            arr.flags.writeable = False
+
+    def __len__(self) -> int:
+        return self.availability.size
+
+    def valid_for(
+        self,
+        snapshot: Optional[StationsStatusSnapshot],
+        current_time: datetime,
+        eta_model_version: Optional[int],
+        availability_model_version: Optional[int],
+    ) -> bool:
+        """Whether the grid still holds for the given status, time and models."""
+        return (
+            snapshot is self.snapshot
+            and current_time.hour == self.hod
+            and current_time.date() == self.day
+            and eta_model_version == self.eta_model_version
+            and availability_model_version == self.availability_model_version
+        )
+
+    def lookup(self, station_id: int, user_eta: int) -> Optional[Tuple[float, float]]:
+        """Get the ETA and availability probability, if they were precomputed."""
+        if not self.min_user_eta <= user_eta <= self.max_user_eta:
+            return None
+        idx = self.snapshot.index(station_id)
+        if idx is None:
+            return None
+        return (
+            float(self.bike_etas[idx]),
+            float(self.availability[idx, user_eta - self.min_user_eta]),
+        )
+
+
+_grid: Optional[PredictionGrid] = None
+
+
+def current_grid() -> Optional[PredictionGrid]:
+    """Get the latest published grid, if any."""
+    return _grid
+
+
+def publish_grid(grid: Optional[PredictionGrid]) -> None:
+    """Swap the current grid for a new one."""
+    global _grid  # pylint: disable=global-statement
+    _grid = grid
+    if grid is not None:
+        logger.info("Published prediction grid with %s cells", len(grid))
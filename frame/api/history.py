@@ -0,0 +1,135 @@
+"""In-memory history of the stations status.
+
+Every status snapshot is appended to a fixed-size ring buffer covering the last
+hours, so recent trends for a station can be served without going to the
+datalake.
+
+Memory is allocated upfront: each sample takes 8 bytes for its timestamp plus 4
+bytes per station slot, one `uint8` for each count. With the default 30 seconds
+between refreshes, that is 120 samples or 480 bytes per station-hour; 6 hours of
+history for 1024 station slots take about 2.8MB.
+"""
+import time
+import threading
+from typing import Dict, List, Tuple, Optional
+
+import numpy as np
+
+from frame.utils import get_logger
+from frame.api.snapshot import COUNT_COLUMNS, StationsStatusSnapshot
+
+logger = get_logger(__name__)
+
+MISSING = np.iinfo(np.uint8).max
+MAX_COUNT = MISSING - 1
+
+
+class StatusHistory:
+    """Fixed-size columnar ring buffer of stations status samples.
+
+    Parameters
+    ----------
+    capacity: Amount of samples kept, older ones are overwritten
+    max_stations: Amount of station slots, stations past it are not tracked
+    """
+
+    def __init__(self, capacity: int, max_stations: int):
+        self.capacity = capacity
+        self.max_stations = max_stations
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.counts = np.full(
+            (capacity, max_stations, len(COUNT_COLUMNS)), MISSING, dtype=np.uint8
+        )
+        self.slots: Dict[int, int] = {}
+        self.head = 0
+        self.size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.counts.nbytes
+
+    def _slots_for(self, station_ids: np.ndarray) -> np.ndarray:
+        slots = np.empty(len(station_ids), dtype=np.int64)
+        for i, station_id in enumerate(station_ids.tolist()):
+            slot = self.slots.get(station_id)
+            if slot is None:
+                if len(self.slots) >= self.max_stations:
+                    logger.warning("History is full, not tracking %s", station_id)
+                    slot = -1
+                else:
+                    slot = self.slots[station_id] = len(self.slots)
+            slots[i] = slot
+        return slots
+
+    def append(
+        self, snapshot: StationsStatusSnapshot, timestamp: Optional[int] = None
+    ) -> None:
+        """Add the status of every station in the snapshot as a new sample."""
+        timestamp = int(time.time()) if timestamp is None else timestamp
+        with self._lock:
+            slots = self._slots_for(snapshot.station_ids)
+            tracked = slots >= 0
+            row = self.head
+            self.counts[row] = MISSING
+            self.counts[row, slots[tracked]] = np.clip(
+                snapshot.counts[tracked], 0, MAX_COUNT
+            )
+            self.timestamps[row] = timestamp
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def _window_rows(self, since: int) -> np.ndarray:
+        """Rows with samples taken at or after since, oldest first."""
+        if self.size < self.capacity:
+            segments = [(0, self.size)]
+        else:
+            segments = [(self.head, self.capacity), (0, self.head)]
+
+        rows = []
+        for start, end in segments:
+            offset = int(np.searchsorted(self.timestamps[start:end], since))
+            rows.append(np.arange(start + offset, end))
+        return np.concatenate(rows)
+
+    def window(self, station_id: int, since: int) -> List[Tuple[int, Tuple[int, ...]]]:
+        """Samples for a station taken at or after since, oldest first.
+
+        Samples where the station was not in service are left out.
+        """
+        with self._lock:
+            slot = self.slots.get(station_id)
+            if slot is None or self.size == 0:
+                return []
+            rows = self._window_rows(since)
+            timestamps = self.timestamps[rows]
+            counts = self.counts[rows, slot]
+
+        present = counts[:, 0] != MISSING
+        return [
+            (timestamp, tuple(sample))
+            for timestamp, sample in zip(
+                timestamps[present].tolist(), counts[present].tolist()
+            )
+        ]
+
+
+_history: Optional[StatusHistory] = None
+
+
+def status_history() -> Optional[StatusHistory]:
+    """Get the history of this process, if enabled."""
+    return _history
+
+
+def init_status_history(capacity: int, max_stations: int) -> StatusHistory:
+    """Allocate the history of this process."""
+    global _history  # pylint: disable=global-statement
+    _history = StatusHistory(capacity, max_stations)
+    logger.info(
+        "Allocated %s samples of status history for %s stations, %s bytes",
+        capacity,
+        max_stations,
+        _history.nbytes,
+    )
+    return _history
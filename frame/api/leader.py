@@ -0,0 +1,238 @@
+"""Leader election between API workers.
+
+Stations and models are shared by every worker, so refreshing them is left to a
+single leader. Leadership is a lock held by the leader process: a session level
+advisory lock on Postgres, or a file lock for SQLite, where all workers live on
+the same host. Either one is released when the leader dies, and the next worker
+trying to acquire it takes over.
+
+After refreshing, the leader bumps a signal in the DB, and followers only reload
+the data whose signal changed since they last looked. With Redis, the leader also
+publishes the signal, so followers look right away instead of on their next poll.
+"""
+import fcntl
+import asyncio
+import threading
+from pathlib import Path
+from typing import IO, Dict, Callable, Optional, Awaitable
+
+import redis
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from redis import asyncio as aioredis
+from sqlalchemy.engine import Engine, Connection
+
+from frame.utils import get_logger
+from frame.models import RefreshSignal
+from frame.constants import REFRESH_CHANNEL
+
+logger = get_logger(__name__)
+
+
+class LeaderElection:
+    """Every process is the leader, used when election is disabled."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.is_leader = False
+
+    def _acquire(self) -> bool:
+        return True
+
+    def _check(self) -> bool:
+        """Whether the lock is still held."""
+        return True
+
+    def _release(self) -> None:
+        pass
+
+    def try_acquire(self) -> bool:
+        """Whether this process is the leader, trying to become it if it is not."""
+        with self._lock:
+            if self.is_leader and not self._check():
+                logger.warning("Lost leadership")
+                self._release()
+                self.is_leader = False
+            if not self.is_leader:
+                self.is_leader = self._acquire()
+                if self.is_leader:
+                    logger.info("Became the leader, running refreshes")
+            return self.is_leader
+
+    def release(self) -> None:
+        with self._lock:
+            if self.is_leader:
+                self._release()
+                self.is_leader = False
+
+
+class AdvisoryLockElection(LeaderElection):
+    """Leadership is a Postgres session level advisory lock.
+
+    The lock is held on a dedicated connection, and Postgres releases it when that
+    connection is closed, including when the leader dies. The connection is in
+    autocommit mode, so it isn't left idle in a transaction between checks.
+    """
+
+    def __init__(self, engine: Engine, key: int):
+        super().__init__()
+        self.engine = engine
+        self.key = key
+        self._conn: Optional[Connection] = None
+
+    def _acquire(self) -> bool:
+        conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+            ).scalar()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Could not try the leader lock")
+            acquired = False
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def _check(self) -> bool:
+        try:
+            self._conn.execute(text("SELECT 1"))  # type: ignore
+            return True
+        except Exception:  # pylint: disable=broad-except
+            return False
+
+    def _release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": self.key}
+            )
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Could not release the leader lock", exc_info=True)
+        finally:
+            self._conn.invalidate()
+            self._conn.close()
+            self._conn = None
+
+
+class FileLockElection(LeaderElection):
+    """Leadership is an exclusive lock on a file, for workers on a single host."""
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = path
+        self._file: Optional[IO] = None
+
+    def _acquire(self) -> bool:
+        lock_file = open(self.path, "a")  # pylint: disable=consider-using-with
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def _release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def make_leader_election(
+    engine: Engine, enabled: bool, lock_key: int, lock_file: Path
+) -> LeaderElection:
+    """Pick the election that fits the DB the workers share."""
+    if not enabled:
+        return LeaderElection()
+    if engine.dialect.name == "postgresql":
+        return AdvisoryLockElection(engine, lock_key)
+    return FileLockElection(lock_file)
+
+
+def bump_signal(db: Session, name: str) -> None:
+    """Signal followers that some data was refreshed."""
+    updated = (
+        db.query(RefreshSignal)
+        .filter(RefreshSignal.name == name)
+        .update({RefreshSignal.version: RefreshSignal.version + 1})
+    )
+    if not updated:
+        db.add(RefreshSignal(name=name, version=1))
+    db.commit()
+
+
+class SignalFollower:
+    """Tracks the signals a follower has already acted upon."""
+
+    def __init__(self):
+        self.seen: Dict[str, int] = {}
+
+    def changed(self, db: Session, name: str) -> bool:
+        """Whether a signal changed since the last call, or was never seen."""
+        version = (
+            db.query(RefreshSignal.version).filter(RefreshSignal.name == name).scalar()
+        )
+        version = version or 0
+        if self.seen.get(name) == version:
+            return False
+        self.seen[name] = version
+        return True
+
+
+class RefreshNotifier:
+    """Publishes signals to followers over Redis pub/sub, if there is a Redis.
+
+    Without one, notifying does nothing, and followers rely on polling signals.
+    """
+
+    def __init__(self, redis_url: Optional[str], channel: str = REFRESH_CHANNEL):
+        self.redis_url = redis_url
+        self.channel = channel
+        self._client: Optional[redis.Redis] = (
+            redis.Redis.from_url(redis_url) if redis_url is not None else None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._client is not None
+
+    def notify(self, name: str) -> None:
+        """Publish a signal, after it was bumped in the DB."""
+        if self._client is None:
+            return
+        try:
+            self._client.publish(self.channel, name)
+        except redis.RedisError:
+            logger.exception("Error publishing signal %s", name)
+
+    @staticmethod
+    async def _handle(on_signal: Callable[[str], Awaitable[None]], name: str) -> None:
+        try:
+            await on_signal(name)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Error following signal %s", name)
+
+    async def listen(
+        self, on_signal: Callable[[str], Awaitable[None]], retry_seconds: float = 5.0
+    ) -> None:
+        """Call on_signal with every signal published, until cancelled."""
+        if self.redis_url is None:
+            return
+        while True:
+            client = aioredis.from_url(self.redis_url, decode_responses=True)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    logger.info("Listening to refresh signals on %s", self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            await self._handle(on_signal, message["data"])
+            except redis.RedisError:
+                logger.exception("Lost refresh signals subscription, retrying")
+                await asyncio.sleep(retry_seconds)
+            finally:
+                await client.close()
@@ -0,0 +1,341 @@
+"""Metrics of the API, exposed in the Prometheus text format.
+
+Metrics are kept in process with plain counters and fixed bucket histograms, so
+recording one costs a dict lookup, a bisect and a lock, and stays cheap enough to
+be always on. See `benchmarks/metrics_overhead.py`.
+"""
+import time
+import bisect
+import threading
+from dataclasses import asdict
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+)
+
+from sqlalchemy.engine import Engine
+from starlette.types import Send, Scope, ASGIApp, Message, Receive
+
+from frame.constants import LATENCY_BUCKETS, DURATION_BUCKETS, BATCH_SIZE_BUCKETS
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        pairs = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        name = f"{name}{{{pairs}}}"
+    return f"{name} {float(value)!r}"
+
+
+class MetricsRegistry:
+    """Metrics to be rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric") -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(
+                _format_sample(name, labels, value)
+                for name, labels, value in metric.samples()
+            )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Metric:
+    """Base for metrics, optionally split by labels."""
+
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[MetricsRegistry] = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        """Get the child metric of some label values, creating it if needed."""
+        try:
+            return self._children[values]
+        except KeyError:
+            pass
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        with self._lock:
+            return self._children.setdefault(values, self._new_child())
+
+    def _labelled(self) -> Iterator[Tuple[Dict[str, str], Any]]:
+        for values, child in list(self._children.items()):
+            yield dict(zip(self.labelnames, values)), child
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, child in self._labelled():
+            yield f"{self.name}_total", labels, child.value
+
+
+class _Timer:
+    def __init__(self, histogram: "_HistogramChild"):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Observe the time spent in a `with` block."""
+        return _Timer(self)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        registry: Optional[MetricsRegistry] = REGISTRY,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, child in self._labelled():
+            with child._lock:  # pylint: disable=protected-access
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket", {**labels, "le": le}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class CallbackMetric(Metric):
+    """Metric read from a callback when rendered, for values kept elsewhere.
+
+    The callback returns values keyed by their label values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Dict[Labels, float]],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge",
+        registry: Optional[MetricsRegistry] = REGISTRY,
+    ):
+        self.callback = callback
+        self.kind = kind
+        super().__init__(name, documentation, labelnames, registry)
+
+    def samples(self) -> Iterable[Sample]:
+        suffix = "_total" if self.kind == "counter" else ""
+        for values, value in self.callback().items():
+            yield f"{self.name}{suffix}", dict(zip(self.labelnames, values)), value
+
+
+REQUEST_LATENCY = Histogram(
+    "frame_request_duration_seconds",
+    "Latency of HTTP requests by route.",
+    ("method", "route", "status"),
+)
+PREDICT_PHASE = Histogram(
+    "frame_predict_phase_duration_seconds",
+    "Time spent in each phase of predictions.",
+    ("phase",),
+)
+REFRESH_DURATION = Histogram(
+    "frame_refresh_duration_seconds",
+    "Duration of background refreshes.",
+    ("task",),
+    buckets=DURATION_BUCKETS,
+)
+REFRESH_ROWS = Counter(
+    "frame_refresh_rows",
+    "Rows affected by background refreshes.",
+    ("task", "result"),
+)
+MODEL_RELOAD_DURATION = Histogram(
+    "frame_model_reload_duration_seconds",
+    "Duration of model reloads.",
+    ("model",),
+    buckets=DURATION_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "frame_cache_requests",
+    "Lookups in caches, by result.",
+    ("cache", "result"),
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "frame_db_pool_checkout_duration_seconds",
+    "Time waited to check out a connection from the DB pool.",
+)
+INFERENCE_BATCH_ROWS = Histogram(
+    "frame_inference_batch_rows",
+    "Rows scored together by the inference batcher.",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+
+
+def record_refresh(task: str, stats: Any) -> None:
+    """Count the rows of a refresh, from its stats dataclass."""
+    for result, rows in asdict(stats).items():
+        REFRESH_ROWS.labels(task, result).inc(rows)
+
+
+def instrument_pool(engine: Engine) -> None:
+    """Time connection checkouts from the pool of an engine."""
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        with POOL_CHECKOUT_WAIT.time():
+            return connect()
+
+    pool.connect = timed_connect  # type: ignore
+
+
+class MetricsMiddleware:
+    """Observe the latency of every HTTP request, labelled by its route template.
+
+    Routes are matched by the endpoint the router picked, so paths with ids don't
+    create a label per id. Requests that matched no route are labelled `unmatched`.
+    """
+
+    def __init__(self, app: ASGIApp, routes: List[Any]):
+        self.app = app
+        self.routes = routes
+        self._paths: Dict[Any, str] = {}
+
+    def _route(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._paths.get(endpoint)
+        if path is None:
+            self._paths = {
+                getattr(route, "endpoint", None): route.path for route in self.routes
+            }
+            path = self._paths.get(endpoint, "unmatched")
+        return path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(
+                scope["method"], self._route(scope), str(status)
+            ).observe(time.perf_counter() - start)
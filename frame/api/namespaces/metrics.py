@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from frame.api.metrics import REGISTRY, CONTENT_TYPE
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -1,73 +1,217 @@
-from typing import List
+import asyncio
+from functools import partial
+from typing import List, Callable, Optional, Awaitable
 
-from sqlalchemy.orm import Session
-from fastapi_cache.decorator import cache
-from fastapi import Depends, APIRouter, HTTPException
+from fastapi import Query, Depends, Request, APIRouter, HTTPException
 
+from frame.config import cfg
 from frame.utils import get_logger
+from frame.ycm_casts import to_bool
+from frame.api.metrics import CACHE_REQUESTS
+from frame.api.snapshot import current_snapshot
+from frame.api.spatial import current_stations_index
+from frame.api.concurrency import SingleFlight, run_sync
+from frame.api.prediction_writer import PredictionWriter
 from frame.api.schemas import stations as station_schemas
 from frame.api.services import stations as station_service
+from frame.constants import NEARBY_STATIONS, MAX_NEARBY_STATIONS
+from frame.api.responses import EncodedResponse, EncodedResponseCache
 from frame.exceptions import PredictionError, NoInfoForStation, StationDoesNotExist
 from frame.api.dependencies import (
-    ETAPredictor,
     MLFlowPredictor,
-    AvailabilityPredictor,
-    get_db,
+    InferenceExecutor,
+    PredictionBatcher,
+    get_eta_predictor,
+    get_prediction_writer,
+    get_availability_predictor,
 )
 
 logger = get_logger(__name__)
 
+STALE_WHILE_REVALIDATE = cfg.api.stale_while_revalidate(default=False, cast=to_bool)
+
+# Requests missing the same state while it loads or encodes share the work
+FLIGHTS = SingleFlight()
+
 router = APIRouter(
     prefix="/stations",
     tags=["stations"],
 )
 
 
+async def load_stations_index() -> None:
+    """Load the stations index from the DB, once, if it is not loaded yet."""
+    if current_stations_index() is None:
+        await FLIGHTS.run(
+            "stations_index",
+            partial(run_sync, station_service.load_stations_index, with_db=True),
+        )
+
+
+async def load_stations_status_snapshot() -> None:
+    """Load the status snapshot from the DB, once, if there is none yet."""
+    if current_snapshot() is None:
+        await FLIGHTS.run(
+            "stations_status_snapshot",
+            partial(
+                run_sync, station_service.load_stations_status_snapshot, with_db=True
+            ),
+        )
+
+
+async def get_encoded(
+    key: str,
+    cache: EncodedResponseCache,
+    peek: Callable[[], Optional[EncodedResponse]],
+    build: Callable[[], Awaitable[Optional[EncodedResponse]]],
+) -> Optional[EncodedResponse]:
+    """Get an encoded response, building it once for all requests that miss it.
+
+    With stale-while-revalidate, the response of the previous version is served
+    while the current one is built, so only the first request for it ever waits.
+    """
+    encoded = peek()
+    if encoded is not None:
+        return encoded
+    building = FLIGHTS.start(key, build)
+    if STALE_WHILE_REVALIDATE:
+        encoded = cache.latest()
+        if encoded is not None:
+            CACHE_REQUESTS.labels(key, "stale").inc()
+            return encoded
+    return await asyncio.shield(building)
+
+
 @router.get("", response_model=List[station_schemas.Station])
-@cache(expire=300)
-def get_stations(db: Session = Depends(get_db)):
-    return station_service.get_stations(db)
+async def get_stations(request: Request):
+    await load_stations_index()
+    encoded = await get_encoded(
+        "stations",
+        station_service.ENCODED_STATIONS,
+        station_service.peek_encoded_stations,
+        partial(run_sync, station_service.get_encoded_stations, with_db=True),
+    )
+    return encoded.respond(request)
 
 
 @router.get("/status", response_model=List[station_schemas.StationStatus])
-@cache(expire=10)
-def get_stations_status(db: Session = Depends(get_db)):
-    return station_service.get_stations_status(db)
+async def get_stations_status(request: Request):
+    await load_stations_status_snapshot()
+    encoded = await get_encoded(
+        "stations_status",
+        station_service.ENCODED_STATIONS_STATUS,
+        station_service.peek_encoded_stations_status,
+        partial(run_sync, station_service.get_encoded_stations_status, db=None),
+    )
+    if encoded is None:
+        return await run_sync(station_service.get_stations_status, with_db=True)
+    return encoded.respond(request)
+
+
+@router.get("/nearby", response_model=List[station_schemas.NearbyStation])
+async def get_nearby_stations(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(NEARBY_STATIONS, ge=1, le=MAX_NEARBY_STATIONS),
+    radius: Optional[float] = Query(None, gt=0),
+    status: bool = False,
+):
+    await load_stations_index()
+    if status:
+        await load_stations_status_snapshot()
+    return station_service.get_nearby_stations(
+        lat, lon, k, None, radius=radius, with_status=status
+    )
+
+
+@router.post("/predictions", response_model=List[station_schemas.Prediction])
+async def predict_for_stations(
+    prediction_params: station_schemas.BatchPredictionParams,
+    eta_predictor: MLFlowPredictor = Depends(get_eta_predictor),
+    availability_predictor: MLFlowPredictor = Depends(get_availability_predictor),
+    prediction_writer: Optional[PredictionWriter] = Depends(get_prediction_writer),
+):
+    """Predict for many stations at once.
+
+    Stations with no status, either unknown or not in service, are left out of the
+    response instead of failing the whole batch, so predictions are to be matched
+    to stations by their `station_id`.
+    """
+    await load_stations_status_snapshot()
+    try:
+        return await run_sync(
+            station_service.predict_many,
+            prediction_params,
+            db=None,
+            executor=InferenceExecutor,
+            with_db=prediction_writer is None,
+            eta_predictor=eta_predictor,
+            availability_predictor=availability_predictor,
+            prediction_writer=prediction_writer,
+        )
+    except PredictionError:
+        raise HTTPException(status_code=503, detail="Predictor uninitialized")
 
 
 @router.get("/{station_id}", response_model=station_schemas.Station)
-@cache(expire=300)
-def get_station(station_id: int, db: Session = Depends(get_db)):
+async def get_station(station_id: int):
+    await load_stations_index()
+    station = station_service.get_indexed_station(station_id)
+    if station is not None:
+        return station
     try:
-        return station_service.get_station(station_id, db)
+        return await run_sync(station_service.get_station, station_id, with_db=True)
     except StationDoesNotExist:
         raise HTTPException(status_code=404, detail="Station does not exist")
 
 
 @router.get("/{station_id}/status", response_model=station_schemas.StationStatus)
-@cache(expire=10)
-def get_station_status(station_id: int, db: Session = Depends(get_db)):
+async def get_station_status(station_id: int):
+    await load_stations_status_snapshot()
     try:
-        return station_service.get_station_status(station_id, db)
-    except StationDoesNotExist:
-        raise HTTPException(status_code=404, detail="Station does not exist")
+        return station_service.get_station_status(station_id, None)
+    except NoInfoForStation:
+        raise HTTPException(
+            status_code=404,
+            detail="There is no information for this station. Probably does not exist.",
+        )
+
+
+@router.get(
+    "/{station_id}/history", response_model=List[station_schemas.StationStatusSample]
+)
+async def get_station_status_history(station_id: int, minutes: int = Query(60, ge=1)):
+    try:
+        return station_service.get_station_status_history(station_id, minutes)
+    except NoInfoForStation:
+        raise HTTPException(
+            status_code=404,
+            detail="There is no recent history for this station.",
+        )
 
 
 @router.post("/{station_id}/prediction", response_model=station_schemas.Prediction)
-def predict_for_station(
+async def predict_for_station(
     station_id: int,
     prediction_params: station_schemas.PredictionParams,
-    db: Session = Depends(get_db),
-    eta_predictor: MLFlowPredictor = Depends(lambda: ETAPredictor),
-    availability_predictor: MLFlowPredictor = Depends(lambda: AvailabilityPredictor),
+    eta_predictor: MLFlowPredictor = Depends(get_eta_predictor),
+    availability_predictor: MLFlowPredictor = Depends(get_availability_predictor),
+    prediction_writer: Optional[PredictionWriter] = Depends(get_prediction_writer),
 ):
+    await load_stations_status_snapshot()
     try:
-        return station_service.predict(
+        return await run_sync(
+            station_service.predict,
             station_id,
             prediction_params,
-            db,
+            db=None,
+            # With batching, inference runs in the batcher and requests only wait on
+            # it, so they don't need to be bounded by the inference executor
+            executor=InferenceExecutor if PredictionBatcher is None else None,
+            with_db=prediction_writer is None,
             eta_predictor=eta_predictor,
             availability_predictor=availability_predictor,
+            prediction_writer=prediction_writer,
         )
     except StationDoesNotExist:
         raise HTTPException(status_code=404, detail="Station does not exist")
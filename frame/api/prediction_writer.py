@@ -0,0 +1,197 @@
+"""Write-behind buffer for predictions.
+
+Predictions are queued in memory and written to the DB in batches by a background
+thread, so requests don't wait for a commit.
+"""
+import io
+import csv
+import json
+import time
+import queue
+import threading
+from typing import Any, Dict, List, Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from frame.utils import get_logger
+from frame.models import Prediction
+from frame.constants import (
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_QUEUE_SIZE,
+    WRITE_BEHIND_FLUSH_SECONDS,
+)
+
+logger = get_logger(__name__)
+
+PREDICTION_COLUMNS = [
+    col.name
+    for col in Prediction.__table__.columns
+    if col.name not in ("id", "created_at")
+]
+
+JSON_COLUMNS = {"eta_features", "availability_features"}
+
+
+def prediction_row(prediction: Prediction) -> Dict[str, Any]:
+    """Values of a prediction to be written, keyed by column name."""
+    return {col: getattr(prediction, col) for col in PREDICTION_COLUMNS}
+
+
+def _copy_rows(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Write rows with a single COPY, only available for Postgres."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            [
+                json.dumps(row[col])
+                if col in JSON_COLUMNS and row[col] is not None
+                else row[col]
+                for col in PREDICTION_COLUMNS
+            ]
+        )
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY {Prediction.__tablename__} ({', '.join(PREDICTION_COLUMNS)}) "
+        "FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+
+
+def write_predictions(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Write many predictions at once.
+
+    Uses COPY on Postgres and an executemany insert on other dialects.
+    """
+    if not rows:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_rows(db, rows)
+    else:
+        db.execute(Prediction.__table__.insert(), rows)
+    db.commit()
+
+
+class PredictionWriter:
+    """Bounded in-memory queue of predictions, flushed in batches to the DB.
+
+    Parameters
+    ----------
+    session_factory: Callable returning a new DB session
+    max_queue_size: Max amount of predictions buffered, new ones are dropped past it
+    batch_size: Flush as soon as this many predictions are buffered
+    flush_interval: Max seconds a prediction waits in the buffer
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_queue_size: int = WRITE_BEHIND_QUEUE_SIZE,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_interval: float = WRITE_BEHIND_FLUSH_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(max_queue_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_lock = threading.Lock()
+        # Counts are updated from request threads and the flusher thread
+        self._stats_lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def put(self, prediction: Prediction) -> bool:
+        """Buffer a prediction, returns whether it was accepted."""
+        try:
+            self._queue.put_nowait(prediction_row(prediction))
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            logger.warning("Predictions buffer full, dropping prediction")
+            return False
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def flush(self) -> int:
+        """Write everything currently buffered, returns the amount of rows written."""
+        total = 0
+        with self._flush_lock:
+            while True:
+                rows = self._drain()
+                if not rows:
+                    break
+                db = self.session_factory()
+                try:
+                    write_predictions(db, rows)
+                    total += len(rows)
+                except Exception:  # pylint: disable=broad-except
+                    db.rollback()
+                    with self._stats_lock:
+                        self.failed += len(rows)
+                    logger.exception("Error writing %s predictions", len(rows))
+                finally:
+                    db.close()
+        with self._stats_lock:
+            self.written += total
+        return total
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while not self._stop.is_set():
+            self._stop.wait(min(self.flush_interval, 0.1))
+            if (
+                self.queue_depth >= self.batch_size
+                or time.monotonic() - last_flush >= self.flush_interval
+            ):
+                self.flush()
+                last_flush = time.monotonic()
+
+    def start(self) -> None:
+        """Start flushing in the background."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="prediction-writer", daemon=True
+        )
+        self._thread.start()
+        logger.info("Started predictions write-behind writer")
+
+    def stop(self) -> None:
+        """Stop the background flusher and write whatever is left."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        flushed = self.flush()
+        logger.info("Stopped predictions writer, flushed %s predictions", flushed)
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {
+                "queue_depth": self.queue_depth,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
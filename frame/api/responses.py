@@ -0,0 +1,152 @@
+"""Pre-serialized and pre-compressed responses.
+
+Responses for data that only changes on refreshes are serialized and compressed
+once per change, tagged with a content hash ETag, and then served straight from
+those bytes.
+"""
+import gzip
+import json
+import hashlib
+import threading
+from typing import Any, Dict, List, Tuple, Callable, Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers
+from fastapi.encoders import jsonable_encoder
+from starlette.middleware import gzip as starlette_gzip
+from starlette.types import Send, Scope, Message, Receive
+
+from frame.utils import get_logger
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+logger = get_logger(__name__)
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _accepted_encodings(accept_encoding: str) -> List[str]:
+    encodings = []
+    for part in accept_encoding.split(","):
+        encoding, _, params = part.strip().partition(";")
+        params = params.strip().replace(" ", "")
+        if params in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.append(encoding.strip().lower())
+    return encodings
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+class EncodedResponse:
+    """Immutable JSON body, along with its compressed versions and ETag."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.encoded: Dict[str, bytes] = {"gzip": gzip.compress(body, mtime=0)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(body)
+
+    @classmethod
+    def from_content(cls, content: Any) -> "EncodedResponse":
+        """Serialize content the same way `JSONResponse` does."""
+        return cls(
+            json.dumps(
+                jsonable_encoder(content),
+                ensure_ascii=False,
+                allow_nan=False,
+                indent=None,
+                separators=(",", ":"),
+            ).encode("utf-8")
+        )
+
+    def respond(self, request: Request) -> Response:
+        """Build a response for a request, honouring its conditional headers."""
+        headers = {"ETag": self.etag, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and _etag_matches(if_none_match, self.etag):
+            return Response(status_code=304, headers=headers)
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.encoded:
+                headers["Content-Encoding"] = encoding
+                return Response(
+                    self.encoded[encoding], media_type=JSON_MEDIA_TYPE, headers=headers
+                )
+        return Response(self.body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+class EncodedResponseCache:
+    """Keeps the encoded response of the latest version of some data.
+
+    The version is any immutable object that is swapped when data changes, such as
+    a published snapshot, and is compared by identity.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._entry: Optional[Tuple[Any, EncodedResponse]] = None
+        self._lock = threading.Lock()
+
+    def peek(self, version: Any) -> Optional[EncodedResponse]:
+        """Get the encoded response for a version, if it is already built."""
+        entry = self._entry
+        if entry is not None and entry[0] is version:
+            return entry[1]
+        return None
+
+    def latest(self) -> Optional[EncodedResponse]:
+        """Get the encoded response of the latest version built, if any."""
+        entry = self._entry
+        return entry[1] if entry is not None else None
+
+    def get(self, version: Any, build: Callable[[], Any]) -> EncodedResponse:
+        """Get the encoded response for a version, building it if it changed."""
+        encoded = self.peek(version)
+        if encoded is not None:
+            return encoded
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry[0] is version:
+                return entry[1]
+            encoded = EncodedResponse.from_content(build())
+            self._entry = (version, encoded)
+        logger.info("Encoded %s response of %s bytes", self.name, len(encoded.body))
+        return encoded
+
+
+class _GZipResponder(starlette_gzip.GZipResponder):
+    """Leaves responses that are already encoded untouched."""
+
+    encoded = False
+
+    async def send_with_gzip(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.encoded = "content-encoding" in Headers(raw=message["headers"])
+        if self.encoded:
+            await self.send(message)
+        else:
+            await super().send_with_gzip(message)
+
+
+class GZipMiddleware(starlette_gzip.GZipMiddleware):
+    """`GZipMiddleware` that does not compress pre-compressed responses again."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "gzip" in headers.get("Accept-Encoding", ""):
+                responder = _GZipResponder(
+                    self.app, self.minimum_size, compresslevel=self.compresslevel
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
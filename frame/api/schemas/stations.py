@@ -1,6 +1,8 @@
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist
+
+from frame.constants import MAX_BATCH_PREDICTIONS
 
 
 class Station(BaseModel):
@@ -27,12 +29,29 @@ class StationStatus(BaseModel):
         orm_mode = True
 
 
+class NearbyStation(Station):
+    distance: float
+    status: Optional[StationStatus] = None
+
+
+class StationStatusSample(BaseModel):
+    timestamp: int
+    num_bikes_available: int
+    num_bikes_disabled: int
+    num_docks_available: int
+    num_docks_disabled: int
+
+
 class PredictionParams(BaseModel):
     user_eta: int
     user_lat: float
     user_lon: float
 
 
+class BatchPredictionParams(PredictionParams):
+    station_ids: conlist(int, min_items=1, max_items=MAX_BATCH_PREDICTIONS)  # type: ignore
+
+
 class Prediction(PredictionParams):
     station_id: int
     bike_availability_probability: float
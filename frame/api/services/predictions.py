@@ -0,0 +1,222 @@
+"""Retention of the predictions log.
+
+Predictions older than the retention period are exported to the datalake as hive
+partitioned parquet, in the layout `parquet_partitioned_table` reads, and then
+deleted from the DB, a batch at a time.
+
+Every file is written with the same schema, `ARCHIVE_SCHEMA`, whatever the model
+versions or the features in its batch, so the whole table can be read at once.
+"""
+import json
+from pathlib import Path
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+from duckdb import DuckDBPyConnection
+
+from frame.config import cfg
+from frame.utils import get_logger
+from frame.models import Prediction
+from frame.constants import PREDICTIONS_TABLE, ARCHIVE_PREDICTIONS_BATCH_SIZE
+
+logger = get_logger(__name__)
+
+FEATURE_COLUMNS = ("eta_features", "availability_features")
+PARTITION_COLUMNS = ["year", "month", "day", "hour"]
+
+# Features logged by each model, as built by the stations service
+FEATURE_TYPES: Dict[str, Dict[str, str]] = {
+    "eta_features": {
+        "station_id": "INTEGER",
+        "hod": "INTEGER",
+        "dow": "INTEGER",
+        "num_bikes_available": "INTEGER",
+        "num_bikes_disabled": "INTEGER",
+        "num_docks_available": "INTEGER",
+        "num_docks_disabled": "INTEGER",
+        "is_holiday": "BOOLEAN",
+    },
+    "availability_features": {
+        "station_id": "INTEGER",
+        "hod": "INTEGER",
+        "dow": "INTEGER",
+        "num_bikes_available": "INTEGER",
+        "num_bikes_disabled": "INTEGER",
+        "num_docks_available": "INTEGER",
+        "num_docks_disabled": "INTEGER",
+        "minutes_bt_check": "INTEGER",
+        "is_holiday": "BOOLEAN",
+    },
+}
+
+
+def _feature_prefix(col: str) -> str:
+    return col.replace("features", "")
+
+
+# DuckDB type of every archived column. Features a model logs that are not in
+# FEATURE_TYPES are kept as JSON in its `_features_extra` column.
+ARCHIVE_SCHEMA: Dict[str, str] = {
+    "id": "BIGINT",
+    "station_id": "INTEGER",
+    "bike_availability_probability": "DOUBLE",
+    "availability_model_version": "INTEGER",
+    "bike_eta": "DOUBLE",
+    "eta_model_version": "INTEGER",
+    "user_eta": "DOUBLE",
+    "user_lat": "DOUBLE",
+    "user_lon": "DOUBLE",
+    "created_at": "TIMESTAMP",
+    **{
+        f"{_feature_prefix(col)}{name}": dtype
+        for col, types in FEATURE_TYPES.items()
+        for name, dtype in types.items()
+    },
+    **{f"{col}_extra": "VARCHAR" for col in FEATURE_COLUMNS},
+}
+
+
+@dataclass
+class ArchiveStats:
+    """Predictions moved out of the DB by a retention run."""
+
+    archived: int = 0
+    files: int = 0
+
+
+def predictions_archive_root(
+    bucket: Optional[str] = None, level: str = "silver"
+) -> str:
+    if bucket is None:
+        bucket = cfg.s3.bucket()
+    return f"s3://{bucket}/{level}/{PREDICTIONS_TABLE}"
+
+
+def predictions_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Predictions as a frame with the columns of `ARCHIVE_SCHEMA`.
+
+    Each known feature becomes a column prefixed by the name of its model, such
+    as `eta_hod`, instead of a JSON blob. Features missing from a prediction are
+    None.
+    """
+    predictions = pd.DataFrame.from_records(rows)
+    frames = [predictions.drop(columns=list(FEATURE_COLUMNS))]
+    for col in FEATURE_COLUMNS:
+        known = FEATURE_TYPES[col]
+        features = pd.DataFrame.from_records(
+            [row[col] or {} for row in rows],
+            index=predictions.index,
+            columns=list(known),
+        )
+        extra = pd.Series(
+            [_extra_features(row[col], known) for row in rows],
+            index=predictions.index,
+            name=f"{col}_extra",
+            dtype=object,
+        )
+        frames.extend([features.add_prefix(_feature_prefix(col)), extra])
+    predictions = pd.concat(frames, axis=1)
+    for col in ("user_lat", "user_lon"):
+        predictions[col] = predictions[col].astype(float)
+    return predictions.reindex(columns=list(ARCHIVE_SCHEMA))
+
+
+def _extra_features(
+    features: Optional[Dict[str, Any]], known: Dict[str, str]
+) -> Optional[str]:
+    extra = {
+        name: value for name, value in (features or {}).items() if name not in known
+    }
+    return json.dumps(extra, sort_keys=True) if extra else None
+
+
+def _partition_path(root: str, partition: tuple, first_id: int, last_id: int) -> str:
+    partition_dirs = "/".join(
+        f"{col}={value}" for col, value in zip(PARTITION_COLUMNS, partition)
+    )
+    return f"{root}/{partition_dirs}/predictions-{first_id}-{last_id}.parquet"
+
+
+def export_predictions(
+    predictions: pd.DataFrame, cursor: DuckDBPyConnection, root: str
+) -> int:
+    """Write predictions as parquet, one file per hour they were made in.
+
+    Columns are cast to `ARCHIVE_SCHEMA`, so a column that is all None in a
+    batch is still typed. Files are named after the ids they hold, so exporting
+    the same batch again overwrites them. Returns the amount of files written.
+    """
+    columns = ", ".join(
+        f"CAST({col} AS {dtype}) AS {col}" for col, dtype in ARCHIVE_SCHEMA.items()
+    )
+    created_at = pd.to_datetime(predictions["created_at"])
+    partitions = [
+        created_at.dt.year,
+        created_at.dt.month,
+        created_at.dt.day,
+        created_at.dt.hour,
+    ]
+    files = 0
+    for partition, rows in predictions.groupby(partitions):
+        path = _partition_path(root, partition, rows["id"].min(), rows["id"].max())
+        if "://" not in root:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        cursor.register("predictions_batch", rows)
+        cursor.execute(
+            f"COPY (SELECT {columns} FROM predictions_batch) TO '{path}' "
+            "(FORMAT PARQUET)"
+        )
+        cursor.unregister("predictions_batch")
+        files += 1
+    return files
+
+
+def archive_predictions(
+    db: Session,
+    cursor: DuckDBPyConnection,
+    retention_days: int,
+    root: Optional[str] = None,
+    batch_size: int = ARCHIVE_PREDICTIONS_BATCH_SIZE,
+) -> ArchiveStats:
+    """Move predictions older than retention_days from the DB to the datalake.
+
+    Batches are read in id order and each one is deleted right after it is
+    exported, so an interrupted run loses nothing and the next one picks up where
+    it stopped.
+    """
+    root = root or predictions_archive_root()
+    # created_at defaults to the DB's UTC time
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    stats = ArchiveStats()
+    last_id = 0
+    while True:
+        rows = [
+            dict(row._mapping)
+            for row in db.query(*Prediction.__table__.columns)
+            .filter(Prediction.created_at < cutoff, Prediction.id > last_id)
+            .order_by(Prediction.id)
+            .limit(batch_size)
+        ]
+        if not rows:
+            break
+        ids = [row["id"] for row in rows]
+        stats.files += export_predictions(predictions_frame(rows), cursor, root)
+        db.query(Prediction).filter(Prediction.id.in_(ids)).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        stats.archived += len(ids)
+        last_id = ids[-1]
+        logger.info("Archived %s predictions up to id %s", stats.archived, last_id)
+
+    logger.info(
+        "Archived %s predictions older than %s to %s in %s files",
+        stats.archived,
+        cutoff,
+        root,
+        stats.files,
+    )
+    return stats
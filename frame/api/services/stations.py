@@ -1,178 +1,646 @@
 """Logic for stations."""
-from typing import List
+import time
+from decimal import Decimal
 from datetime import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple, Union, Optional, Sequence
 
 import holidays
+import numpy as np
 from sqlalchemy.orm import Session
 
 from frame.utils import get_logger
-from frame.api.dependencies import MLFlowPredictor
-from frame.api.schemas.stations import PredictionParams
+from frame.models.base import upsert
+from frame.constants import GRID_USER_ETAS
+from frame.api.history import status_history
+from frame.api.prediction_writer import PredictionWriter
+from frame.api.schemas import stations as station_schemas
+from frame.api.metrics import PREDICT_PHASE, CACHE_REQUESTS
 from frame.models import Station, Prediction, StationStatus
-from frame.data.ecobici import fetch_stations_info, fetch_stations_status
+from frame.api.dependencies import LoadedModel, MLFlowPredictor
+from frame.api.grid import PredictionGrid, current_grid, publish_grid
+from frame.api.responses import EncodedResponse, EncodedResponseCache
+from frame.api.schemas.stations import PredictionParams, BatchPredictionParams
+from frame.api.spatial import (
+    StationsIndex,
+    current_stations_index,
+    publish_stations_index,
+)
+from frame.data.ecobici import (
+    STATUS_FEED,
+    STATIONS_FEED,
+    fetch_stations_info,
+    fetch_stations_status,
+)
 from frame.exceptions import (
     PredictionError,
     NoInfoForStation,
     StationDoesNotExist,
     UninitializedPredictor,
 )
+from frame.api.snapshot import (
+    COUNT_COLUMNS,
+    StationStatusRow,
+    StationsStatusSnapshot,
+    current_snapshot,
+    publish_snapshot,
+)
 
 logger = get_logger(__name__)
 
 AR_HOLIDAYS = holidays.AR()
 
+NUMERIC_COMPARISON_DECIMALS = 8
+
+IN_SERVICE = "IN_SERVICE"
+
+ENCODED_STATIONS = EncodedResponseCache("stations")
+ENCODED_STATIONS_STATUS = EncodedResponseCache("stations status")
+
 
 def get_stations(db: Session) -> List[Station]:
-    """Get all stations."""
-    return db.query(Station).all()
+    """Get all active stations."""
+    return db.query(Station).filter(Station.active).all()
+
+
+def get_encoded_stations(db: Session) -> EncodedResponse:
+    """Get all active stations, encoded once per change of the stations index."""
+    index = current_stations_index()
+    if index is None:
+        index = load_stations_index(db)
+    return ENCODED_STATIONS.get(
+        index,
+        lambda: [
+            station_schemas.Station.from_orm(station) for station in get_stations(db)
+        ],
+    )
+
+
+def peek_encoded_stations() -> Optional[EncodedResponse]:
+    """Get all stations, if already encoded for the current stations index."""
+    index = current_stations_index()
+    if index is None:
+        return None
+    return ENCODED_STATIONS.peek(index)
+
+
+def get_indexed_station(station_id: int) -> Optional[Dict[str, Any]]:
+    """Get station by id from the current stations index, if it has it."""
+    index = current_stations_index()
+    if index is None:
+        return None
+    return index.get(station_id)
 
 
 def get_station(station_id: int, db: Session) -> Station:
-    """Get station by id."""
-    station = db.query(Station).filter(Station.station_id == station_id).first()
+    """Get active station by id."""
+    station = (
+        db.query(Station)
+        .filter(Station.station_id == station_id)
+        .filter(Station.active)
+        .first()
+    )
     if station is None:
         raise StationDoesNotExist()
     return station
 
 
-def update_stations_info(db: Session) -> None:
-    """Update stations information with the latest data from the API."""
+@dataclass
+class InfoRefreshStats:
+    """Rows affected by a stations information refresh."""
+
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated
+
+
+def _normalize(value: Any) -> Any:
+    """Make DB numerics comparable with the floats from the API.
+
+    Numerics can be returned with a fixed scale by some dialects, so both sides are
+    rounded to the same amount of decimals.
+    """
+    if isinstance(value, (Decimal, float)):
+        return round(float(value), NUMERIC_COMPARISON_DECIMALS)
+    return value
+
+
+@STATIONS_FEED.reset_on_error()
+def update_stations_info(db: Session) -> InfoRefreshStats:
+    """Update stations information with the latest data from the API.
+
+    Stations are read once and diffed against the API. Only new and changed stations
+    are upserted, and active stations no longer present in the API are marked
+    inactive and have their status removed, all in a single transaction. Removed
+    stations are kept, since past predictions reference them, and are active again
+    if they are listed again.
+    """
     stations_info = fetch_stations_info()
+    if stations_info is None:
+        logger.info("Stations info did not change")
+        if current_stations_index() is None:
+            load_stations_index(db)
+        return InfoRefreshStats()
 
     columns = Station.__table__.columns.keys()
 
-    for station_info in stations_info:
-        new_station: Station
-        db_station = (
-            db.query(Station)
-            .filter(Station.station_id == station_info["station_id"])
-            .first()
-        )
+    existing_stations = {
+        row.station_id: {col: _normalize(val) for col, val in row._mapping.items()}
+        for row in db.query(*Station.__table__.columns)
+    }
+
+    stats = InfoRefreshStats()
+    new_stations: Dict[int, Dict[str, Any]] = {
+        station_info["station_id"]: {
+            **{col: _normalize(station_info.get(col)) for col in columns},
+            "active": True,
+        }
+        for station_info in stations_info
+    }
+
+    changed_stations: List[Dict[str, Any]] = []
+    for station_id, new_station in new_stations.items():
+        db_station = existing_stations.get(station_id)
         if db_station is None:
-            new_station = Station(**{col: station_info.get(col) for col in columns})
+            stats.inserted += 1
+        elif db_station != new_station:
+            stats.updated += 1
         else:
-            new_station = db_station
-            new_station.update_fields(**{col: station_info.get(col) for col in columns})
+            stats.unchanged += 1
+            continue
+        changed_stations.append(new_station)
+
+    removed_stations = {
+        station_id
+        for station_id, db_station in existing_stations.items()
+        if db_station["active"]
+    } - new_stations.keys()
+    stats.removed = len(removed_stations)
 
-        db.merge(new_station)
+    upsert(db, Station.__table__, changed_stations, index_elements=["station_id"])
+    if removed_stations:
+        logger.warning("Stations %s are no longer listed", sorted(removed_stations))
+        db.query(Station).filter(Station.station_id.in_(removed_stations)).update(
+            {Station.active: False}, synchronize_session=False
+        )
+        db.query(StationStatus).filter(
+            StationStatus.station_id.in_(removed_stations)
+        ).delete(synchronize_session=False)
     db.commit()
 
+    if removed_stations and current_snapshot() is not None:
+        load_stations_status_snapshot(db)
+    if stats.changed or removed_stations or current_stations_index() is None:
+        publish_stations_index(StationsIndex(new_stations.values()))
+
+    logger.info(
+        "Stations info refreshed: %s changed, %s unchanged, %s removed",
+        stats.changed,
+        stats.unchanged,
+        stats.removed,
+    )
+    return stats
+
+
+def load_stations_index(db: Session) -> StationsIndex:
+    """Build a spatial index of all active stations from the DB and publish it."""
+    index = StationsIndex(
+        row._mapping
+        for row in db.query(*Station.__table__.columns).filter(Station.active)
+    )
+    publish_stations_index(index)
+    return index
+
+
+def get_nearby_stations(
+    lat: float,
+    lon: float,
+    k: int,
+    db: Optional[Session],
+    radius: Optional[float] = None,
+    with_status: bool = False,
+) -> List[Dict[str, Any]]:
+    """Get the k stations closest to a point, optionally within radius meters.
+
+    Stations come with their distance in meters and, if asked for, their current
+    status, which is None for stations not in service. The DB is only used if the
+    stations index or status snapshot are not loaded yet.
+    """
+    index = current_stations_index()
+    if index is None:
+        index = load_stations_index(db)
+    snapshot = None
+    if with_status:
+        snapshot = current_snapshot()
+        if snapshot is None:
+            snapshot = load_stations_status_snapshot(db)
 
-def update_stations_status(db: Session) -> None:
-    """Update stations status with the latest data from the API."""
+    return [
+        {
+            **station,
+            "distance": distance,
+            "status": (
+                snapshot.get(station["station_id"]) if snapshot is not None else None
+            ),
+        }
+        for station, distance in index.nearest(lat, lon, k, radius)
+    ]
+
+
+@dataclass
+class StatusRefreshStats:
+    """Rows affected by a stations status refresh."""
+
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated
+
+
+@STATUS_FEED.reset_on_error()
+def update_stations_status(db: Session) -> StatusRefreshStats:
+    """Update stations status with the latest data from the API.
+
+    Known stations and existing status are read once, and only the status that
+    changed since the last refresh are written with a single bulk upsert, so the
+    amount of queries does not grow with the amount of stations.
+    """
     stations_status = fetch_stations_status()
+    if stations_status is None:
+        logger.info("Stations status did not change")
+        snapshot = current_snapshot()
+        if snapshot is None:
+            snapshot = load_stations_status_snapshot(db)
+        record_status_history(snapshot)
+        return StatusRefreshStats()
 
     columns = StationStatus.__table__.columns.keys()
 
+    known_stations = {
+        station_id
+        for (station_id,) in db.query(Station.station_id).filter(Station.active)
+    }
+    existing_status = {
+        row.station_id: dict(row._mapping)
+        for row in db.query(*StationStatus.__table__.columns)
+    }
+
+    stats = StatusRefreshStats()
+    new_stations_status: Dict[int, Dict[str, Any]] = {}
     for station_status in stations_status:
         if station_status["status"] == "END_OF_LIFE":
             logger.warning("Skipping %s, since it's marked as EOL", station_status)
+            stats.skipped += 1
             continue
 
-        if (
-            db.query(Station)
-            .filter(Station.station_id == station_status["station_id"])
-            .first()
-            is None
-        ):
+        if station_status["station_id"] not in known_stations:
             logger.warning(
                 "Skipping %s, since there's no info for such station", station_status
             )
+            stats.skipped += 1
             continue
 
-        new_station_status: StationStatus
+        new_stations_status[station_status["station_id"]] = {
+            col: station_status.get(col) for col in columns
+        }
 
-        db_station_status = (
-            db.query(StationStatus)
-            .filter(StationStatus.station_id == station_status["station_id"])
-            .first()
-        )
+    changed_stations_status: List[Dict[str, Any]] = []
+    for station_id, new_station_status in new_stations_status.items():
+        db_station_status = existing_status.get(station_id)
         if db_station_status is None:
-            new_station_status = StationStatus(
-                **{col: station_status.get(col) for col in columns}
-            )
+            stats.inserted += 1
+        elif db_station_status != new_station_status:
+            stats.updated += 1
         else:
-            new_station_status = db_station_status
-            new_station_status.update_fields(
-                **{col: station_status.get(col) for col in columns}
-            )
-        db.merge(new_station_status)
+            stats.unchanged += 1
+            continue
+        changed_stations_status.append(new_station_status)
+
+    upsert(
+        db,
+        StationStatus.__table__,
+        changed_stations_status,
+        index_elements=["station_id"],
+    )
     db.commit()
 
+    # Keep the current snapshot if nothing changed, so what is derived from it,
+    # such as encoded responses and the prediction grid, stays valid
+    snapshot = current_snapshot()
+    if stats.changed or snapshot is None:
+        for changed_station_status in changed_stations_status:
+            existing_status[
+                changed_station_status["station_id"]
+            ] = changed_station_status
+        snapshot = StationsStatusSnapshot.from_rows(
+            row for row in existing_status.values() if row["status"] == IN_SERVICE
+        )
+        publish_snapshot(snapshot)
+    record_status_history(snapshot)
+
+    logger.info(
+        "Stations status refreshed: %s changed, %s unchanged",
+        stats.changed,
+        stats.unchanged,
+    )
+    return stats
+
+
+def load_stations_status_snapshot(db: Session) -> StationsStatusSnapshot:
+    """Build a snapshot of the status of all stations from the DB and publish it."""
+    snapshot = StationsStatusSnapshot.from_rows(
+        row._mapping
+        for row in db.query(*StationStatus.__table__.columns).filter(
+            StationStatus.status == IN_SERVICE
+        )
+    )
+    publish_snapshot(snapshot)
+    return snapshot
+
+
+def record_status_history(snapshot: StationsStatusSnapshot) -> None:
+    """Append a snapshot to the status history, if it is enabled."""
+    history = status_history()
+    if history is not None:
+        history.append(snapshot)
+
+
+def get_station_status_history(station_id: int, minutes: int) -> List[Dict[str, int]]:
+    """Get the status of a station over the last minutes, oldest first."""
+    history = status_history()
+    if history is None:
+        raise NoInfoForStation()
+    since = int(time.time()) - minutes * 60
+    samples = history.window(station_id, since)
+    if not samples:
+        raise NoInfoForStation()
+    return [
+        {"timestamp": timestamp, **dict(zip(COUNT_COLUMNS, counts))}
+        for timestamp, counts in samples
+    ]
+
+
+def get_stations_status(db: Session) -> List[Union[StationStatus, StationStatusRow]]:
+    """Get status for all stations.
+
+    Served from the latest snapshot, falling back to the DB if there is none yet.
+    """
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return snapshot.rows()
 
-def get_stations_status(db: Session) -> List[StationStatus]:
-    """Get status for all stations."""
     stations_status = (
-        db.query(StationStatus).filter(StationStatus.status == "IN_SERVICE").all()
+        db.query(StationStatus).filter(StationStatus.status == IN_SERVICE).all()
     )
     return stations_status
 
 
-def get_station_status(station_id: int, db: Session) -> StationStatus:
-    """Get station status by id."""
-    station_status = (
-        db.query(StationStatus)
-        .filter(StationStatus.station_id == station_id)
-        .filter(StationStatus.status == "IN_SERVICE")
-        .first()
+def peek_encoded_stations_status() -> Optional[EncodedResponse]:
+    """Get status for all stations, if already encoded for the current snapshot."""
+    snapshot = current_snapshot()
+    if snapshot is None:
+        return None
+    return ENCODED_STATIONS_STATUS.peek(snapshot)
+
+
+def get_encoded_stations_status(db: Session) -> Optional[EncodedResponse]:
+    """Get status for all stations, encoded once per snapshot.
+
+    Returns None if there is no snapshot yet.
+    """
+    snapshot = current_snapshot()
+    if snapshot is None:
+        return None
+    return ENCODED_STATIONS_STATUS.get(
+        snapshot,
+        lambda: [
+            station_schemas.StationStatus.from_orm(row) for row in snapshot.rows()
+        ],
     )
+
+
+def get_station_status(
+    station_id: int, db: Optional[Session]
+) -> Union[StationStatus, StationStatusRow]:
+    """Get station status by id.
+
+    Served from the latest snapshot, falling back to the DB if there is none yet.
+    """
+    station_status: Optional[Union[StationStatus, StationStatusRow]]
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        station_status = snapshot.get(station_id)
+    else:
+        station_status = (
+            db.query(StationStatus)
+            .filter(StationStatus.station_id == station_id)
+            .filter(StationStatus.status == IN_SERVICE)
+            .first()
+        )
     if station_status is None:
         raise NoInfoForStation()
     return station_status
 
 
-def predict(
-    station_id: int,
-    prediction_params: PredictionParams,
-    db: Session,
+def update_prediction_grid(
     eta_predictor: MLFlowPredictor,
     availability_predictor: MLFlowPredictor,
-) -> Prediction:
-    """Predict availability of bike in a given station at some point in the future.
+    user_etas: Sequence[int] = GRID_USER_ETAS,
+) -> Optional[PredictionGrid]:
+    """Precompute predictions for every in service station and user ETA.
 
-    This method not only returns the probability of availability at a given time, but
-    also the estimated time of arrival of a bike after said point, were the prediction
-    that no bikes will be available by then.
+    The grid is built from the current status snapshot and published, so that
+    predictions for the same snapshot, hour and models become lookups.
     """
+    snapshot = current_snapshot()
+    if (
+        snapshot is None
+        or len(snapshot) == 0
+        or not eta_predictor.initialized
+        or not availability_predictor.initialized
+    ):
+        logger.info("Skipping prediction grid, no status or models loaded yet")
+        return None
 
     current_time = datetime.now()
-    station_status = get_station_status(station_id, db)
+    stations_status = snapshot.rows()
+
+    eta_features = [
+        build_eta_features(station_status.station_id, station_status, current_time)
+        for station_status in stations_status
+    ]
+    availability_features = [
+        build_availability_features(
+            station_status.station_id, station_status, current_time, user_eta
+        )
+        for station_status in stations_status
+        for user_eta in user_etas
+    ]
 
     try:
-        eta_features = {
-            "station_id": station_id,
-            "hod": current_time.hour,
-            "dow": (current_time.weekday() + 1) % 7,
-            "num_bikes_available": station_status.num_bikes_available,
-            "num_bikes_disabled": station_status.num_bikes_disabled,
-            "num_docks_available": station_status.num_docks_available,
-            "num_docks_disabled": station_status.num_docks_disabled,
-            "is_holiday": current_time.date() in AR_HOLIDAYS,
-        }
-        bike_eta = eta_predictor.predict(**eta_features)
+        eta_model = eta_predictor.current()
+        availability_model = availability_predictor.current()
+    except UninitializedPredictor:
+        logger.exception("Error building prediction grid")
+        return None
+
+    bike_etas = eta_model.predict_many(_to_columns(eta_features))
+    availability = availability_model.predict_many(
+        _to_columns(availability_features)
+    ).reshape(len(stations_status), len(user_etas))
+
+    grid = PredictionGrid(
+        snapshot,
+        hod=current_time.hour,
+        dow=(current_time.weekday() + 1) % 7,
+        day=current_time.date(),
+        user_etas=user_etas,
+        bike_etas=np.asarray(bike_etas, dtype=np.float64),
+        availability=np.asarray(availability, dtype=np.float64),
+        eta_model_version=eta_model.version,
+        availability_model_version=availability_model.version,
+    )
+    publish_grid(grid)
+    return grid
+
+
+def save_predictions(
+    predictions: List[Prediction],
+    db: Optional[Session],
+    prediction_writer: Optional[PredictionWriter] = None,
+) -> None:
+    """Persist predictions.
+
+    If a writer is given, predictions are buffered to be written in the background
+    instead of being committed right away.
+    """
+    if prediction_writer is not None:
+        for prediction in predictions:
+            prediction_writer.put(prediction)
+        return
+
+    db.add_all(predictions)
+    db.commit()
+
+
+def build_eta_features(
+    station_id: int,
+    station_status: Union[StationStatus, StationStatusRow],
+    current_time: datetime,
+) -> Dict[str, Any]:
+    """Features for the ETA model."""
+    return {
+        "station_id": station_id,
+        "hod": current_time.hour,
+        "dow": (current_time.weekday() + 1) % 7,
+        "num_bikes_available": station_status.num_bikes_available,
+        "num_bikes_disabled": station_status.num_bikes_disabled,
+        "num_docks_available": station_status.num_docks_available,
+        "num_docks_disabled": station_status.num_docks_disabled,
+        "is_holiday": current_time.date() in AR_HOLIDAYS,
+    }
+
+
+def build_availability_features(
+    station_id: int,
+    station_status: Union[StationStatus, StationStatusRow],
+    current_time: datetime,
+    user_eta: int,
+) -> Dict[str, Any]:
+    """Features for the availability model."""
+    return {
+        "station_id": station_id,
+        "hod": current_time.hour,
+        "dow": (current_time.weekday() + 1) % 7,
+        "num_bikes_available": station_status.num_bikes_available,
+        "num_bikes_disabled": station_status.num_bikes_disabled,
+        "num_docks_available": station_status.num_docks_available,
+        "num_docks_disabled": station_status.num_docks_disabled,
+        "minutes_bt_check": user_eta,
+        "is_holiday": current_time.date() in AR_HOLIDAYS,
+    }
+
+
+def _current_models(
+    eta_predictor: MLFlowPredictor, availability_predictor: MLFlowPredictor
+) -> Tuple[LoadedModel, LoadedModel]:
+    """Get the models to predict with, so a reload mid request can't mix versions."""
+    try:
+        eta_model = eta_predictor.current()
     except UninitializedPredictor:
         logger.exception("Error predicting ETA")
         raise PredictionError("Uninitialized ETA predictor")
 
     try:
-        availability_features = {
-            "station_id": station_id,
-            "hod": current_time.hour,
-            "dow": (current_time.weekday() + 1) % 7,
-            "num_bikes_available": station_status.num_bikes_available,
-            "num_bikes_disabled": station_status.num_bikes_disabled,
-            "num_docks_available": station_status.num_docks_available,
-            "num_docks_disabled": station_status.num_docks_disabled,
-            "minutes_bt_check": prediction_params.user_eta,
-            "is_holiday": current_time.date() in AR_HOLIDAYS,
-        }
-        availability_probability = availability_predictor.predict(
-            **availability_features
-        )
+        availability_model = availability_predictor.current()
     except UninitializedPredictor:
         logger.exception("Error predicting availability")
         raise PredictionError("Uninitialized availability predictor")
 
+    return eta_model, availability_model
+
+
+def predict(
+    station_id: int,
+    prediction_params: PredictionParams,
+    db: Optional[Session],
+    eta_predictor: MLFlowPredictor,
+    availability_predictor: MLFlowPredictor,
+    prediction_writer: Optional[PredictionWriter] = None,
+) -> Prediction:
+    """Predict availability of bike in a given station at some point in the future.
+
+    This method not only returns the probability of availability at a given time, but
+    also the estimated time of arrival of a bike after said point, were the prediction
+    that no bikes will be available by then. The DB is only used if there is no
+    status snapshot yet or no predictions writer.
+    """
+
+    current_time = datetime.now()
+    with PREDICT_PHASE.labels("status_read").time():
+        station_status = get_station_status(station_id, db)
+
+    with PREDICT_PHASE.labels("feature_build").time():
+        eta_features = build_eta_features(station_id, station_status, current_time)
+        availability_features = build_availability_features(
+            station_id, station_status, current_time, prediction_params.user_eta
+        )
+
+    eta_model, availability_model = _current_models(
+        eta_predictor, availability_predictor
+    )
+
+    cell = None
+    grid = current_grid()
+    if grid is not None and grid.valid_for(
+        current_snapshot(),
+        current_time,
+        eta_model.version,
+        availability_model.version,
+    ):
+        cell = grid.lookup(station_id, prediction_params.user_eta)
+
+    if cell is not None:
+        CACHE_REQUESTS.labels("prediction_grid", "hit").inc()
+        bike_eta, availability_probability = cell
+    else:
+        CACHE_REQUESTS.labels("prediction_grid", "miss").inc()
+        with PREDICT_PHASE.labels("eta_inference").time():
+            bike_eta = eta_model.predict(**eta_features)
+        with PREDICT_PHASE.labels("availability_inference").time():
+            availability_probability = availability_model.predict(
+                **availability_features
+            )
+
     new_prediction = Prediction(
         station_id=station_id,
         bike_availability_probability=availability_probability,
@@ -180,12 +648,99 @@ def predict(
         user_eta=prediction_params.user_eta,
         user_lat=prediction_params.user_lat,
         user_lon=prediction_params.user_lon,
-        eta_model_version=eta_predictor.model_version,
-        availability_model_version=availability_predictor.model_version,
+        eta_model_version=eta_model.version,
+        availability_model_version=availability_model.version,
         eta_features=eta_features,
         availability_features=availability_features,
     )
     logger.debug("Prediction made: %s", new_prediction)
-    db.add(new_prediction)
-    db.commit()
+    with PREDICT_PHASE.labels("db_commit").time():
+        save_predictions([new_prediction], db, prediction_writer)
     return new_prediction
+
+
+def _to_columns(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    return {col: [row[col] for row in rows] for col in rows[0]}
+
+
+def predict_many(
+    prediction_params: BatchPredictionParams,
+    db: Optional[Session],
+    eta_predictor: MLFlowPredictor,
+    availability_predictor: MLFlowPredictor,
+    prediction_writer: Optional[PredictionWriter] = None,
+) -> List[Prediction]:
+    """Predict availability of bikes for many stations at once.
+
+    Features for all the stations are built into a single frame, so each model is
+    run once for the whole batch. Stations with no status, unknown or not in
+    service, are skipped, so fewer predictions than stations may be returned. As with
+    `predict`, the DB is only used if there is no status snapshot or writer.
+    """
+
+    current_time = datetime.now()
+
+    stations_status: Dict[int, Union[StationStatus, StationStatusRow]] = {}
+    with PREDICT_PHASE.labels("status_read").time():
+        for station_id in dict.fromkeys(prediction_params.station_ids):
+            try:
+                stations_status[station_id] = get_station_status(station_id, db)
+            except NoInfoForStation:
+                logger.warning("Skipping station %s, it has no status", station_id)
+
+    if not stations_status:
+        return []
+
+    with PREDICT_PHASE.labels("feature_build").time():
+        eta_features = [
+            build_eta_features(station_id, station_status, current_time)
+            for station_id, station_status in stations_status.items()
+        ]
+        availability_features = [
+            build_availability_features(
+                station_id, station_status, current_time, prediction_params.user_eta
+            )
+            for station_id, station_status in stations_status.items()
+        ]
+
+    eta_model, availability_model = _current_models(
+        eta_predictor, availability_predictor
+    )
+    with PREDICT_PHASE.labels("eta_inference").time():
+        bike_etas = eta_model.predict_many(_to_columns(eta_features))
+    with PREDICT_PHASE.labels("availability_inference").time():
+        availability_probabilities = availability_model.predict_many(
+            _to_columns(availability_features)
+        )
+
+    new_predictions = [
+        Prediction(
+            station_id=station_id,
+            bike_availability_probability=availability_probability,
+            bike_eta=bike_eta,
+            user_eta=prediction_params.user_eta,
+            user_lat=prediction_params.user_lat,
+            user_lon=prediction_params.user_lon,
+            eta_model_version=eta_model.version,
+            availability_model_version=availability_model.version,
+            eta_features=station_eta_features,
+            availability_features=station_availability_features,
+        )
+        for (
+            station_id,
+            bike_eta,
+            availability_probability,
+            station_eta_features,
+            station_availability_features,
+        ) in zip(
+            stations_status,
+            bike_etas.tolist(),
+            availability_probabilities.tolist(),
+            eta_features,
+            availability_features,
+        )
+    ]
+    logger.debug("Made %s predictions", len(new_predictions))
+    with PREDICT_PHASE.labels("db_commit").time():
+        save_predictions(new_predictions, db, prediction_writer)
+    return new_predictions
@@ -0,0 +1,135 @@
+"""In-process snapshot of the stations status.
+
+Every refresh of the stations status builds a new immutable snapshot of the
+IN_SERVICE stations and swaps it in, so reads can be served from memory without
+going to the DB.
+"""
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, List, Iterable, Optional
+
+import numpy as np
+
+from frame.utils import get_logger
+
+logger = get_logger(__name__)
+
+COUNT_COLUMNS = (
+    "num_bikes_available",
+    "num_bikes_disabled",
+    "num_docks_available",
+    "num_docks_disabled",
+)
+
+NO_LAST_REPORTED = -1
+
+
+@dataclass(frozen=True)
+class StationStatusRow:
+    """Status of a single station, as read from a snapshot."""
+
+    station_id: int
+    num_bikes_available: int
+    num_bikes_disabled: int
+    num_docks_available: int
+    num_docks_disabled: int
+    last_reported: Optional[int]
+    status: str = "IN_SERVICE"
+
+
+class StationsStatusSnapshot:
+    """Immutable, array-backed status of every IN_SERVICE station.
+
+    Stations are kept sorted by id, so lookups are a binary search over a single
+    contiguous array.
+    """
+
+    __slots__ = ("station_ids", "counts", "last_reported", "created_at")
+
+    def __init__(
+        self,
+        station_ids: np.ndarray,
+        counts: np.ndarray,
+        last_reported: np.ndarray,
+        created_at: Optional[datetime] = None,
+    ):
+        order = np.argsort(station_ids, kind="stable")
+        self.station_ids = np.ascontiguousarray(station_ids[order], dtype=np.int64)
+        self.counts = np.ascontiguousarray(counts[order], dtype=np.int32)
+        self.last_reported = np.ascontiguousarray(last_reported[order], dtype=np.int64)
+        self.created_at = created_at or datetime.now()
+        for arr in (self.station_ids, self.counts, self.last_reported):
+            arr.flags.writeable = False
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "StationsStatusSnapshot":
+        """Build a snapshot from status rows, keyed by column name."""
+        rows = list(rows)
+        station_ids = np.fromiter(
+            (row["station_id"] for row in rows), dtype=np.int64, count=len(rows)
+        )
+        counts = np.array(
+            [[row[col] for col in COUNT_COLUMNS] for row in rows], dtype=np.int32
+        ).reshape(len(rows), len(COUNT_COLUMNS))
+        last_reported = np.fromiter(
+            (
+                NO_LAST_REPORTED
+                if row.get("last_reported") is None
+                else row["last_reported"]
+                for row in rows
+            ),
+            dtype=np.int64,
+            count=len(rows),
+        )
+        return cls(station_ids, counts, last_reported)
+
+    def __len__(self) -> int:
+        return len(self.station_ids)
+
+    def __contains__(self, station_id: int) -> bool:
+        return self.index(station_id) is not None
+
+    def index(self, station_id: int) -> Optional[int]:
+        """Position of a station in the snapshot arrays, if it is in service."""
+        idx = int(np.searchsorted(self.station_ids, station_id))
+        if idx < len(self.station_ids) and self.station_ids[idx] == station_id:
+            return idx
+        return None
+
+    def _row(self, idx: int) -> StationStatusRow:
+        last_reported = int(self.last_reported[idx])
+        return StationStatusRow(
+            int(self.station_ids[idx]),
+            *(int(count) for count in self.counts[idx]),
+            last_reported=None if last_reported == NO_LAST_REPORTED else last_reported,
+        )
+
+    def get(self, station_id: int) -> Optional[StationStatusRow]:
+        """Get the status of a station, if it is in service."""
+        idx = self.index(station_id)
+        if idx is None:
+            return None
+        return self._row(idx)
+
+    def rows(self) -> List[StationStatusRow]:
+        """Get the status of every station in the snapshot."""
+        return [self._row(idx) for idx in range(len(self))]
+
+
+_snapshot: Optional[StationsStatusSnapshot] = None
+
+
+def current_snapshot() -> Optional[StationsStatusSnapshot]:
+    """Get the latest published snapshot, if any."""
+    return _snapshot
+
+
+def publish_snapshot(snapshot: StationsStatusSnapshot) -> None:
+    """Swap the current snapshot for a new one.
+
+    Readers hold a reference to the snapshot they got, which is never mutated, so
+    rebinding the module reference is enough to make the swap atomic.
+    """
+    global _snapshot  # pylint: disable=global-statement
+    _snapshot = snapshot
+    logger.info("Published stations status snapshot with %s stations", len(snapshot))
@@ -0,0 +1,94 @@
+"""Spatial index of stations.
+
+Stations are placed on the unit sphere and indexed with a KD-tree, so the closest
+stations to a point are found without scanning the whole network. Euclidean chord
+lengths on the sphere map monotonically to great-circle distances, so the tree
+yields exact haversine neighbours.
+"""
+from typing import Any, Dict, List, Tuple, Iterable, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from frame.utils import get_logger
+from frame.constants import EARTH_RADIUS_METERS
+
+logger = get_logger(__name__)
+
+
+def _to_unit_sphere(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack(
+        (np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat))
+    )
+
+
+def _chord_to_meters(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def _meters_to_chord(meters: float) -> float:
+    return 2 * np.sin(min(meters / EARTH_RADIUS_METERS, np.pi) / 2)
+
+
+class StationsIndex:
+    """Immutable KD-tree over the location of stations.
+
+    Parameters
+    ----------
+    stations: Stations info, keyed by column name, with at least `lat` and `lon`
+    """
+
+    def __init__(self, stations: Iterable[Dict[str, Any]]):
+        self.stations = [dict(station) for station in stations]
+        self.by_id = {station["station_id"]: station for station in self.stations}
+        lat = np.array([station["lat"] for station in self.stations], dtype=float)
+        lon = np.array([station["lon"] for station in self.stations], dtype=float)
+        self.tree = cKDTree(_to_unit_sphere(lat, lon).reshape(-1, 3))
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def get(self, station_id: int) -> Optional[Dict[str, Any]]:
+        """Get a station by id, if it is indexed."""
+        return self.by_id.get(station_id)
+
+    def nearest(
+        self, lat: float, lon: float, k: int, radius: Optional[float] = None
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Get up to k stations closest to a point, with their distance in meters.
+
+        Stations further than radius meters away are left out.
+        """
+        k = min(k, len(self))
+        if k == 0:
+            return []
+        upper_bound = np.inf if radius is None else _meters_to_chord(radius)
+        chords, idxs = self.tree.query(
+            _to_unit_sphere(np.array([lat]), np.array([lon]))[0],
+            k=k,
+            distance_upper_bound=upper_bound,
+        )
+        chords, idxs = np.atleast_1d(chords), np.atleast_1d(idxs)
+        found = np.isfinite(chords)
+        return [
+            (self.stations[idx], distance)
+            for idx, distance in zip(
+                idxs[found].tolist(), _chord_to_meters(chords[found]).tolist()
+            )
+        ]
+
+
+_index: Optional[StationsIndex] = None
+
+
+def current_stations_index() -> Optional[StationsIndex]:
+    """Get the latest published stations index, if any."""
+    return _index
+
+
+def publish_stations_index(index: StationsIndex) -> None:
+    """Swap the current stations index for a new one."""
+    global _index  # pylint: disable=global-statement
+    _index = index
+    logger.info("Published stations index with %s stations", len(index))
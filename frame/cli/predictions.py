@@ -0,0 +1,35 @@
+from typing import Optional
+
+import typer
+
+from frame.utils import get_logger
+from frame.data.datalake import connect
+from frame.models.base import SessionLocal
+from frame.api.services.predictions import archive_predictions
+from frame.constants import PREDICTION_RETENTION_DAYS, ARCHIVE_PREDICTIONS_BATCH_SIZE
+
+logger = get_logger(__name__)
+
+cli = typer.Typer()
+
+
+@cli.command()
+def archive(
+    retention_days: int = typer.Option(
+        PREDICTION_RETENTION_DAYS, min=0, help="Keep predictions this many days"
+    ),
+    batch_size: int = typer.Option(
+        ARCHIVE_PREDICTIONS_BATCH_SIZE, min=1, help="Predictions moved per batch"
+    ),
+    root: Optional[str] = typer.Option(
+        None, help="Where to write the parquet files, the datalake by default"
+    ),
+):
+    """Move predictions older than the retention period to the datalake."""
+    db = SessionLocal()
+    try:
+        archive_predictions(
+            db, connect(), retention_days, root=root, batch_size=batch_size
+        )
+    finally:
+        db.close()
@@ -2,7 +2,8 @@
 
 import enum
 import pathlib
-from typing import Dict, Callable
+import tempfile
+from typing import Dict, Tuple, Callable
 
 from sklearn.metrics import (
     roc_auc_score,
@@ -28,9 +29,26 @@ ECOBICI_API = "https://apitransporte.buenosaires.gob.ar/ecobici/gbfs/{endpoint}?
 POOL_SIZE: int = 50
 MAX_OVERFLOW: int = 200
 
+INFERENCE_WORKERS: int = 4
+INFERENCE_BATCH_SIZE: int = 32
+INFERENCE_BATCH_WINDOW_SECONDS: float = 0.002
+
+UPSERT_BATCH_SIZE: int = 1000
+
+WRITE_BEHIND_QUEUE_SIZE: int = 10_000
+WRITE_BEHIND_BATCH_SIZE: int = 500
+WRITE_BEHIND_FLUSH_SECONDS: float = 1.0
+
 STATUS_ENDPOINT = "stationStatus"
 STATIONS_ENDPOINT = "stationInformation"
 
+GBFS_POOL_SIZE: int = 4
+GBFS_TIMEOUT_SECONDS: float = 30.0
+GBFS_MAX_ATTEMPTS: int = 8
+GBFS_MAX_RETRY_SECONDS: float = 120.0
+GBFS_BACKOFF_MULTIPLIER: float = 1.0
+GBFS_BACKOFF_MAX_SECONDS: float = 20.0
+
 
 class MLFlowStage(str, enum.Enum):
     Staging = "Staging"
@@ -74,5 +92,61 @@ FALLBACK_KEY: str = "fallback"
 
 MODEL_RELOAD_SECONDS: int = 60 * 5
 
+MAX_BATCH_PREDICTIONS: int = 500
+
+PREDICTION_CACHE_SIZE: int = 10_000
+
+MODELS_CACHE_DIR: pathlib.Path = pathlib.Path(tempfile.gettempdir()) / "frame-models"
+MODELS_CACHE_MAX_BYTES: int = 2 * 1024**3
+
+GRID_MIN_USER_ETA: int = 0
+GRID_MAX_USER_ETA: int = 30
+GRID_USER_ETAS: range = range(GRID_MIN_USER_ETA, GRID_MAX_USER_ETA + 1)
+
+REFRESH_STATIONS_STATUS_SECONDS: int = 30
+
+LEADER_LOCK_KEY: int = 0x6672616D65
+LEADER_LOCK_FILE: pathlib.Path = (
+    pathlib.Path(tempfile.gettempdir()) / "frame-leader.lock"
+)
+STATIONS_INFO_SIGNAL: str = "stations_info"
+STATIONS_STATUS_SIGNAL: str = "stations_status"
+MODEL_SIGNAL: str = "model_{model}"
+REFRESH_CHANNEL: str = "frame:refresh"
+
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+DURATION_BUCKETS: Tuple[float, ...] = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+BATCH_SIZE_BUCKETS: Tuple[float, ...] = (1, 2, 4, 8, 16, 32, 64, 128)
+
+EARTH_RADIUS_METERS: float = 6_371_008.8
+NEARBY_STATIONS: int = 5
+MAX_NEARBY_STATIONS: int = 100
+
+STATUS_HISTORY_HOURS: int = 6
+STATUS_HISTORY_MAX_STATIONS: int = 1024
+
+PREDICTIONS_TABLE: str = "predictions"
+PREDICTION_RETENTION_DAYS: int = 90
+ARCHIVE_PREDICTIONS_SECONDS: int = 60 * 60 * 24
+ARCHIVE_PREDICTIONS_BATCH_SIZE: int = 10_000
+
 JOBLIB_COMPRESSION_ALGORITHM: str = "lzma"
 JOBLIB_COMPRESSION_LEVEL: int = 3
+
+ARTIFACT_SUFFIX: str = ".joblib"
+SERVING_ARTIFACT_SUFFIX: str = ".serving.joblib"
+SERVING_JOBLIB_COMPRESSION: int = 0
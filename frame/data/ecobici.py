@@ -1,18 +1,32 @@
+import time
 import logging
+import threading
+from http import HTTPStatus
 from functools import partial
-from typing import Any, Dict, List, Literal, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, List, Literal, Iterator, Optional
 
 import requests
 import tenacity
 from pydantic import BaseModel
 
 from frame.utils import get_logger
-from frame.config import BA_BIKES_CREDS
-from frame.constants import ECOBICI_API, STATUS_ENDPOINT, STATIONS_ENDPOINT
+from frame.config import BA_BIKES_CREDS, cfg
+from frame.constants import (
+    ECOBICI_API,
+    GBFS_POOL_SIZE,
+    STATUS_ENDPOINT,
+    GBFS_MAX_ATTEMPTS,
+    STATIONS_ENDPOINT,
+    GBFS_TIMEOUT_SECONDS,
+    GBFS_MAX_RETRY_SECONDS,
+    GBFS_BACKOFF_MULTIPLIER,
+    GBFS_BACKOFF_MAX_SECONDS,
+)
 
 logger = get_logger(__name__)
 
-BASE_URL = partial(ECOBICI_API.format, **BA_BIKES_CREDS)  # noqa: E501
+BASE_URL = partial(cfg.ecobici.api(default=ECOBICI_API).format, **BA_BIKES_CREDS)
 
 
 class EcobiciStationStatus(BaseModel):
@@ -49,45 +63,153 @@ class EcobiciStationInfo(BaseModel):
     station_id: str
 
 
-@tenacity.retry(
-    wait=tenacity.wait_fixed(30),
-    retry=tenacity.retry_if_exception_type(requests.exceptions.HTTPError),
-    stop=tenacity.stop_after_attempt(30),
-    before=tenacity.before_log(logger, logging.INFO),
-)
-def fetch_stations_status() -> List[EcobiciStationStatus]:
-    """Fetch stations' status from the EcoBici API."""
+class GBFSFeed:
+    """A GBFS feed, fetched over a pooled keep-alive session.
+
+    Feeds are requested conditionally with the ETag and Last-Modified of the last
+    response, are not requested again while within the feed's `ttl`, and are only
+    parsed and returned when their `last_updated` changed.
+
+    Parameters
+    ----------
+    endpoint: Name of the feed in the GBFS API
+    session: Session used to make the requests
+    timeout: Seconds to wait for the API to answer
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        session: requests.Session,
+        timeout: float = GBFS_TIMEOUT_SECONDS,
+    ):
+        self.endpoint = endpoint
+        self.session = session
+        self.timeout = timeout
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.last_updated: Optional[int] = None
+        self.ttl: int = 0
+        self.fetched_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return BASE_URL(endpoint=self.endpoint)
+
+    def reset(self) -> None:
+        """Forget about the last response, so that the next fetch is not skipped."""
+        with self._lock:
+            self.etag = None
+            self.last_modified = None
+            self.last_updated = None
+            self.ttl = 0
+            self.fetched_at = None
+
+    @contextmanager
+    def reset_on_error(self) -> Iterator[None]:
+        """Reset the feed if the block fails, such as when writing what was fetched.
+
+        Otherwise the next fetch would find the feed not modified, and the update
+        would be lost until the feed changes again. Also usable as a decorator.
+        """
+        try:
+            yield
+        except Exception:
+            logger.warning("Resetting feed %s after an error", self.endpoint)
+            self.reset()
+            raise
+
+    def _fresh(self) -> bool:
+        return (
+            self.fetched_at is not None
+            and time.monotonic() - self.fetched_at < self.ttl
+        )
+
+    @tenacity.retry(
+        wait=tenacity.wait_random_exponential(
+            multiplier=GBFS_BACKOFF_MULTIPLIER, max=GBFS_BACKOFF_MAX_SECONDS
+        ),
+        retry=tenacity.retry_if_exception_type(
+            (
+                requests.exceptions.HTTPError,
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            )
+        ),
+        stop=(
+            tenacity.stop_after_attempt(GBFS_MAX_ATTEMPTS)
+            | tenacity.stop_after_delay(GBFS_MAX_RETRY_SECONDS)
+        ),
+        before=tenacity.before_log(logger, logging.INFO),
+        reraise=True,
+    )
+    def fetch(self) -> Optional[List[Dict[str, Any]]]:
+        """Fetch the stations in the feed, or None if the feed did not change."""
+        with self._lock:
+            if self._fresh():
+                logger.info("Feed %s is within its ttl, skipping", self.endpoint)
+                return None
+
+            headers = {}
+            if self.etag is not None:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified is not None:
+                headers["If-Modified-Since"] = self.last_modified
+
+            response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                logger.info("Feed %s not modified", self.endpoint)
+                self.fetched_at = time.monotonic()
+                return None
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                logger.error("Error fetching %s from API", self.endpoint, exc_info=True)
+                raise
+
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+            self.fetched_at = time.monotonic()
+
+            payload = response.json()
+            self.ttl = int(payload.get("ttl") or 0)
+            last_updated = payload.get("last_updated")
+            if last_updated is not None and last_updated == self.last_updated:
+                logger.info("Feed %s has not been updated", self.endpoint)
+                return None
+            self.last_updated = last_updated
+
+            stations = payload["data"]["stations"]
+            for station in stations:
+                station["station_id"] = int(station["station_id"])
+            return stations
+
+
+def make_session() -> requests.Session:
+    """Session keeping connections to the API alive between fetches."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=GBFS_POOL_SIZE, pool_maxsize=GBFS_POOL_SIZE
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+SESSION = make_session()
+STATUS_FEED = GBFSFeed(STATUS_ENDPOINT, SESSION)
+STATIONS_FEED = GBFSFeed(STATIONS_ENDPOINT, SESSION)
+
+
+def fetch_stations_status() -> Optional[List[EcobiciStationStatus]]:
+    """Fetch stations' status from the EcoBici API, None if it did not change."""
     logger.info("Fetching stations status from API")
-    url = BASE_URL(endpoint=STATUS_ENDPOINT)
-    response = requests.get(url, timeout=120)
-    try:
-        response.raise_for_status()
-        stations_status = response.json()["data"]["stations"]
-        for station_status in stations_status:
-            station_status["station_id"] = int(station_status["station_id"])
-        return stations_status
-    except requests.exceptions.HTTPError:
-        logger.error("Error fetching stations status from API", exc_info=True)
-        raise
-
-
-@tenacity.retry(
-    wait=tenacity.wait_fixed(30),
-    retry=tenacity.retry_if_exception_type(requests.exceptions.HTTPError),
-    stop=tenacity.stop_after_attempt(30),
-    before=tenacity.before_log(logger, logging.INFO),
-)
-def fetch_stations_info() -> List[EcobiciStationInfo]:
-    """Fetch information on all stations from the EcoBici API."""
+    return STATUS_FEED.fetch()
+
+
+def fetch_stations_info() -> Optional[List[EcobiciStationInfo]]:
+    """Fetch information on all stations from the EcoBici API, None if it did not
+    change."""
     logger.info("Fetching stations information from API")
-    url = BASE_URL(endpoint=STATIONS_ENDPOINT)
-    response = requests.get(url, timeout=120)
-    try:
-        response.raise_for_status()
-        stations_info = response.json()["data"]["stations"]
-        for station_info in stations_info:
-            station_info["station_id"] = int(station_info["station_id"])
-        return stations_info
-    except requests.exceptions.HTTPError:
-        logger.error("Error fetching stations information from API", exc_info=True)
-        raise
+    return STATIONS_FEED.fetch()
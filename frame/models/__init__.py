@@ -1,3 +1,4 @@
+from .signals import RefreshSignal
 from .stations import Station, Prediction, StationStatus
 
-__all__ = ["Station", "StationStatus", "Prediction"]
+__all__ = ["Station", "StationStatus", "Prediction", "RefreshSignal"]
@@ -1,11 +1,16 @@
 """Base object to declare all ORM classes"""
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy.sql import expression
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.dialects import sqlite, postgresql
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Table, DateTime, and_, create_engine
 
 from frame.config import cfg
 from frame.utils import get_logger
-from frame.constants import POOL_SIZE, MAX_OVERFLOW, DEFAULT_SQLITE
+from frame.constants import POOL_SIZE, MAX_OVERFLOW, DEFAULT_SQLITE, UPSERT_BATCH_SIZE
 
 logger = get_logger(__name__)
 
@@ -58,3 +63,83 @@ class PrintableBase:
     def __repr__(self):
         params = ", ".join(f"{k}={v}" for k, v in keyvalgen(self))
         return f"{self.__class__.__name__}({params})"
+
+
+class utcnow(expression.FunctionElement):  # pylint: disable=invalid-name
+    """Current UTC timestamp, without a timezone, on every dialect."""
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):  # pylint: disable=unused-argument
+    # CURRENT_TIMESTAMP is already in UTC on SQLite
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _postgresql_utcnow(element, compiler, **kw):  # pylint: disable=unused-argument
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _merge(
+    db: Session, table: Table, rows: List[Dict[str, Any]], index_elements: Sequence[str]
+) -> None:
+    """Update each row, inserting the ones that did not exist."""
+    for row in rows:
+        key = and_(*(table.c[col] == row[col] for col in index_elements))
+        values = {col: val for col, val in row.items() if col not in index_elements}
+        if values:
+            exists = db.execute(table.update().where(key).values(values)).rowcount
+        else:
+            exists = db.execute(table.select().where(key)).first() is not None
+        if not exists:
+            db.execute(table.insert().values(row))
+
+
+def upsert(
+    db: Session,
+    table: Table,
+    rows: List[Dict[str, Any]],
+    index_elements: Sequence[str],
+    batch_size: int = UPSERT_BATCH_SIZE,
+) -> None:
+    """Insert rows into table, updating the ones that already exist.
+
+    Rows are written with a single `INSERT ... ON CONFLICT DO UPDATE` per batch,
+    instead of one query and merge per row. Dialects without it fall back to an
+    update, and an insert if nothing was updated, per row.
+
+    Parameters
+    ----------
+    db: Session to execute the statements with
+    table: Table to upsert into
+    rows: Values to write, keyed by column name
+    index_elements: Columns of the unique constraint to check conflicts on
+    batch_size: Max amount of rows written per statement
+    """
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect not in DIALECT_INSERTS:
+        logger.warning("No bulk upserts for %s, merging row by row", dialect)
+        _merge(db, table, rows, index_elements)
+        return
+    insert = DIALECT_INSERTS[dialect]
+
+    for start in range(0, len(rows), batch_size):
+        stmt = insert(table).values(rows[start : start + batch_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={
+                col.name: stmt.excluded[col.name]
+                for col in table.columns
+                if col.name not in index_elements
+            },
+        )
+        db.execute(stmt)
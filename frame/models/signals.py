@@ -0,0 +1,16 @@
+"""Signals of refreshed data, for workers that do not refresh it themselves."""
+# pylint: disable=too-few-public-methods
+
+from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Integer, DateTime
+
+from frame.models.base import Base
+
+
+class RefreshSignal(Base):
+    """A counter bumped every time some shared data is refreshed."""
+
+    __tablename__ = "refresh_signals"
+    name = Column(String, primary_key=True, nullable=False)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -1,12 +1,13 @@
 """Entity to represent an EcoBici station"""
 # pylint: disable=too-few-public-methods
 
-from sqlalchemy.sql import func
+from sqlalchemy.sql import expression
 from sqlalchemy import (
     JSON,
     Float,
     Column,
     String,
+    Boolean,
     Integer,
     Numeric,
     DateTime,
@@ -14,7 +15,7 @@ from sqlalchemy import (
     CheckConstraint,
 )
 
-from frame.models.base import Base, PrintableBase, UpdatableBase
+from frame.models.base import Base, PrintableBase, UpdatableBase, utcnow
 
 
 class Station(Base, UpdatableBase):
@@ -27,6 +28,7 @@ class Station(Base, UpdatableBase):
     lon = Column(Numeric)
     address = Column(String)
     capacity = Column(Integer)
+    active = Column(Boolean, nullable=False, server_default=expression.true())
 
 
 class StationStatus(Base, UpdatableBase):
@@ -59,7 +61,7 @@ class Prediction(Base, UpdatableBase, PrintableBase):
     user_eta = Column(Float, nullable=False)
     user_lat = Column(Numeric, nullable=False)
     user_lon = Column(Numeric, nullable=False)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=utcnow())
     CheckConstraint(
         "bike_availability_probability >= 0", name="bike_avail_prob_above_zero"
     )
@@ -0,0 +1,45 @@
+"""Model artifacts logged to MLflow.
+
+Every model is dumped twice: compressed with `JOBLIB_COMPRESSION`, which keeps the
+registry small, and uncompressed for serving. Skipping decompression makes the
+serving artifact of per-station models load about 2.5 times faster, at the cost of
+a download about 3.5 times bigger. See `benchmarks/cold_start.py`.
+"""
+import os
+from typing import List, Union
+
+import joblib
+from sklearn.pipeline import Pipeline
+from sklearn.base import BaseEstimator
+
+from frame.utils import get_logger
+from frame.config import JOBLIB_COMPRESSION
+from frame.constants import (
+    ARTIFACT_SUFFIX,
+    SERVING_ARTIFACT_SUFFIX,
+    SERVING_JOBLIB_COMPRESSION,
+    FrameModels,
+)
+
+logger = get_logger(__name__)
+
+
+def artifact_name(model: FrameModels) -> str:
+    return f"{FrameModels(model).value}{ARTIFACT_SUFFIX}"
+
+
+def serving_artifact_name(model: FrameModels) -> str:
+    return f"{FrameModels(model).value}{SERVING_ARTIFACT_SUFFIX}"
+
+
+def dump_artifacts(
+    estimator: Union[Pipeline, BaseEstimator], model: FrameModels, directory: str = "."
+) -> List[str]:
+    """Dump the compressed and serving artifacts of a model, returning their paths."""
+    path = os.path.join(directory, artifact_name(model))
+    joblib.dump(estimator, path, JOBLIB_COMPRESSION)
+
+    serving_path = os.path.join(directory, serving_artifact_name(model))
+    joblib.dump(estimator, serving_path, compress=SERVING_JOBLIB_COMPRESSION)
+
+    return [path, serving_path]
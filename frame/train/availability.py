@@ -4,9 +4,9 @@ from typing import List, Tuple, Optional
 
 import pandas as pd
 from lightgbm import LGBMClassifier
-from sklearn.pipeline import make_pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline, make_pipeline
 
 from frame.utils import get_logger
 from frame.train.train import train_model
@@ -72,22 +72,14 @@ def postprocess_dataset_availability(dataset: pd.DataFrame) -> pd.DataFrame:
     return dataset
 
 
-def train_availability(
-    start_date: datetime,
-    end_date: datetime,
+def make_availability_pipeline(
     num_features: Tuple[str, ...] = AVAILABILITY_NUM_FEATURES,
     cat_features: Tuple[str, ...] = AVAILABILITY_CAT_FEATURES,
-    target: str = AVAILABILITY_TARGET,
-    metrics: Optional[Tuple[FrameMetric, ...]] = AVAILABILITY_METRICS,
-    mlflow_tracking_uri: str = cfg.mlflow.uri(),
-    test_size: float = DEFAULT_TEST_SIZE,
     partition_column: str = AVAILABILITY_PARTITION_COLUMN,
     neg_weight: Optional[int] = NEG_WEIGHT,
     pos_weight: Optional[int] = POS_WEIGHT,
-    env: Environments = CFG_ENV,
-    minutes_to_eval: List[int] = DEFAULT_MINUTES_TO_EVAL_AVAILABILITY,
-):
-
+) -> Pipeline:
+    """Build the untrained availability pipeline."""
     pipeline = make_pipeline(
         ColumnTransformer(
             [
@@ -115,6 +107,28 @@ def train_availability(
         ),
     )
     pipeline.set_output(transform="pandas")
+    return pipeline
+
+
+def train_availability(
+    start_date: datetime,
+    end_date: datetime,
+    num_features: Tuple[str, ...] = AVAILABILITY_NUM_FEATURES,
+    cat_features: Tuple[str, ...] = AVAILABILITY_CAT_FEATURES,
+    target: str = AVAILABILITY_TARGET,
+    metrics: Optional[Tuple[FrameMetric, ...]] = AVAILABILITY_METRICS,
+    mlflow_tracking_uri: str = cfg.mlflow.uri(),
+    test_size: float = DEFAULT_TEST_SIZE,
+    partition_column: str = AVAILABILITY_PARTITION_COLUMN,
+    neg_weight: Optional[int] = NEG_WEIGHT,
+    pos_weight: Optional[int] = POS_WEIGHT,
+    env: Environments = CFG_ENV,
+    minutes_to_eval: List[int] = DEFAULT_MINUTES_TO_EVAL_AVAILABILITY,
+):
+
+    pipeline = make_availability_pipeline(
+        num_features, cat_features, partition_column, neg_weight, pos_weight
+    )
 
     train_model(
         FrameModels.AVAILABILITY,
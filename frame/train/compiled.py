@@ -0,0 +1,241 @@
+"""Lean NumPy scoring for trained pipelines.
+
+The trained pipelines go through pandas on every prediction: the `ColumnTransformer`
+builds a frame, `DtypeFixer` casts categories and LightGBM converts the frame back to
+an array. For a handful of rows most of the time is spent there. A compiled pipeline
+precomputes the scaler parameters and category codes and calls the boosters directly
+on a contiguous float array, yielding the same outputs.
+"""
+from typing import Any, Dict, List, Tuple, Union, Mapping, Callable, Optional
+
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from lightgbm import LGBMModel, LGBMClassifier
+from sklearn.preprocessing import StandardScaler
+
+from frame.utils import get_logger
+from frame.constants import FALLBACK_KEY
+from frame.train.transformers import DtypeFixer
+from frame.train.metaestimator import PartitionedMetaEstimator
+
+logger = get_logger(__name__)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class _CategoricalFeature:
+    """Maps raw values to the category codes LightGBM was trained with."""
+
+    def __init__(self, name: str, categories: List[Any]):
+        self.name = name
+        self.codes = {category: float(code) for code, category in enumerate(categories)}
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        return np.fromiter(
+            (self.codes.get(value, np.nan) for value in values.tolist()),
+            dtype=np.float64,
+            count=len(values),
+        )
+
+
+class _ScaledFeature:
+    """Standard scaling with the fitted mean and scale."""
+
+    def __init__(self, name: str, mean: float, scale: float):
+        self.name = name
+        self.mean = mean
+        self.scale = scale
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        return (values.astype(np.float64) - self.mean) / self.scale
+
+
+class _PassthroughFeature:
+    def __init__(self, name: str):
+        self.name = name
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        return values.astype(np.float64)
+
+
+_Feature = Union[_CategoricalFeature, _ScaledFeature, _PassthroughFeature]
+
+
+def _booster_scorer(estimator: LGBMModel, method: str) -> Callable:
+    booster = estimator.booster_
+    if isinstance(estimator, LGBMClassifier):
+        if estimator.n_classes_ != 2:
+            raise NotCompilable("Only binary classifiers can be compiled")
+        if method == "predict_proba":
+            return booster.predict
+        classes = estimator.classes_
+        return lambda X: classes[(booster.predict(X) > 0.5).astype(int)]
+    if method == "predict_proba":
+        raise NotCompilable("Regressors have no probabilities")
+    return booster.predict
+
+
+class CompiledPipeline:
+    """NumPy-only equivalent of a trained frame pipeline.
+
+    Supports pipelines made of a `ColumnTransformer` with `DtypeFixer`,
+    `StandardScaler` and passthrough columns, followed by a
+    `PartitionedMetaEstimator` of LightGBM models.
+    """
+
+    def __init__(
+        self,
+        features: List[_Feature],
+        partition_column: str,
+        estimators: Dict[Any, LGBMModel],
+    ):
+        self.features = features
+        self.partition_column = partition_column
+        self.estimators = estimators
+        self.fallback_estimator = estimators[FALLBACK_KEY]
+        self.probabilistic = hasattr(self.fallback_estimator, "predict_proba")
+        self._scorers: Dict[str, Tuple[Dict[Any, Callable], Callable]] = {}
+        for method in ("predict", "predict_proba"):
+            try:
+                scorers = {
+                    key: _booster_scorer(estimator, method)
+                    for key, estimator in estimators.items()
+                }
+            except NotCompilable:
+                continue
+            self._scorers[method] = (scorers, scorers.pop(FALLBACK_KEY))
+
+    def encode(self, X: Mapping[str, Any]) -> np.ndarray:
+        """Build the contiguous float array the boosters are fed with."""
+        columns = [
+            feature.encode(np.asarray(X[feature.name])) for feature in self.features
+        ]
+        return np.ascontiguousarray(np.column_stack(columns), dtype=np.float64)
+
+    def _score(self, X: Mapping[str, Any], method: str) -> np.ndarray:
+        scorers, fallback = self._scorers[method]
+        encoded = self.encode(X)
+        partitions = np.asarray(X[self.partition_column])
+
+        if len(partitions) == 1:
+            scorer = scorers.get(partitions[0].item(), fallback)
+            return np.asarray(scorer(encoded), dtype=np.float64)
+
+        preds = np.empty(len(partitions))
+        values, inverse = np.unique(partitions, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.cumsum(np.bincount(inverse, minlength=len(values)))
+
+        fallback_rows = []
+        start = 0
+        for value, end in zip(values.tolist(), bounds.tolist()):
+            rows = order[start:end]
+            start = end
+            if value not in scorers:
+                fallback_rows.append(rows)
+                continue
+            preds[rows] = scorers[value](encoded[rows])
+
+        if fallback_rows:
+            rows = np.concatenate(fallback_rows)
+            preds[rows] = fallback(encoded[rows])
+
+        return preds
+
+    def predict(self, X: Mapping[str, Any]) -> np.ndarray:
+        return self._score(X, "predict")
+
+    def predict_proba(self, X: Mapping[str, Any]) -> np.ndarray:
+        """Probability of the positive class, as `PartitionedMetaEstimator` does."""
+        if "predict_proba" not in self._scorers:
+            return self.predict(X)
+        return self._score(X, "predict_proba")
+
+
+def _compile_features(
+    column_transformer: ColumnTransformer, estimator: LGBMModel
+) -> List[_Feature]:
+    features: List[_Feature] = []
+    categorical: List[str] = []
+    for _, transformer, columns in column_transformer.transformers_:
+        if isinstance(transformer, DtypeFixer):
+            if transformer.dtype != "category":
+                raise NotCompilable(f"Unsupported dtype {transformer.dtype}")
+            categorical.extend(columns)
+            features.extend(_PassthroughFeature(col) for col in columns)
+        elif isinstance(transformer, StandardScaler):
+            means = (
+                transformer.mean_ if transformer.with_mean else np.zeros(len(columns))
+            )
+            scales = (
+                transformer.scale_ if transformer.with_std else np.ones(len(columns))
+            )
+            features.extend(
+                _ScaledFeature(col, mean, scale)
+                for col, mean, scale in zip(columns, means, scales)
+            )
+        elif transformer == "passthrough":
+            features.extend(_PassthroughFeature(col) for col in columns)
+        elif transformer != "drop":
+            raise NotCompilable(f"Unsupported transformer {transformer}")
+
+    pandas_categorical = estimator.booster_.pandas_categorical or []
+    if len(pandas_categorical) != len(categorical):
+        raise NotCompilable("Categorical features do not match the booster")
+    categories = dict(zip(categorical, pandas_categorical))
+
+    return [
+        _CategoricalFeature(feature.name, categories[feature.name])
+        if feature.name in categories
+        else feature
+        for feature in features
+    ]
+
+
+def compile_pipeline(pipeline: Pipeline) -> CompiledPipeline:
+    """Compile a trained pipeline into a `CompiledPipeline`.
+
+    Raises
+    ------
+    NotCompilable: if the pipeline is not made of the supported steps
+    """
+    if len(pipeline.steps) != 2:
+        raise NotCompilable("Expected a column transformer and a meta estimator")
+    column_transformer, meta_estimator = pipeline[0], pipeline[-1]
+    if not isinstance(column_transformer, ColumnTransformer) or not isinstance(
+        meta_estimator, PartitionedMetaEstimator
+    ):
+        raise NotCompilable("Expected a column transformer and a meta estimator")
+
+    estimators = meta_estimator.regressors
+    if FALLBACK_KEY not in estimators or not all(
+        isinstance(estimator, LGBMModel) for estimator in estimators.values()
+    ):
+        raise NotCompilable("Only LightGBM estimators can be compiled")
+
+    fallback = estimators[FALLBACK_KEY]
+    features = _compile_features(column_transformer, fallback)
+
+    feature_names = [feature.name for feature in features]
+    for estimator in estimators.values():
+        if list(estimator.feature_name_) != feature_names:
+            raise NotCompilable("Estimators were trained on different features")
+        if (
+            estimator.booster_.pandas_categorical
+            != fallback.booster_.pandas_categorical
+        ):
+            raise NotCompilable("Estimators were trained on different categories")
+
+    return CompiledPipeline(features, meta_estimator.partition_column, estimators)
+
+
+def try_compile_pipeline(pipeline: Pipeline) -> Optional[CompiledPipeline]:
+    """Compile a pipeline, or return None if it can't be compiled."""
+    try:
+        return compile_pipeline(pipeline)
+    except NotCompilable:
+        logger.warning("Pipeline can't be compiled, using it as is", exc_info=True)
+        return None
@@ -3,9 +3,9 @@ from datetime import datetime
 from typing import Tuple, Optional
 
 from lightgbm import LGBMRegressor
-from sklearn.pipeline import make_pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline, make_pipeline
 
 from frame.utils import get_logger
 from frame.train.train import train_model
@@ -39,19 +39,12 @@ ETA_TARGET: str = "minutes_until_next_bike_arrival"
 ETA_METRICS: Tuple[FrameMetric, ...] = (FrameMetric.MAE, FrameMetric.MAPE)
 
 
-def train_eta(
-    start_date: datetime,
-    end_date: datetime,
+def make_eta_pipeline(
     num_features: Tuple[str, ...] = ETA_NUM_FEATURES,
     cat_features: Tuple[str, ...] = ETA_CAT_FEATURES,
-    target: str = ETA_TARGET,
-    metrics: Optional[Tuple[FrameMetric, ...]] = ETA_METRICS,
-    mlflow_tracking_uri: str = cfg.mlflow.uri(),
-    test_size: float = DEFAULT_TEST_SIZE,
     partition_column: str = PARTITION_COLUMN,
-    env: Environments = CFG_ENV,
-):
-
+) -> Pipeline:
+    """Build the untrained ETA pipeline."""
     pipeline = make_pipeline(
         ColumnTransformer(
             [
@@ -74,6 +67,23 @@ def train_eta(
         ),
     )
     pipeline.set_output(transform="pandas")
+    return pipeline
+
+
+def train_eta(
+    start_date: datetime,
+    end_date: datetime,
+    num_features: Tuple[str, ...] = ETA_NUM_FEATURES,
+    cat_features: Tuple[str, ...] = ETA_CAT_FEATURES,
+    target: str = ETA_TARGET,
+    metrics: Optional[Tuple[FrameMetric, ...]] = ETA_METRICS,
+    mlflow_tracking_uri: str = cfg.mlflow.uri(),
+    test_size: float = DEFAULT_TEST_SIZE,
+    partition_column: str = PARTITION_COLUMN,
+    env: Environments = CFG_ENV,
+):
+
+    pipeline = make_eta_pipeline(num_features, cat_features, partition_column)
 
     train_model(
         FrameModels.ETA,
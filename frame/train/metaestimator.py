@@ -40,18 +40,31 @@ class PartitionedMetaEstimator(BaseEstimator, RegressorMixin):
     def fallback_estimator(self):
         return self.regressors[FALLBACK_KEY]
 
+    def _partitions(self, X):
+        """Yield the estimator and row positions for each partition in X.
+
+        Rows are grouped once, instead of masking X for every partition. Rows with
+        no partition value, which grouping drops, go to the fallback estimator.
+        """
+        partitions = X[self.partition_column]
+        fallback_positions = [np.flatnonzero(partitions.isna().to_numpy())]
+        for val, positions in partitions.groupby(
+            partitions, sort=False
+        ).indices.items():
+            if val in self.regressors:
+                yield self.regressors[val], positions
+            else:
+                fallback_positions.append(positions)
+
+        positions = np.concatenate(fallback_positions)
+        if len(positions):
+            yield self.regressors[FALLBACK_KEY], positions
+
     def predict(self, X):
         preds = np.empty(len(X))
 
-        for val in X[self.partition_column].unique():
-            if val not in self.regressors:
-                continue
-            mask = X[self.partition_column] == val
-            preds[mask] = self.regressors[val].predict(X[mask])
-
-        fallback = ~X[self.partition_column].isin(self.regressors.keys())
-        if fallback.sum() > 0:
-            preds[fallback] = self.regressors[FALLBACK_KEY].predict(X[fallback])
+        for regressor, positions in self._partitions(X):
+            preds[positions] = regressor.predict(X.iloc[positions])
 
         return preds
 
@@ -62,17 +75,8 @@ class PartitionedMetaEstimator(BaseEstimator, RegressorMixin):
 
         preds = np.empty(len(X))
 
-        for val in X[self.partition_column].unique():
-            if val not in self.regressors:
-                continue
-            mask = X[self.partition_column] == val
-            preds[mask] = self.regressors[val].predict_proba(X[mask])[:, 1]
-
-        fallback = ~X[self.partition_column].isin(self.regressors.keys())
-        if fallback.sum() > 0:
-            preds[fallback] = self.regressors[FALLBACK_KEY].predict_proba(X[fallback])[
-                :, 1
-            ]
+        for regressor, positions in self._partitions(X):
+            preds[positions] = regressor.predict_proba(X.iloc[positions])[:, 1]
 
         return preds
 
@@ -0,0 +1,135 @@
+"""Synthetic data shaped like the real datasets and GBFS feeds.
+
+Used to train small models and serve fake feeds where the real EcoBici API and
+datalake are not available, as in load tests and benchmarks.
+"""
+import time
+from typing import Any, Dict, List, Tuple, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+
+from frame.train.enrich import add_holidays
+from frame.train.eta import make_eta_pipeline
+from frame.train.availability import make_availability_pipeline
+
+BA_CENTER: Tuple[float, float] = (-34.6037, -58.3816)
+
+
+def make_dataset(n_rows: int, n_stations: int, seed: int = 0) -> pd.DataFrame:
+    """Rows with the features both models are trained on."""
+    rng = np.random.default_rng(seed)
+    dataset = pd.DataFrame(
+        {
+            "station_id": rng.integers(1, n_stations + 1, n_rows),
+            "hod": rng.integers(0, 24, n_rows),
+            "dow": rng.integers(0, 7, n_rows),
+            "num_bikes_available": rng.integers(0, 20, n_rows),
+            "num_bikes_disabled": rng.integers(0, 3, n_rows),
+            "num_docks_available": rng.integers(0, 20, n_rows),
+            "num_docks_disabled": rng.integers(0, 3, n_rows),
+            "minutes_bt_check": rng.integers(1, 18, n_rows),
+            "ts": pd.Timestamp("2023-01-01")
+            + pd.to_timedelta(rng.integers(0, 365, n_rows), unit="D"),
+        }
+    )
+    return add_holidays(dataset).drop(columns=["ts"])
+
+
+def make_availability_rows(
+    n_rows: int, n_stations: int, minutes_to_eval: List[int], seed: int = 0
+) -> pd.DataFrame:
+    """Rows as returned by the availability query, before postprocessing.
+
+    Each row holds the minutes until, and whether bikes were available at, each of
+    the following checks in `minutes_to_eval`.
+    """
+    rng = np.random.default_rng(seed)
+    dataset = make_dataset(n_rows, n_stations, seed).drop(
+        columns=["minutes_bt_check", "is_holiday"]
+    )
+    dataset["ts"] = pd.Timestamp("2023-01-01") + pd.to_timedelta(
+        rng.integers(0, 365 * 24 * 60, n_rows), unit="min"
+    )
+    for i in minutes_to_eval:
+        minutes = rng.integers(i, 3 * i + 1, n_rows).astype(float)
+        minutes[rng.random(n_rows) < 0.01] = np.nan
+        dataset[f"minutes_bt_check_{i}"] = minutes
+        dataset[f"bikes_available_{i}"] = rng.random(n_rows) < 0.7
+    return dataset
+
+
+def fit_eta_pipeline(dataset: pd.DataFrame) -> Pipeline:
+    pipeline = make_eta_pipeline()
+    X = dataset.drop(columns=["minutes_bt_check"])
+    pipeline.fit(X, dataset["num_bikes_available"] * 2.0 + dataset["hod"])
+    return pipeline
+
+
+def fit_availability_pipeline(dataset: pd.DataFrame) -> Pipeline:
+    pipeline = make_availability_pipeline()
+    target = dataset["num_bikes_available"] > dataset["minutes_bt_check"] // 3
+    pipeline.fit(dataset.copy(), target.astype(int))
+    return pipeline
+
+
+def make_stations_info(n_stations: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Stations as listed by the GBFS station information feed."""
+    rng = np.random.default_rng(seed)
+    lats = BA_CENTER[0] + rng.uniform(-0.06, 0.06, n_stations)
+    lons = BA_CENTER[1] + rng.uniform(-0.08, 0.08, n_stations)
+    return [
+        {
+            "station_id": str(station_id),
+            "name": f"{station_id:03d} - Synthetic station",
+            "address": f"Calle {station_id}",
+            "lat": round(float(lat), 6),
+            "lon": round(float(lon), 6),
+            "altitude": 0.0,
+            "capacity": int(rng.integers(10, 40)),
+            "post_code": "1000",
+            "groups": ["SYNTHETIC"],
+            "is_charging_station": False,
+            "nearby_distance": 1000.0,
+            "physical_configuration": "REGULAR",
+            "rental_methods": ["KEY", "TRANSITCARD"],
+        }
+        for station_id, lat, lon in zip(range(1, n_stations + 1), lats, lons)
+    ]
+
+
+def make_stations_status(
+    n_stations: int, seed: int = 0, last_reported: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Status of stations as listed by the GBFS station status feed.
+
+    Every seed moves bikes around, so consecutive seeds look like consecutive
+    refreshes of the feed.
+    """
+    rng = np.random.default_rng(seed)
+    last_reported = int(time.time()) if last_reported is None else last_reported
+    capacity = 20
+    bikes = rng.integers(0, capacity + 1, n_stations)
+    bikes_disabled = rng.integers(0, 3, n_stations)
+    docks_disabled = rng.integers(0, 3, n_stations)
+    return [
+        {
+            "station_id": str(station_id),
+            "num_bikes_available": int(available),
+            "num_bikes_available_types": {"mechanical": int(available), "ebike": 0},
+            "num_bikes_disabled": int(disabled),
+            "num_docks_available": int(capacity - available),
+            "num_docks_disabled": int(docks),
+            "last_reported": last_reported - int(rng.integers(0, 300)),
+            "is_charging_station": False,
+            "status": "IN_SERVICE",
+            "is_installed": 1,
+            "is_renting": 1,
+            "is_returning": 1,
+            "traffic": None,
+        }
+        for station_id, available, disabled, docks in zip(
+            range(1, n_stations + 1), bikes, bikes_disabled, docks_disabled
+        )
+    ]
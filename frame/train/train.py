@@ -7,7 +7,6 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Union, Callable, Optional
 
 import duckdb
-import joblib
 import mlflow
 import pandas as pd
 from sklearn.pipeline import Pipeline
@@ -17,10 +16,11 @@ from sklearn.model_selection import train_test_split
 
 from frame.data.datalake import connect
 from frame.ycm_casts import s3_or_local
+from frame.config import cfg, env as CFG_ENV
 from frame.utils import with_env, get_logger
 from frame import __version__ as frame_version
+from frame.train.artifacts import dump_artifacts
 from frame.jinja import load_sql_query, render_sql_query
-from frame.config import JOBLIB_COMPRESSION, cfg, env as CFG_ENV
 from frame.constants import (
     MODELS_QUERIES,
     DEFAULT_TEST_SIZE,
@@ -146,14 +146,13 @@ def train_model(
                     json.dump(feature_importance, f, indent=4)
                 mlflow.log_artifact(file_path)
 
-        estimator_path = f"{model}.joblib"
-
         logger.info("Dumping estimator")
-        joblib.dump(estimator, estimator_path, JOBLIB_COMPRESSION)
-        mlflow.log_artifact(estimator_path)
+        artifact_paths = dump_artifacts(estimator, model)
+        for artifact_path in artifact_paths:
+            mlflow.log_artifact(artifact_path)
 
         if env == Environments.PROD:
-            artifact_uri = mlflow.get_artifact_uri(estimator_path)
+            artifact_uri = mlflow.get_artifact_uri(os.path.basename(artifact_paths[0]))
             new_version = mlflow_client.create_model_version(
                 model, artifact_uri, run.info.run_id
             )
@@ -161,4 +160,5 @@ def train_model(
                 model, new_version.version, MLFlowStage.Production.value
             )
 
-        os.remove(estimator_path)
+        for artifact_path in artifact_paths:
+            os.remove(artifact_path)
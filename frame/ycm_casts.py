@@ -6,6 +6,10 @@ def prepend_https(url: str):
     return f"https://{url}"
 
 
+def to_bool(value) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
 def s3_or_local(path: str):
     if not path.startswith("s3://"):
         return path
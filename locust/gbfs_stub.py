@@ -0,0 +1,172 @@
+"""Stub of the EcoBici GBFS API, for load tests.
+
+Serves the station information and station status feeds, either synthetic or
+replayed from recorded responses. Status moves on to the next recording, or the
+next synthetic refresh, every `ttl` seconds, and responses carry an ETag so the
+API's conditional requests behave as against the real one.
+
+Point the API at it with `ECOBICI_API=http://127.0.0.1:8765/{endpoint}`.
+Run with `python locust/gbfs_stub.py --help`.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Optional
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import typer
+import requests
+
+from frame.constants import STATUS_ENDPOINT, STATIONS_ENDPOINT
+from frame.train.synthetic import make_stations_info, make_stations_status
+
+app = typer.Typer()
+
+INFO_FILE = f"{STATIONS_ENDPOINT}.json"
+STATUS_GLOB = f"{STATUS_ENDPOINT}*.json"
+
+
+def encode(payload: Dict[str, Any]) -> Tuple[str, bytes]:
+    body = json.dumps(payload).encode()
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', body
+
+
+def gbfs_payload(stations: List[Dict[str, Any]], last_updated: int, ttl: int):
+    return {"last_updated": last_updated, "ttl": ttl, "data": {"stations": stations}}
+
+
+class Feeds:
+    """Feeds served by the stub.
+
+    Parameters
+    ----------
+    ttl: Seconds between status refreshes
+    n_stations: Amount of synthetic stations, ignored when replaying
+    replay_dir: Directory with recorded feeds to replay, see `record`
+    """
+
+    def __init__(
+        self, ttl: int, n_stations: int = 400, replay_dir: Optional[Path] = None
+    ):
+        self.ttl = ttl
+        self.n_stations = n_stations
+        self.started_at = int(time.time())
+        self._lock = threading.Lock()
+        self._status: Dict[int, Tuple[str, bytes]] = {}
+
+        self.recorded_status: List[Dict[str, Any]] = []
+        if replay_dir is None:
+            info = make_stations_info(n_stations)
+        else:
+            info = json.loads((replay_dir / INFO_FILE).read_text())["data"]["stations"]
+            self.recorded_status = [
+                json.loads(path.read_text())
+                for path in sorted(replay_dir.glob(STATUS_GLOB))
+            ]
+            if not self.recorded_status:
+                raise ValueError(f"No {STATUS_GLOB} files in {replay_dir}")
+        self.info = encode(gbfs_payload(info, self.started_at, self.ttl))
+
+    def _step(self) -> int:
+        return (int(time.time()) - self.started_at) // max(self.ttl, 1)
+
+    def status(self) -> Tuple[str, bytes]:
+        step = self._step()
+        with self._lock:
+            if step not in self._status:
+                last_updated = self.started_at + step * self.ttl
+                if self.recorded_status:
+                    recorded = self.recorded_status[step % len(self.recorded_status)]
+                    stations = recorded["data"]["stations"]
+                else:
+                    stations = make_stations_status(
+                        self.n_stations, seed=step, last_reported=last_updated
+                    )
+                self._status = {
+                    step: encode(gbfs_payload(stations, last_updated, self.ttl))
+                }
+            return self._status[step]
+
+    def get(self, endpoint: str) -> Optional[Tuple[str, bytes]]:
+        if endpoint == STATIONS_ENDPOINT:
+            return self.info
+        if endpoint == STATUS_ENDPOINT:
+            return self.status()
+        return None
+
+
+def make_handler(feeds: Feeds):
+    class GBFSHandler(BaseHTTPRequestHandler):
+        def do_GET(self):  # pylint: disable=invalid-name
+            feed = feeds.get(self.path.split("?", 1)[0].strip("/"))
+            if feed is None:
+                self.send_error(404)
+                return
+            etag, body = feed
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            pass
+
+    return GBFSHandler
+
+
+def make_server(host: str, port: int, feeds: Feeds) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer((host, port), make_handler(feeds))
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", help="Host to bind to"),
+    port: int = typer.Option(8765, help="Port to bind to"),
+    ttl: int = typer.Option(30, help="Seconds between status refreshes"),
+    stations: int = typer.Option(400, help="Amount of synthetic stations"),
+    replay: Optional[Path] = typer.Option(None, help="Replay feeds recorded here"),
+):
+    feeds = Feeds(ttl, n_stations=stations, replay_dir=replay)
+    server = make_server(host, port, feeds)
+    typer.echo(f"Serving GBFS feeds on http://{host}:{port}/{{endpoint}}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+@app.command()
+def record(
+    output: Path = typer.Argument(..., help="Directory to write the feeds to"),
+    samples: int = typer.Option(10, help="Status responses to record"),
+    interval: int = typer.Option(30, help="Seconds between status responses"),
+):
+    """Record feeds from the real API, using the EcoBici credentials of the config."""
+    from frame.data.ecobici import BASE_URL  # pylint: disable=import-outside-toplevel
+
+    output.mkdir(parents=True, exist_ok=True)
+    response = requests.get(BASE_URL(endpoint=STATIONS_ENDPOINT), timeout=30)
+    response.raise_for_status()
+    (output / INFO_FILE).write_bytes(response.content)
+    for i in range(samples):
+        response = requests.get(BASE_URL(endpoint=STATUS_ENDPOINT), timeout=30)
+        response.raise_for_status()
+        path = output / f"{STATUS_ENDPOINT}_{i:04d}.json"
+        path.write_bytes(response.content)
+        typer.echo(f"Recorded {os.path.basename(path)}")
+        if i + 1 < samples:
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    app()
@@ -1,12 +1,74 @@
+"""Load test scenarios.
+
+Pick a scenario by user class: `StationsUser` reads stations and status,
+`PredictionUser` asks for single predictions, `BatchPredictionUser` for batches,
+and running them all together makes up mixed traffic, weighted by `weight`.
+"""
 import random
 
 from locust import FastHttpUser, task
 
+BATCH_SIZE = 10
+USER_LAT, USER_LON = -34.6037, -58.3816
+
+
+class FrameUser(FastHttpUser):
+    abstract = True
+
+    def on_start(self):
+        response = self.client.get("/stations/status").json()
+        self.stations = [x.get("station_id") for x in response] or [1]
+
+    def prediction_params(self):
+        return {
+            "user_eta": random.randint(1, 17),
+            "user_lat": USER_LAT,
+            "user_lon": USER_LON,
+        }
+
+
+class StationsUser(FrameUser):
+    weight = 3
 
-class StationsUser(FastHttpUser):
     @task
     def fetch_closest(self):
         response = self.client.get("/stations").json()
         stations = list(set(x.get("station_id") for x in response))
-        for i in random.sample(stations, 5):
-            self.client.get(f"/stations/{i}/status")
+        for i in random.sample(stations, min(5, len(stations))):
+            self.client.get(f"/stations/{i}/status", name="/stations/{id}/status")
+
+    @task
+    def fetch_nearby(self):
+        self.client.get(
+            "/stations/nearby",
+            params={"lat": USER_LAT, "lon": USER_LON, "k": 5, "status": "true"},
+        )
+
+
+class PredictionUser(FrameUser):
+    weight = 5
+
+    @task
+    def predict(self):
+        station_id = random.choice(self.stations)
+        self.client.post(
+            f"/stations/{station_id}/prediction",
+            json=self.prediction_params(),
+            name="/stations/{id}/prediction",
+        )
+
+
+class BatchPredictionUser(FrameUser):
+    weight = 1
+
+    @task
+    def predict_batch(self):
+        self.client.post(
+            "/stations/predictions",
+            json={
+                "station_ids": random.sample(
+                    self.stations, min(BATCH_SIZE, len(self.stations))
+                ),
+                **self.prediction_params(),
+            },
+        )
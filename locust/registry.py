@@ -0,0 +1,69 @@
+"""Local model registry, for load tests.
+
+Trains small ETA and availability pipelines on synthetic data and registers them
+as the Production versions of a file based MLflow registry. The API loads them
+through the same registry calls it makes against the real one, when pointed at
+it with `MLFLOW_URI=file://<root>`.
+
+Run with `python locust/registry.py --help`.
+"""
+import tempfile
+from pathlib import Path
+
+import typer
+import mlflow
+from mlflow.tracking import MlflowClient
+
+from frame.train.artifacts import dump_artifacts
+from frame.constants import FrameModels, MLFlowStage
+from frame.train.synthetic import (
+    make_dataset,
+    fit_eta_pipeline,
+    fit_availability_pipeline,
+)
+
+app = typer.Typer()
+
+
+def build_registry(root: Path, n_stations: int = 400, n_rows: int = 40_000) -> str:
+    """Register freshly trained models under root, returning the tracking URI."""
+    root.mkdir(parents=True, exist_ok=True)
+    tracking_uri = root.resolve().as_uri()
+    client = MlflowClient(tracking_uri)
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment("load_tests")
+
+    dataset = make_dataset(n_rows, n_stations)
+    pipelines = {
+        FrameModels.ETA: fit_eta_pipeline(dataset),
+        FrameModels.AVAILABILITY: fit_availability_pipeline(dataset),
+    }
+
+    for model, pipeline in pipelines.items():
+        if not client.search_registered_models(f"name = '{model.value}'"):
+            client.create_registered_model(model.value)
+        with mlflow.start_run(run_name=f"load_tests_{model.value}") as run:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                paths = dump_artifacts(pipeline, model, tmp_dir)
+                for path in paths:
+                    mlflow.log_artifact(path)
+            version = client.create_model_version(
+                model.value, mlflow.get_artifact_uri(), run.info.run_id
+            )
+        client.transition_model_version_stage(
+            model.value, version.version, MLFlowStage.Production.value
+        )
+    return tracking_uri
+
+
+@app.command()
+def main(
+    root: Path = typer.Argument(..., help="Directory of the registry"),
+    n_stations: int = typer.Option(400, help="Amount of per-station models"),
+    n_rows: int = typer.Option(40_000, help="Amount of training rows"),
+):
+    typer.echo(f"MLFLOW_URI={build_registry(root, n_stations, n_rows)}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,273 @@
+"""Self-contained load test runner.
+
+Starts the GBFS stub, builds a local model registry, boots the API against both
+with its own SQLite DB, runs a locust scenario headless and writes a throughput
+and latency report, along with the mean time of each prediction phase scraped
+from `/metrics`. Reports of two commits can be compared with `compare`.
+
+Run with `python locust/run.py --help`, with the dev dependencies installed.
+"""
+# pylint: disable=wrong-import-position
+import os
+import sys
+
+# frame.config reads these when imported, none of them are used against real services
+for _var in (
+    "ECOBICI_CLIENT_ID",
+    "ECOBICI_CLIENT_SECRET",
+    "MLFLOW_URI",
+    "MLFLOW_USERNAME",
+    "MLFLOW_PASSWORD",
+    "S3_BUCKET",
+):
+    os.environ.setdefault(_var, "load-tests")
+
+import csv
+import json
+import time
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import typer
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from registry import build_registry  # noqa: E402
+from gbfs_stub import Feeds, make_server  # noqa: E402
+
+app = typer.Typer()
+
+HERE = Path(__file__).resolve().parent
+LOCUSTFILE = HERE / "locustfile.py"
+
+SCENARIOS: Dict[str, List[str]] = {
+    "stations": ["StationsUser"],
+    "prediction": ["PredictionUser"],
+    "batch": ["BatchPredictionUser"],
+    "mixed": ["StationsUser", "PredictionUser", "BatchPredictionUser"],
+}
+
+CREATE_TABLES = (
+    "import frame.models; from frame.models.base import Base, engine; "
+    "Base.metadata.create_all(engine)"
+)
+
+PERCENTILES = ("50%", "95%", "99%")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_until_ready(url: str, timeout: float) -> None:
+    """Wait until the API has stations status and loaded models."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            stations = requests.get(f"{url}/stations/status", timeout=5).json()
+            if stations:
+                station_id = stations[0]["station_id"]
+                response = requests.post(
+                    f"{url}/stations/{station_id}/prediction",
+                    json={"user_eta": 5, "user_lat": -34.6, "user_lon": -58.4},
+                    timeout=5,
+                )
+                if response.ok:
+                    return
+        except (requests.exceptions.RequestException, ValueError):
+            pass
+        time.sleep(1)
+    raise TimeoutError(f"API at {url} was not ready after {timeout} seconds")
+
+
+def read_stats(stats_csv: Path) -> Dict[str, Dict[str, Any]]:
+    """Requests, failures, throughput and latency percentiles by endpoint."""
+    stats = {}
+    with open(stats_csv) as f:
+        for row in csv.DictReader(f):
+            name = "total" if row["Name"] == "Aggregated" else row["Name"]
+            stats[name] = {
+                "requests": int(row["Request Count"]),
+                "failures": int(row["Failure Count"]),
+                "rps": float(row["Requests/s"]),
+                "mean_ms": float(row["Average Response Time"]),
+                **{f"p{p[:-1]}_ms": float(row[p]) for p in PERCENTILES},
+            }
+    return stats
+
+
+def read_phases(metrics: str) -> Dict[str, float]:
+    """Mean time of each prediction phase, in ms, from the `/metrics` page."""
+    sums: Dict[str, float] = {}
+    counts: Dict[str, float] = {}
+    for line in metrics.splitlines():
+        if not line.startswith("frame_predict_phase_duration_seconds_"):
+            continue
+        sample, value = line.rsplit(" ", 1)
+        phase = sample.split('phase="', 1)[1].split('"', 1)[0]
+        if sample.startswith("frame_predict_phase_duration_seconds_sum"):
+            sums[phase] = float(value)
+        elif sample.startswith("frame_predict_phase_duration_seconds_count"):
+            counts[phase] = float(value)
+    return {
+        phase: 1000 * sums[phase] / counts[phase] for phase in sums if counts.get(phase)
+    }
+
+
+@app.command()
+def run(
+    scenario: str = typer.Option("mixed", help=f"One of {', '.join(SCENARIOS)}"),
+    users: int = typer.Option(20, help="Concurrent locust users"),
+    spawn_rate: int = typer.Option(10, help="Users started per second"),
+    duration: str = typer.Option("60s", help="Duration of the test, as locust takes"),
+    workers: int = typer.Option(1, help="API workers"),
+    stations: int = typer.Option(400, help="Amount of synthetic stations"),
+    ttl: int = typer.Option(30, help="Seconds between GBFS status refreshes"),
+    api_port: int = typer.Option(10101, help="Port of the API"),
+    gbfs_port: int = typer.Option(8765, help="Port of the GBFS stub"),
+    replay: Optional[Path] = typer.Option(None, help="Replay GBFS feeds recorded here"),
+    output: Path = typer.Option(Path("load_report.json"), help="Report path"),
+    ready_timeout: float = typer.Option(300, help="Seconds to wait for the API"),
+):
+    if scenario not in SCENARIOS:
+        raise typer.BadParameter(f"Unknown scenario {scenario}")
+
+    with tempfile.TemporaryDirectory(prefix="frame-load-") as tmp_dir:
+        workdir = Path(tmp_dir)
+        typer.echo(f"Building model registry in {workdir}")
+        tracking_uri = build_registry(workdir / "mlruns", n_stations=stations)
+
+        feeds = Feeds(ttl, n_stations=stations, replay_dir=replay)
+        gbfs = make_server("127.0.0.1", gbfs_port, feeds)
+        threading.Thread(target=gbfs.serve_forever, daemon=True).start()
+
+        env = {
+            **os.environ,
+            "ECOBICI_API": f"http://127.0.0.1:{gbfs_port}/{{endpoint}}",
+            "MLFLOW_URI": tracking_uri,
+            "MODELS_CACHE_DIR": str(workdir / "models"),
+            "API_LEADER_LOCK_FILE": str(workdir / "leader.lock"),
+            "API_REFRESH_STATIONS_STATUS": str(ttl),
+        }
+        # The API uses the default SQLite DB, which lives in its working directory
+        subprocess.run(
+            [sys.executable, "-c", CREATE_TABLES], cwd=workdir, env=env, check=True
+        )
+
+        url = f"http://127.0.0.1:{api_port}"
+        with open(workdir / "api.log", "w") as api_log:
+            api = subprocess.Popen(  # pylint: disable=consider-using-with
+                [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "frame.api.app:app",
+                    "--port",
+                    str(api_port),
+                    "--workers",
+                    str(workers),
+                ],
+                cwd=workdir,
+                env=env,
+                stdout=api_log,
+                stderr=subprocess.STDOUT,
+            )
+            try:
+                typer.echo(f"Waiting for the API on {url}")
+                wait_until_ready(url, ready_timeout)
+                typer.echo(f"Running {scenario} with {users} users for {duration}")
+                subprocess.run(
+                    [
+                        "locust",
+                        "-f",
+                        str(LOCUSTFILE),
+                        "--headless",
+                        "--only-summary",
+                        "--users",
+                        str(users),
+                        "--spawn-rate",
+                        str(spawn_rate),
+                        "--run-time",
+                        duration,
+                        "--host",
+                        url,
+                        "--csv",
+                        str(workdir / "locust"),
+                        *SCENARIOS[scenario],
+                    ],
+                    check=False,
+                )
+                phases = read_phases(requests.get(f"{url}/metrics", timeout=5).text)
+            finally:
+                api.terminate()
+                api.wait()
+                gbfs.shutdown()
+
+        report = {
+            "commit": git_commit(),
+            "scenario": scenario,
+            "users": users,
+            "duration": duration,
+            "workers": workers,
+            "stations": stations,
+            "endpoints": read_stats(workdir / "locust_stats.csv"),
+            "predict_phases_ms": phases,
+        }
+
+    output.write_text(json.dumps(report, indent=4))
+    print_report(report)
+    typer.echo(f"Report written to {output}")
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    typer.echo(
+        f"{'endpoint':<32}{'requests':>10}{'fails':>8}{'rps':>9}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    )
+    for name, stats in report["endpoints"].items():
+        typer.echo(
+            f"{name:<32}{stats['requests']:>10}{stats['failures']:>8}"
+            f"{stats['rps']:>9.1f}{stats['p50_ms']:>9.0f}{stats['p95_ms']:>9.0f}"
+            f"{stats['p99_ms']:>9.0f}"
+        )
+    for phase, ms in report["predict_phases_ms"].items():
+        typer.echo(f"{phase:<32}{ms:>10.3f} ms")
+
+
+@app.command()
+def compare(
+    baseline: Path = typer.Argument(..., help="Report of the baseline commit"),
+    candidate: Path = typer.Argument(..., help="Report of the commit to compare"),
+):
+    """Print the change in throughput and latency between two reports."""
+    base = json.loads(baseline.read_text())
+    cand = json.loads(candidate.read_text())
+    typer.echo(f"{base['commit']} -> {cand['commit']}")
+    typer.echo(f"{'endpoint':<32}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in cand["endpoints"].items():
+        if name not in base["endpoints"]:
+            continue
+        changes = [
+            (stats[key] / base["endpoints"][name][key] - 1) * 100
+            if base["endpoints"][name][key]
+            else 0.0
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms")
+        ]
+        typer.echo(f"{name:<32}" + "".join(f"{change:>+9.1f}%" for change in changes))
+
+
+if __name__ == "__main__":
+    app()
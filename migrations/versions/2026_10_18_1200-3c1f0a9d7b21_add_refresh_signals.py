@@ -0,0 +1,36 @@
+"""add refresh signals
+
+Revision ID: 3c1f0a9d7b21
+Revises: 446e63613490
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+# pylint: disable=E1101
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3c1f0a9d7b21"
+down_revision = "446e63613490"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "refresh_signals",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("refresh_signals")
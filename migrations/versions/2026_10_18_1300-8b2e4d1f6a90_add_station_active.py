@@ -0,0 +1,29 @@
+"""add station active
+
+Revision ID: 8b2e4d1f6a90
+Revises: 3c1f0a9d7b21
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+# pylint: disable=E1101
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8b2e4d1f6a90"
+down_revision = "3c1f0a9d7b21"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("stations") as batch_op:
+        batch_op.add_column(
+            sa.Column("active", sa.Boolean(), server_default=sa.true(), nullable=False)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("stations") as batch_op:
+        batch_op.drop_column("active")
@@ -0,0 +1,36 @@
+"""predictions created_at in utc
+
+Revision ID: 5d7c9e2a1b38
+Revises: 8b2e4d1f6a90
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+# pylint: disable=E1101
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d7c9e2a1b38"
+down_revision = "8b2e4d1f6a90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CURRENT_TIMESTAMP is already in UTC on SQLite
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.alter_column(
+        "predictions",
+        "created_at",
+        server_default=sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)"),
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.alter_column(
+        "predictions", "created_at", server_default=sa.text("(CURRENT_TIMESTAMP)")
+    )
@@ -0,0 +1,73 @@
+"""Shared fixtures for frame tests."""
+# pylint: disable=redefined-outer-name
+import os
+
+# frame.config reads these when imported, so they must be set before importing frame
+for _var in (
+    "ECOBICI_CLIENT_ID",
+    "ECOBICI_CLIENT_SECRET",
+    "MLFLOW_URI",
+    "MLFLOW_USERNAME",
+    "MLFLOW_PASSWORD",
+    "S3_BUCKET",
+):
+    os.environ.setdefault(_var, "test")
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from frame.models.base import Base  # noqa: E402
+from frame.train.eta import ETA_NUM_FEATURES  # noqa: E402
+from frame.train.availability import AVAILABILITY_NUM_FEATURES  # noqa: E402
+from frame.train.synthetic import (  # noqa: E402
+    make_dataset,
+    fit_eta_pipeline,
+    fit_availability_pipeline,
+)
+
+N_STATIONS = 20
+
+
+@pytest.fixture
+def db():
+    """Session on an in-memory SQLite DB with every table created."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    return make_dataset(5000, N_STATIONS)
+
+
+@pytest.fixture(scope="session")
+def holdout():
+    """Unseen rows, including stations with no estimator of their own."""
+    return make_dataset(500, N_STATIONS + 5, seed=1)
+
+
+@pytest.fixture(scope="session")
+def eta_pipeline(dataset):
+    return fit_eta_pipeline(dataset)
+
+
+@pytest.fixture(scope="session")
+def availability_pipeline(dataset):
+    return fit_availability_pipeline(dataset)
+
+
+@pytest.fixture
+def eta_features():
+    return ["station_id", "hod", "dow", "is_holiday", *ETA_NUM_FEATURES]
+
+
+@pytest.fixture
+def availability_features():
+    return ["station_id", "hod", "dow", "is_holiday", *AVAILABILITY_NUM_FEATURES]
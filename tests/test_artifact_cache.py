@@ -0,0 +1,86 @@
+import os
+import multiprocessing
+
+from frame.api.artifact_cache import ArtifactCache
+
+
+def write_artifact(size):
+    def download(dst_path):
+        path = os.path.join(dst_path, "model.joblib")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        return path
+
+    return download
+
+
+def test_artifacts_are_downloaded_once(tmp_path):
+    cache = ArtifactCache(tmp_path, max_bytes=1024)
+    downloads = []
+
+    def download(dst_path):
+        downloads.append(dst_path)
+        return write_artifact(10)(dst_path)
+
+    first = cache.get_or_download("eta", 1, "model.joblib", download)
+    second = cache.get_or_download("eta", 1, "model.joblib", download)
+    assert first == second and first.exists()
+    assert len(downloads) == 1
+
+    cache.set_latest("eta", "Production", 1)
+    restarted = ArtifactCache(tmp_path, max_bytes=1024)
+    assert restarted.latest("eta", "Production") == "1"
+    assert restarted.get("eta", 1, "model.joblib") == first
+
+
+def test_eviction_keeps_latest_versions(tmp_path):
+    cache = ArtifactCache(tmp_path, max_bytes=250)
+    for version in (1, 2):
+        cache.get_or_download("eta", version, "model.joblib", write_artifact(100))
+    cache.set_latest("eta", "Production", 1)
+    cache.get_or_download("eta", 3, "model.joblib", write_artifact(100))
+
+    assert cache.get("eta", 1, "model.joblib") is not None
+    assert cache.get("eta", 2, "model.joblib") is None
+    assert cache.get("eta", 3, "model.joblib") is not None
+    assert cache.size() == 200
+
+
+def _download_in_process(root, counter):
+    def download(dst_path):
+        with counter.get_lock():
+            counter.value += 1
+        return write_artifact(10)(dst_path)
+
+    ArtifactCache(root, max_bytes=1024).get_or_download(
+        "eta", 1, "model.joblib", download
+    )
+
+
+def test_concurrent_workers_download_once(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    counter = ctx.Value("i", 0)
+    workers = [
+        ctx.Process(target=_download_in_process, args=(tmp_path, counter))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert counter.value == 1
+
+
+def test_root_is_created_on_first_write(tmp_path):
+    root = tmp_path / "models"
+    cache = ArtifactCache(root, max_bytes=1024)
+    assert not root.exists()
+    assert cache.get("eta", 1, "model.joblib") is None
+    assert cache.latest("eta", "Production") is None
+    assert cache.size() == 0
+    assert not root.exists()
+
+    cache.set_latest("eta", "Production", 1)
+    assert cache.latest("eta", "Production") == "1"
+    cache.get_or_download("eta", 1, "model.joblib", write_artifact(10))
+    assert cache.size() == 10
@@ -0,0 +1,57 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from frame.constants import FrameModels
+from frame.api.batching import InferenceBatcher
+from frame.api.dependencies import MLFlowPredictor
+
+
+def test_concurrent_predictions_are_batched(
+    availability_pipeline, holdout, availability_features
+):
+    batcher = InferenceBatcher(window=0.05, max_batch_size=16)
+    predictor = MLFlowPredictor(
+        FrameModels.AVAILABILITY, probabilistic=True, cache_size=0, batcher=batcher
+    )
+    loaded = predictor.load(availability_pipeline, version=1)
+    rows = holdout[availability_features].iloc[:64].to_dict("records")
+    expected = loaded.predict_many(holdout[availability_features].iloc[:64])
+
+    batcher.start()
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        predictions = list(executor.map(lambda row: loaded.predict(**row), rows))
+    batcher.stop()
+
+    assert predictions == pytest.approx(expected.tolist())
+    stats = batcher.stats()
+    assert stats["rows"] == len(rows)
+    assert stats["batches"] < len(rows)
+
+
+def test_batches_are_grouped_by_scoring_function():
+    batcher = InferenceBatcher()
+    calls = []
+
+    def double(X):
+        calls.append(len(X["x"]))
+        return [2 * x for x in X["x"]]
+
+    def fail(X):
+        raise ValueError("Broken model")
+
+    batch = [
+        (score, {"x": x}, Future())
+        for score, x in ((double, 1), (fail, 2), (double, 3))
+    ]
+    batcher._score(batch)  # pylint: disable=protected-access
+
+    assert calls == [2]
+    assert [batch[0][2].result(), batch[2][2].result()] == [2, 6]
+    with pytest.raises(ValueError):
+        batch[1][2].result()
+
+
+def test_stopped_batcher_scores_right_away():
+    batcher = InferenceBatcher()
+    assert batcher.predict(lambda X: [x + 1 for x in X["x"]], {"x": 1}) == 2
@@ -0,0 +1,49 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from frame.constants import FrameModels
+from frame.train.compiled import compile_pipeline
+from frame.api.dependencies import MLFlowPredictor
+
+
+def test_compiled_eta_matches_pipeline(eta_pipeline, holdout, eta_features):
+    X = holdout[eta_features]
+    compiled = compile_pipeline(eta_pipeline)
+    np.testing.assert_allclose(compiled.predict(X), eta_pipeline.predict(X.copy()))
+
+
+def test_compiled_availability_matches_pipeline(
+    availability_pipeline, holdout, availability_features
+):
+    X = holdout[availability_features]
+    compiled = compile_pipeline(availability_pipeline)
+    np.testing.assert_allclose(
+        compiled.predict_proba(X), availability_pipeline.predict_proba(X.copy())
+    )
+    np.testing.assert_array_equal(
+        compiled.predict(X), availability_pipeline.predict(X.copy())
+    )
+
+
+def test_compiled_single_row(availability_pipeline, holdout, availability_features):
+    row = holdout[availability_features].iloc[0].to_dict()
+    compiled = compile_pipeline(availability_pipeline)
+    expected = availability_pipeline.predict_proba(pd.DataFrame(row, index=[0]))
+    actual = compiled.predict_proba({k: [v] for k, v in row.items()})
+    np.testing.assert_allclose(actual, expected)
+
+
+def test_predictor_compiled_matches_pandas(
+    availability_pipeline, holdout, availability_features
+):
+    predictor = MLFlowPredictor(FrameModels.AVAILABILITY, probabilistic=True)
+    predictor.compile_pipeline = False
+    predictor.publish(predictor.load(availability_pipeline, version=1))
+    row = holdout[availability_features].iloc[3].to_dict()
+    expected = predictor.predict(**row)
+
+    predictor.compile_pipeline = True
+    predictor.publish(predictor.load(availability_pipeline, version=1))
+    assert predictor.compiled is not None
+    assert predictor.predict(**row) == pytest.approx(expected)
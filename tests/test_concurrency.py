@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+from frame.api import concurrency
+from frame.api.concurrency import SingleFlight, run_sync
+
+
+def describe_call(*args, db=None, **kwargs):
+    return threading.current_thread().name, args, db, kwargs
+
+
+def test_run_sync_runs_off_the_event_loop():
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    name, args, db, kwargs = asyncio.run(
+        run_sync(describe_call, 1, executor=executor, key="value")
+    )
+    assert name.startswith("inference")
+    assert (args, db, kwargs) == ((1,), None, {"key": "value"})
+
+    name, *_ = asyncio.run(run_sync(describe_call))
+    assert name != threading.current_thread().name
+    executor.shutdown()
+
+
+def test_run_sync_with_db_opens_and_closes_a_session():
+    session = mock.Mock()
+    with mock.patch.object(concurrency, "SessionLocal", return_value=session):
+        _, _, db, _ = asyncio.run(run_sync(describe_call, db=None, with_db=True))
+
+    assert db is session
+    session.close.assert_called_once()
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        results = await asyncio.gather(
+            *(flights.run("key", compute) for _ in range(10))
+        )
+        return results, await flights.run("key", compute)
+
+    results, later = asyncio.run(main())
+    assert results == [1] * 10
+    # Once done, the key is computed again
+    assert later == 2
+
+
+def test_single_flight_shares_errors():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(
+            flights.run("key", fail), flights.run("key", fail), return_exceptions=True
+        )
+
+    errors = asyncio.run(main())
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert not flights._tasks
+
+
+def test_single_flight_waiter_cancellation_does_not_cancel_others():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.run("key", compute))
+        second = asyncio.ensure_future(flights.run("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,125 @@
+# pylint: disable=redefined-outer-name
+import json
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import tenacity
+
+from frame.data import ecobici
+
+
+class StubGBFS:
+    """Local GBFS API serving a single feed."""
+
+    def __init__(self):
+        self.payload = {"last_updated": 1, "ttl": 0, "data": {"stations": []}}
+        self.etag = '"v1"'
+        self.requests = 0
+        self.errors_left = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+                stub.requests += 1
+                if stub.errors_left > 0:
+                    stub.errors_left -= 1
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                if self.headers.get("If-None-Match") == stub.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = json.dumps(stub.payload).encode()
+                self.send_response(200)
+                self.send_header("ETag", stub.etag)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/{{endpoint}}"
+
+    def set_stations(self, stations, last_updated, etag):
+        self.payload = {
+            "last_updated": last_updated,
+            "ttl": 0,
+            "data": {"stations": stations},
+        }
+        self.etag = etag
+
+
+@pytest.fixture
+def stub_gbfs(monkeypatch):
+    stub = StubGBFS()
+    thread = threading.Thread(
+        target=stub.server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    monkeypatch.setattr(ecobici, "BASE_URL", partial(stub.url.format))
+    monkeypatch.setattr(ecobici.GBFSFeed.fetch.retry, "wait", tenacity.wait_none())
+    yield stub
+    stub.server.shutdown()
+
+
+@pytest.fixture
+def feed():
+    return ecobici.GBFSFeed("stationStatus", ecobici.make_session())
+
+
+def test_fetch_parses_station_ids(stub_gbfs, feed):
+    stub_gbfs.set_stations([{"station_id": "2"}], last_updated=10, etag='"a"')
+    assert feed.fetch() == [{"station_id": 2}]
+
+
+def test_unchanged_etag_is_not_parsed(stub_gbfs, feed):
+    stub_gbfs.set_stations([{"station_id": "2"}], last_updated=10, etag='"a"')
+    assert feed.fetch() is not None
+    assert feed.fetch() is None
+    assert stub_gbfs.requests == 2
+
+
+def test_unchanged_last_updated_is_skipped(stub_gbfs, feed):
+    stub_gbfs.set_stations([{"station_id": "2"}], last_updated=10, etag='"a"')
+    assert feed.fetch() is not None
+    stub_gbfs.set_stations([{"station_id": "2"}], last_updated=10, etag='"b"')
+    assert feed.fetch() is None
+    stub_gbfs.set_stations([{"station_id": "3"}], last_updated=11, etag='"c"')
+    assert feed.fetch() == [{"station_id": 3}]
+
+
+def test_ttl_skips_requests(stub_gbfs, feed):
+    stub_gbfs.set_stations([], last_updated=10, etag='"a"')
+    stub_gbfs.payload["ttl"] = 60
+    assert feed.fetch() == []
+    assert feed.fetch() is None
+    assert stub_gbfs.requests == 1
+
+
+def test_retries_server_errors(stub_gbfs, feed):
+    stub_gbfs.set_stations([{"station_id": "2"}], last_updated=10, etag='"a"')
+    stub_gbfs.errors_left = 2
+    assert feed.fetch() == [{"station_id": 2}]
+    assert stub_gbfs.requests == 3
+
+
+def test_failed_write_fetches_the_update_again(stub_gbfs, feed):
+    stub_gbfs.set_stations([{"station_id": "2"}], last_updated=10, etag='"a"')
+
+    @feed.reset_on_error()
+    def refresh():
+        stations = feed.fetch()
+        if stations is not None:
+            raise RuntimeError("DB down")
+        return stations
+
+    with pytest.raises(RuntimeError):
+        refresh()
+    assert feed.fetch() == [{"station_id": 2}]
+    assert feed.fetch() is None
@@ -0,0 +1,43 @@
+import numpy as np
+
+from frame.api.history import StatusHistory
+from frame.api.snapshot import StationsStatusSnapshot
+
+
+def make_snapshot(station_ids, bikes):
+    return StationsStatusSnapshot.from_rows(
+        {
+            "station_id": station_id,
+            "num_bikes_available": n_bikes,
+            "num_bikes_disabled": 0,
+            "num_docks_available": 20 - n_bikes,
+            "num_docks_disabled": 0,
+        }
+        for station_id, n_bikes in zip(station_ids, bikes)
+    )
+
+
+def test_history_window_wraps_around():
+    history = StatusHistory(capacity=4, max_stations=8)
+    for ts in range(6):
+        history.append(make_snapshot([1, 2], [ts, 10 + ts]), timestamp=100 + ts)
+
+    samples = history.window(1, since=0)
+    assert [ts for ts, _ in samples] == [102, 103, 104, 105]
+    assert [counts[0] for _, counts in samples] == [2, 3, 4, 5]
+
+    samples = history.window(2, since=104)
+    assert samples == [(104, (14, 0, 6, 0)), (105, (15, 0, 5, 0))]
+
+
+def test_history_skips_missing_and_untracked_stations():
+    history = StatusHistory(capacity=8, max_stations=2)
+    history.append(make_snapshot([1, 2], [1, 2]), timestamp=1)
+    history.append(make_snapshot([1, 3], [3, 300]), timestamp=2)
+    history.append(make_snapshot([2], [4]), timestamp=3)
+
+    assert [ts for ts, _ in history.window(2, since=0)] == [1, 3]
+    assert history.window(3, since=0) == []
+    assert history.window(1, since=0)[-1][1][0] == 3
+    assert history.counts.dtype == np.uint8
+    assert history.nbytes == 8 * 8 + 8 * 2 * 4
@@ -0,0 +1,226 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import sessionmaker
+
+from frame.models.base import Base
+from frame.models import Station, StationStatus
+from frame.api import app, grid, leader, snapshot
+from frame.constants import STATIONS_STATUS_SIGNAL
+from frame.api.leader import (
+    SignalFollower,
+    RefreshNotifier,
+    FileLockElection,
+    bump_signal,
+    make_leader_election,
+)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_single_leader_with_failover(tmp_path):
+    leader = FileLockElection(tmp_path / "leader.lock")
+    follower = FileLockElection(tmp_path / "leader.lock")
+
+    assert leader.try_acquire()
+    assert leader.try_acquire()
+    assert not follower.try_acquire()
+
+    leader.release()
+    assert follower.try_acquire()
+    assert not leader.try_acquire()
+
+
+def test_election_follows_the_db(tmp_path):
+    engine = create_engine("sqlite://")
+    lock_file = tmp_path / "leader.lock"
+    assert isinstance(
+        make_leader_election(engine, True, 1, lock_file), FileLockElection
+    )
+    always = make_leader_election(engine, False, 1, lock_file)
+    assert always.try_acquire()
+    assert make_leader_election(engine, False, 1, lock_file).try_acquire()
+
+
+def test_followers_see_bumped_signals(db):
+    follower = SignalFollower()
+
+    assert follower.changed(db, "stations_status")
+    assert not follower.changed(db, "stations_status")
+
+    bump_signal(db, "stations_status")
+    assert follower.changed(db, "stations_status")
+    assert not follower.changed(db, "stations_status")
+
+    bump_signal(db, "stations_status")
+    bump_signal(db, "stations_info")
+    assert follower.changed(db, "stations_status")
+    assert follower.changed(db, "stations_info")
+    assert SignalFollower().changed(db, "stations_status")
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = messages
+        self.channels = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        raise asyncio.CancelledError()
+
+
+def test_notifier_delivers_published_signals(monkeypatch):
+    assert not RefreshNotifier(None).enabled
+    RefreshNotifier(None).notify("stations_status")
+
+    notifier = RefreshNotifier("redis://localhost:6379")
+    published = []
+    monkeypatch.setattr(
+        notifier._client,  # pylint: disable=protected-access
+        "publish",
+        lambda channel, name: published.append((channel, name)),
+    )
+    notifier.notify("stations_status")
+    assert published == [(notifier.channel, "stations_status")]
+
+    pubsub = FakePubSub(
+        [
+            {"type": "subscribe", "data": 1},
+            {"type": "message", "data": "stations_info"},
+            {"type": "message", "data": "model_eta"},
+            {"type": "message", "data": "stations_status"},
+        ]
+    )
+    client = mock.Mock(pubsub=lambda: pubsub, close=mock.AsyncMock())
+    monkeypatch.setattr(leader.aioredis, "from_url", lambda *args, **kwargs: client)
+    received = []
+
+    async def on_signal(name):
+        if name == "model_eta":
+            raise ValueError("Broken reload")
+        received.append(name)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(notifier.listen(on_signal))
+    assert pubsub.channels == [notifier.channel]
+    assert received == ["stations_info", "stations_status"]
+    client.close.assert_awaited_once()
+
+
+def test_advisory_lock_connection_autocommits():
+    engine = mock.Mock()
+    engine.dialect.name = "postgresql"
+    conn = engine.connect.return_value.execution_options.return_value
+    conn.execute.return_value.scalar.return_value = True
+    election = make_leader_election(engine, True, 1, None)
+
+    assert election.try_acquire()
+    assert election.try_acquire()
+    engine.connect.return_value.execution_options.assert_called_once_with(
+        isolation_level="AUTOCOMMIT"
+    )
+    # The lock was tried and then checked on the autocommit connection
+    assert conn.execute.call_count == 2
+    election.release()
+    conn.close.assert_called_once()
+
+
+@pytest.fixture
+def shared_db(monkeypatch):
+    """The API as a follower, with a DB shared with its leader."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+    monkeypatch.setattr(app, "SessionLocal", session)
+    monkeypatch.setattr(app, "LEADER", mock.Mock(is_leader=False))
+    monkeypatch.setattr(app, "FOLLOWER", SignalFollower())
+    monkeypatch.setattr(snapshot, "_snapshot", None)
+    monkeypatch.setattr(grid, "_grid", None)
+
+    db = session()
+    db.add(Station(station_id=1, name="s1", lat=-34.6, lon=-58.4))
+    db.add(
+        StationStatus(
+            station_id=1,
+            num_bikes_available=1,
+            num_bikes_disabled=0,
+            num_docks_available=9,
+            num_docks_disabled=0,
+            status="IN_SERVICE",
+            last_reported=1000,
+        )
+    )
+    db.commit()
+    yield db
+    db.close()
+
+
+def deliver(notifier, monkeypatch, published):
+    """Have the follower listen to the signals published by the leader."""
+    pubsub = FakePubSub([{"type": "message", "data": name} for _, name in published])
+    client = mock.Mock(pubsub=lambda: pubsub, close=mock.AsyncMock())
+    monkeypatch.setattr(leader.aioredis, "from_url", lambda *args, **kwargs: client)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(notifier.listen(app.on_refresh_signal))
+
+
+def test_refresh_signal_reloads_follower_snapshot(shared_db, monkeypatch):
+    notifier = RefreshNotifier("redis://localhost:6379")
+    published = []
+    monkeypatch.setattr(
+        notifier._client,  # pylint: disable=protected-access
+        "publish",
+        lambda channel, name: published.append((channel, name)),
+    )
+    monkeypatch.setattr(app, "NOTIFIER", notifier)
+    app.follow_stations(shared_db, record_history=False)
+    first = snapshot.current_snapshot()
+    assert first.get(1).num_bikes_available == 1
+
+    # The leader refreshes the status and signals it
+    shared_db.query(StationStatus).update({StationStatus.num_bikes_available: 4})
+    app.signal_refresh(shared_db, STATIONS_STATUS_SIGNAL)
+    assert published == [(notifier.channel, STATIONS_STATUS_SIGNAL)]
+
+    deliver(notifier, monkeypatch, published)
+    reloaded = snapshot.current_snapshot()
+    assert reloaded is not first
+    assert reloaded.get(1).num_bikes_available == 4
+
+
+def test_refresh_signal_with_unchanged_version_is_a_noop(shared_db, monkeypatch):
+    app.follow_stations(shared_db, record_history=False)
+    first = snapshot.current_snapshot()
+
+    notifier = RefreshNotifier("redis://localhost:6379")
+    with mock.patch.object(
+        app.station_service, "load_stations_status_snapshot"
+    ) as load_snapshot, mock.patch.object(
+        app.station_service, "load_stations_index"
+    ) as load_index:
+        deliver(notifier, monkeypatch, [(notifier.channel, STATIONS_STATUS_SIGNAL)])
+    load_snapshot.assert_not_called()
+    load_index.assert_not_called()
+    assert snapshot.current_snapshot() is first
@@ -0,0 +1,43 @@
+import sys
+import threading
+from pathlib import Path
+from functools import partial
+
+import pytest
+
+from frame.data import ecobici
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "locust"))
+
+from gbfs_stub import Feeds, make_server  # noqa: E402
+
+
+@pytest.fixture
+def gbfs_stub(monkeypatch):
+    feeds = Feeds(ttl=1, n_stations=50)
+    server = make_server("127.0.0.1", 0, feeds)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/{{endpoint}}"
+    monkeypatch.setattr(ecobici, "BASE_URL", partial(url.format))
+    yield feeds
+    server.shutdown()
+
+
+def test_stub_serves_feeds_conditionally(gbfs_stub):
+    session = ecobici.make_session()
+    info = ecobici.GBFSFeed("stationInformation", session)
+    status = ecobici.GBFSFeed("stationStatus", session)
+
+    stations = info.fetch()
+    stations_status = status.fetch()
+    assert len(stations) == len(stations_status) == 50
+    assert {s["station_id"] for s in stations} == {
+        s["station_id"] for s in stations_status
+    }
+
+    info.ttl = status.ttl = 0
+    assert info.fetch() is None
+    assert info.etag is not None
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+from sklearn.dummy import DummyRegressor
+
+from frame.train.metaestimator import PartitionedMetaEstimator
+
+
+def test_rows_without_partition_use_the_fallback():
+    X = pd.DataFrame({"station_id": [1, 1, 2, 2], "hod": [0, 1, 2, 3]})
+    y = pd.Series([5.0, 15.0, 15.0, 25.0])
+    estimator = PartitionedMetaEstimator(DummyRegressor(), "station_id")
+    estimator.fit(X, y)
+
+    X_new = pd.DataFrame({"station_id": [1, np.nan, 3, 2], "hod": [0, 1, 2, 3]})
+    # 1 and 2 have their own estimator, a missing and an unknown station don't
+    np.testing.assert_array_equal(estimator.predict(X_new), [10.0, 15.0, 15.0, 20.0])
+    np.testing.assert_array_equal(
+        estimator.predict_proba(X_new), [10.0, 15.0, 15.0, 20.0]
+    )
@@ -0,0 +1,77 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from frame.api import metrics
+from frame.api.metrics import (
+    Counter,
+    Histogram,
+    CallbackMetric,
+    MetricsRegistry,
+    MetricsMiddleware,
+)
+
+
+def test_metrics_are_rendered_in_prometheus_text_format():
+    registry = MetricsRegistry()
+    latency = Histogram(
+        "latency_seconds", "Latency.", ("phase",), (0.1, 1), registry=registry
+    )
+    rows = Counter("rows", "Rows.", ("result",), registry=registry)
+    CallbackMetric(
+        "cache_size",
+        "Cache size.",
+        lambda: {("eta",): 3},
+        ("model",),
+        registry=registry,
+    )
+
+    for value in (0.05, 0.1, 0.5, 2):
+        latency.labels("read").observe(value)
+    rows.labels('in"serted').inc(2)
+    rows.labels('in"serted').inc()
+
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{phase="read",le="0.1"} 2.0' in lines
+    assert 'latency_seconds_bucket{phase="read",le="1.0"} 3.0' in lines
+    assert 'latency_seconds_bucket{phase="read",le="+Inf"} 4.0' in lines
+    assert 'latency_seconds_sum{phase="read"} 2.65' in lines
+    assert 'latency_seconds_count{phase="read"} 4.0' in lines
+    assert "# TYPE rows counter" in lines
+    assert 'rows_total{result="in\\"serted"} 3.0' in lines
+    assert 'cache_size{model="eta"} 3.0' in lines
+
+
+def test_histogram_times_blocks():
+    histogram = Histogram("block_seconds", "Block.", registry=None)
+    with histogram.time():
+        pass
+    child = histogram.labels()
+    assert sum(child.counts) == 1 and 0 <= child.sum < 0.1
+
+
+def test_requests_are_labelled_by_route_template(monkeypatch):
+    latency = Histogram(
+        "requests_seconds", "Requests.", ("method", "route", "status"), registry=None
+    )
+    monkeypatch.setattr(metrics, "REQUEST_LATENCY", latency)
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, routes=app.routes)
+
+    @app.get("/stations/{station_id}")
+    def get_station(station_id: int):
+        return {"station_id": station_id}
+
+    client = TestClient(app)
+    client.get("/stations/1")
+    client.get("/stations/2")
+    client.get("/stations/nope")
+    client.get("/missing")
+
+    counts = {labels: sum(child.counts) for labels, child in latency._children.items()}
+    assert counts == {
+        ("GET", "/stations/{station_id}", "200"): 2,
+        ("GET", "/stations/{station_id}", "422"): 1,
+        ("GET", "unmatched", "404"): 1,
+    }
@@ -0,0 +1,104 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+from frame.api import app
+from frame.utils import LRUCache
+from frame.constants import FrameModels
+from frame.api.dependencies import MLFlowPredictor
+
+
+class ConstantPipeline:
+    """Pipeline predicting the same value for every row, counting rows scored."""
+
+    def __init__(self, value):
+        self.value = value
+        self.scored = 0
+
+    def predict(self, X):
+        self.scored += len(X)
+        return np.full(len(X), self.value)
+
+
+def test_lru_cache_hits_misses_and_eviction():
+    cache = LRUCache(2)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    # b is now the least recently used
+    cache.put("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 2, "hit_ratio": 0.6}
+
+    cache.clear()
+    assert len(cache) == 0 and cache.get("a") is None
+
+
+def test_lru_cache_of_size_zero_is_disabled():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert len(cache) == 0
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_predictions_are_cached_by_features():
+    predictor = MLFlowPredictor(FrameModels.ETA, compile_pipeline=False, cache_size=10)
+    pipeline = ConstantPipeline(3.0)
+    predictor.publish(predictor.load(pipeline, version=1))
+
+    assert predictor.predict(hod=8, station_id=1) == 3.0
+    assert predictor.predict(hod=8, station_id=1) == 3.0
+    assert predictor.predict(hod=9, station_id=1) == 3.0
+    assert pipeline.scored == 2
+    assert (predictor.cache.hits, predictor.cache.misses) == (1, 2)
+
+
+def test_disabled_cache_scores_every_prediction():
+    predictor = MLFlowPredictor(FrameModels.ETA, compile_pipeline=False, cache_size=0)
+    pipeline = ConstantPipeline(3.0)
+    predictor.publish(predictor.load(pipeline, version=1))
+
+    for _ in range(3):
+        predictor.predict(hod=8, station_id=1)
+    assert pipeline.scored == 3
+    assert len(predictor.cache) == 0
+
+
+def test_swapped_model_starts_with_an_empty_cache():
+    predictor = MLFlowPredictor(FrameModels.ETA, compile_pipeline=False, cache_size=10)
+    predictor.publish(predictor.load(ConstantPipeline(3.0), version=1))
+    predictor.predict(hod=8, station_id=1)
+    assert len(predictor.cache) == 1
+
+    # Same version, so only clearing the cache keeps old predictions from being served
+    new_pipeline = ConstantPipeline(5.0)
+    predictor.publish(predictor.load(new_pipeline, version=1))
+    assert len(predictor.cache) == 0
+    assert predictor.predict(hod=8, station_id=1) == 5.0
+    assert new_pipeline.scored == 1
+
+
+def test_prediction_cache_requests_are_exported(monkeypatch):
+    eta = MLFlowPredictor(FrameModels.ETA, compile_pipeline=False, cache_size=10)
+    availability = MLFlowPredictor(FrameModels.AVAILABILITY, cache_size=10)
+    monkeypatch.setattr(app, "ETAPredictor", eta)
+    monkeypatch.setattr(app, "AvailabilityPredictor", availability)
+    eta.publish(eta.load(ConstantPipeline(3.0), version=1))
+    for hod in (8, 8, 8, 9):
+        eta.predict(hod=hod, station_id=1)
+
+    lines = TestClient(app.app).get("/metrics").text.splitlines()
+    assert "# TYPE frame_prediction_cache_requests counter" in lines
+    assert (
+        'frame_prediction_cache_requests_total{model="eta",result="hit"} 2.0' in lines
+    )
+    assert (
+        'frame_prediction_cache_requests_total{model="eta",result="miss"} 2.0' in lines
+    )
+    # Predictors with no model loaded yet are left out
+    assert 'model="availability"' not in "".join(
+        line for line in lines if line.startswith("frame_prediction_cache_requests")
+    )
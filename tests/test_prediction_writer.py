@@ -0,0 +1,84 @@
+import csv
+import json
+from unittest import mock
+
+from sqlalchemy.orm import sessionmaker
+
+from frame.models import Prediction
+from frame.api.prediction_writer import (
+    PredictionWriter,
+    prediction_row,
+    write_predictions,
+)
+
+
+def make_prediction(station_id):
+    return Prediction(
+        station_id=station_id,
+        bike_availability_probability=0.5,
+        availability_model_version=2,
+        availability_features={"hod": 8},
+        bike_eta=3.5,
+        eta_model_version=1,
+        eta_features=None,
+        user_eta=5,
+        user_lat=-34.6,
+        user_lon=-58.4,
+    )
+
+
+def test_writer_flushes_with_executemany(db):
+    writer = PredictionWriter(sessionmaker(bind=db.get_bind()), batch_size=2)
+    for station_id in range(5):
+        assert writer.put(make_prediction(station_id))
+
+    assert writer.flush() == 5
+    assert writer.stats() == {"queue_depth": 0, "written": 5, "dropped": 0, "failed": 0}
+    predictions = db.query(Prediction).order_by(Prediction.id).all()
+    assert [p.station_id for p in predictions] == list(range(5))
+    assert predictions[0].availability_features == {"hod": 8}
+
+
+def test_writer_drops_predictions_when_full():
+    writer = PredictionWriter(mock.Mock(), max_queue_size=2)
+
+    assert [writer.put(make_prediction(i)) for i in range(3)] == [True, True, False]
+    assert writer.stats()["dropped"] == 1
+    assert writer.queue_depth == 2
+
+
+def test_writer_counts_failed_flushes():
+    db = mock.Mock()
+    db.execute.side_effect = RuntimeError("DB down")
+    writer = PredictionWriter(lambda: db)
+    writer.put(make_prediction(1))
+
+    assert writer.flush() == 0
+    assert writer.stats()["failed"] == 1
+    db.rollback.assert_called_once()
+    db.close.assert_called_once()
+
+
+def test_write_predictions_copies_on_postgres():
+    db = mock.Mock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+    cursor = db.connection.return_value.connection.cursor.return_value
+    copied = []
+    cursor.copy_expert.side_effect = lambda sql, buffer: copied.append(
+        (sql, buffer.read())
+    )
+
+    write_predictions(db, [prediction_row(make_prediction(i)) for i in (1, 2)])
+
+    ((sql, data),) = copied
+    assert sql.startswith("COPY predictions (station_id, ")
+    assert sql.endswith("FROM STDIN WITH (FORMAT csv)")
+    rows = list(csv.reader(data.splitlines()))
+    columns = sql[sql.index("(") + 1 : sql.index(")")].split(", ")
+    first = dict(zip(columns, rows[0]))
+    assert len(rows) == 2
+    assert first["station_id"] == "1"
+    assert json.loads(first["availability_features"]) == {"hod": 8}
+    assert first["eta_features"] == ""
+    db.execute.assert_not_called()
+    db.commit.assert_called_once()
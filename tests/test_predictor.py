@@ -0,0 +1,144 @@
+import os
+from types import SimpleNamespace
+
+import joblib
+import mlflow
+import pytest
+from fastapi.testclient import TestClient
+
+from frame.api import app
+from frame.constants import FrameModels
+from frame.train.artifacts import dump_artifacts
+from frame.api.artifact_cache import ArtifactCache
+from frame.api.dependencies import MLFlowPredictor
+from frame.exceptions import UninitializedPredictor
+
+
+def test_reload_swaps_loaded_model(
+    availability_pipeline, holdout, availability_features
+):
+    predictor = MLFlowPredictor(FrameModels.AVAILABILITY, probabilistic=True)
+    with pytest.raises(UninitializedPredictor):
+        predictor.current()
+
+    first = predictor.load(availability_pipeline, version=1)
+    predictor.publish(first)
+    in_flight = predictor.current()
+
+    predictor.publish(predictor.load(availability_pipeline, version=2))
+    assert in_flight is first and in_flight.version == 1
+    assert predictor.model_version == 2
+    assert predictor.stats()["swaps"] == 2
+
+    row = holdout[availability_features].iloc[0].to_dict()
+    assert predictor.predict(**row) == pytest.approx(in_flight.predict(**row))
+
+
+def test_failed_reload_keeps_current_model(availability_pipeline, monkeypatch):
+    predictor = MLFlowPredictor(FrameModels.AVAILABILITY, probabilistic=True)
+    loaded = predictor.load(availability_pipeline, version=1)
+    predictor.publish(loaded)
+
+    def broken_reload(stage):
+        raise ValueError("No latest models found")
+
+    monkeypatch.setattr(predictor, "_reload", broken_reload)
+    predictor.reload()
+
+    assert predictor.current() is loaded
+    stats = predictor.stats()
+    assert stats["reloads"] == 1 and stats["failed"] == 1
+    assert stats["last_reload_seconds"] is not None
+
+
+def test_restart_loads_from_artifact_cache(
+    availability_pipeline, tmp_path, monkeypatch
+):
+    cache = ArtifactCache(tmp_path, max_bytes=10 * 1024**2)
+    path = cache.path("availability", "3", "availability.joblib")
+    path.parent.mkdir(parents=True)
+    joblib.dump(availability_pipeline, path)
+    cache.set_latest("availability", "Production", "3")
+
+    predictor = MLFlowPredictor(
+        FrameModels.AVAILABILITY, probabilistic=True, artifact_cache=cache
+    )
+
+    def registry_reload(stage):
+        raise AssertionError("Registry should not be queried on restart")
+
+    monkeypatch.setattr(predictor, "_reload", registry_reload)
+    predictor.reload()
+    assert predictor.model_version == "3"
+    assert predictor.stats()["failed"] == 0
+
+
+def test_reload_prefers_serving_artifact(availability_pipeline, tmp_path, monkeypatch):
+    registry = tmp_path / "registry"
+    registry.mkdir()
+    compressed_path, serving_path = dump_artifacts(
+        availability_pipeline, FrameModels.AVAILABILITY, str(registry)
+    )
+    downloads = []
+
+    def download_artifacts(artifact_path, run_id, dst_path):
+        downloads.append(artifact_path)
+        src = registry / artifact_path
+        if not src.exists():
+            raise OSError(f"No artifact {artifact_path}")
+        dst = os.path.join(dst_path, artifact_path)
+        os.link(src, dst)
+        return dst
+
+    monkeypatch.setattr(mlflow.artifacts, "download_artifacts", download_artifacts)
+    predictor = MLFlowPredictor(
+        FrameModels.AVAILABILITY,
+        probabilistic=True,
+        artifact_cache=ArtifactCache(tmp_path / "cache", max_bytes=10 * 1024**2),
+    )
+
+    latest = SimpleNamespace(version="1", run_id="run")
+    predictor._load_pipeline(latest)
+    assert downloads == [os.path.basename(serving_path)]
+
+    os.remove(serving_path)
+    latest = SimpleNamespace(version="2", run_id="run")
+    predictor._load_pipeline(latest)
+    assert downloads[1:] == [
+        os.path.basename(serving_path),
+        os.path.basename(compressed_path),
+    ]
+
+
+def test_reloads_are_exported_as_metrics(availability_pipeline, monkeypatch):
+    eta = MLFlowPredictor(FrameModels.ETA)
+    availability = MLFlowPredictor(FrameModels.AVAILABILITY, probabilistic=True)
+    monkeypatch.setattr(app, "ETAPredictor", eta)
+    monkeypatch.setattr(app, "AvailabilityPredictor", availability)
+    client = TestClient(app.app)
+
+    def good_reload(stage):
+        availability.publish(availability.load(availability_pipeline, version=1))
+
+    monkeypatch.setattr(availability, "_reload", good_reload)
+    availability.reload()
+    lines = client.get("/metrics").text.splitlines()
+    assert 'frame_model_swaps_total{model="availability"} 1.0' in lines
+    assert 'frame_model_swaps_total{model="eta"} 0.0' in lines
+    assert 'frame_model_reload_failures_total{model="availability"} 0.0' in lines
+    last_swap_at = availability.stats()["last_swap_at"]
+    last_swap = (
+        f'frame_model_last_swap_timestamp_seconds{{model="availability"}} '
+        f"{last_swap_at!r}"
+    )
+    assert last_swap in lines
+
+    def broken_reload(stage):
+        raise ValueError("No latest models found")
+
+    monkeypatch.setattr(availability, "_reload", broken_reload)
+    availability.reload()
+    lines = client.get("/metrics").text.splitlines()
+    assert 'frame_model_swaps_total{model="availability"} 1.0' in lines
+    assert 'frame_model_reload_failures_total{model="availability"} 1.0' in lines
+    assert last_swap in lines
@@ -0,0 +1,153 @@
+import json
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from frame.api.metrics import CACHE_REQUESTS
+from frame.api.concurrency import SingleFlight
+from frame.api.namespaces import stations as stations_ns
+from frame.api.responses import GZipMiddleware, EncodedResponseCache
+
+CONTENT = [{"station_id": i, "name": f"Station {i}"} for i in range(100)]
+
+
+def make_client():
+    encoded = EncodedResponseCache("test")
+    version = object()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return CONTENT
+
+    app = FastAPI()
+    app.add_middleware(GZipMiddleware, minimum_size=256)
+
+    @app.get("/")
+    def index(request: Request):
+        return encoded.get(version, build).respond(request)
+
+    return TestClient(app), builds
+
+
+def test_encoded_response_is_built_once_and_not_compressed_twice():
+    client, builds = make_client()
+
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == CONTENT
+    raw = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert json.loads(raw.content) == CONTENT
+    assert len(builds) == 1
+
+
+def test_encoded_response_etag():
+    client, _ = make_client()
+    etag = client.get("/").headers["etag"]
+
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+    assert (
+        client.get("/", headers={"If-None-Match": f'"x", W/{etag}'}).status_code == 304
+    )
+    assert client.get("/", headers={"If-None-Match": '"x"'}).status_code == 200
+
+
+def test_encoded_response_peek():
+    encoded = EncodedResponseCache("test")
+    version = object()
+
+    assert encoded.peek(version) is None
+    built = encoded.get(version, lambda: CONTENT)
+    assert encoded.peek(version) is built
+    assert encoded.peek(object()) is None
+
+
+def test_encoded_response_latest_is_kept_until_replaced():
+    encoded = EncodedResponseCache("test")
+
+    assert encoded.latest() is None
+    built = encoded.get(object(), lambda: CONTENT)
+    assert encoded.latest() is built
+    rebuilt = encoded.get(object(), lambda: [])
+    assert encoded.latest() is rebuilt is not built
+
+
+class Revalidation:
+    """Builds the response of a new version once released, counting builds."""
+
+    def __init__(self, encoded, fail=False):
+        self.encoded = encoded
+        self.version = object()
+        self.fail = fail
+        self.builds = 0
+        self.released = asyncio.Event()
+
+    def peek(self):
+        return self.encoded.peek(self.version)
+
+    async def build(self):
+        self.builds += 1
+        await self.released.wait()
+        if self.fail:
+            raise ValueError("DB down")
+        return self.encoded.get(self.version, lambda: [])
+
+
+@pytest.fixture
+def stale_while_revalidate(monkeypatch):
+    monkeypatch.setattr(stations_ns, "STALE_WHILE_REVALIDATE", True)
+    monkeypatch.setattr(stations_ns, "FLIGHTS", SingleFlight())
+    encoded = EncodedResponseCache("test")
+    stale = encoded.get(object(), lambda: CONTENT)
+    return encoded, stale
+
+
+def get_encoded(revalidation):
+    return stations_ns.get_encoded(
+        "test", revalidation.encoded, revalidation.peek, revalidation.build
+    )
+
+
+def test_stale_response_is_served_while_revalidating(stale_while_revalidate):
+    encoded, stale = stale_while_revalidate
+    revalidation = Revalidation(encoded)
+    served_stale = CACHE_REQUESTS.labels("test", "stale")
+
+    async def main():
+        before = served_stale.value
+        responses = await asyncio.gather(*(get_encoded(revalidation) for _ in range(5)))
+        assert all(response is stale for response in responses)
+        assert served_stale.value - before == 5
+        # Revalidation is still running, and concurrent requests shared it
+        assert revalidation.builds == 1
+        building = stations_ns.FLIGHTS._tasks["test"]
+
+        revalidation.released.set()
+        fresh = await building
+        assert await get_encoded(revalidation) is fresh is not stale
+        assert revalidation.builds == 1
+
+    asyncio.run(main())
+
+
+def test_failed_revalidation_keeps_the_stale_response(stale_while_revalidate):
+    encoded, stale = stale_while_revalidate
+    revalidation = Revalidation(encoded, fail=True)
+
+    async def main():
+        assert await get_encoded(revalidation) is stale
+        building = stations_ns.FLIGHTS._tasks["test"]
+        revalidation.released.set()
+        with pytest.raises(ValueError):
+            await building
+
+        assert encoded.latest() is stale
+        # The next request serves it again and retries
+        assert await get_encoded(revalidation) is stale
+        await asyncio.gather(stations_ns.FLIGHTS._tasks["test"], return_exceptions=True)
+        assert revalidation.builds == 2
+
+    asyncio.run(main())
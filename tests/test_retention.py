@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import duckdb
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import sessionmaker
+
+from frame.models.base import Base
+from frame.models import Prediction
+from frame.api.services.predictions import (
+    ARCHIVE_SCHEMA,
+    archive_predictions,
+    predictions_archive_root,
+)
+
+
+def make_prediction(station_id, created_at):
+    return Prediction(
+        station_id=station_id,
+        bike_availability_probability=0.5,
+        availability_model_version=2,
+        availability_features={"hod": created_at.hour, "minutes_bt_check": 5},
+        bike_eta=3.5,
+        eta_model_version=1,
+        eta_features={"hod": created_at.hour, "is_holiday": False},
+        user_eta=5,
+        user_lat=-34.6,
+        user_lon=-58.4,
+        created_at=created_at,
+    )
+
+
+def make_db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_archive_predictions(tmp_path):
+    db = make_db()
+    now = datetime.utcnow()
+    old = [now - timedelta(days=40, hours=i) for i in range(5)]
+    db.add_all([make_prediction(i, created_at) for i, created_at in enumerate(old)])
+    db.add(make_prediction(99, now - timedelta(days=1)))
+    db.commit()
+
+    cursor = duckdb.connect()
+    stats = archive_predictions(db, cursor, 30, root=str(tmp_path), batch_size=2)
+
+    assert stats.archived == 5
+    assert stats.files == 5
+    assert [p.station_id for p in db.query(Prediction)] == [99]
+
+    # The layout read by parquet_partitioned_table
+    files = f"{tmp_path}/year=*/month=*/day=*/hour=*/*.parquet"
+    archived = cursor.execute(
+        f"SELECT * FROM parquet_scan('{files}', HIVE_PARTITIONING=1) ORDER BY id"
+    ).df()
+    assert archived["station_id"].tolist() == [0, 1, 2, 3, 4]
+    assert archived["eta_hod"].tolist() == [created_at.hour for created_at in old]
+    assert archived["eta_is_holiday"].dtype == bool
+    assert archived["availability_minutes_bt_check"].tolist() == [5] * 5
+    assert "eta_features" not in archived.columns
+    assert archived["user_lat"].tolist() == [-34.6] * 5
+
+    assert archive_predictions(db, cursor, 30, root=str(tmp_path)).archived == 0
+
+
+def test_archive_predictions_fixed_schema(tmp_path):
+    db = make_db()
+    now = datetime.utcnow()
+    old = make_prediction(0, now - timedelta(days=40))
+    other_version = make_prediction(1, now - timedelta(days=41))
+    other_version.eta_model_version = 2
+    other_version.eta_features = {"hod": 3, "weather": "rain"}
+    other_version.availability_features = None
+    db.add_all([old, other_version])
+    db.commit()
+
+    cursor = duckdb.connect()
+    assert archive_predictions(db, cursor, 30, root=str(tmp_path)).files == 2
+
+    files = sorted(tmp_path.glob("year=*/month=*/day=*/hour=*/*.parquet"))
+    schemas = [
+        cursor.execute(f"DESCRIBE SELECT * FROM '{file}'").fetchall() for file in files
+    ]
+    assert schemas[0] == schemas[1]
+    assert [(name, dtype) for name, dtype, *_ in schemas[0]] == list(
+        ARCHIVE_SCHEMA.items()
+    )
+
+    archived = cursor.execute(
+        f"SELECT * FROM parquet_scan('{tmp_path}/*/*/*/*/*.parquet') ORDER BY id"
+    ).df()
+    assert archived["eta_features_extra"].isna().tolist() == [True, False]
+    assert archived["eta_features_extra"][1] == '{"weather": "rain"}'
+    assert archived["availability_minutes_bt_check"].isna().tolist() == [False, True]
+
+
+def test_predictions_created_at_in_utc():
+    db = make_db()
+    prediction = make_prediction(0, datetime.utcnow())
+    del prediction.created_at
+    db.add(prediction)
+    db.commit()
+
+    created_at = db.query(Prediction.created_at).scalar()
+    assert abs(created_at - datetime.utcnow()) < timedelta(minutes=1)
+
+
+def test_predictions_archive_root_reads_bucket_when_called(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", "archive")
+    assert predictions_archive_root() == "s3://archive/silver/predictions"
+    assert predictions_archive_root("other", "gold") == "s3://other/gold/predictions"
@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+
+from frame.api.spatial import StationsIndex
+from frame.constants import EARTH_RADIUS_METERS
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+
+def make_stations(n_stations=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {"station_id": i, "lat": lat, "lon": lon}
+        for i, (lat, lon) in enumerate(
+            zip(
+                rng.uniform(-34.70, -34.53, n_stations),
+                rng.uniform(-58.53, -58.35, n_stations),
+            )
+        )
+    ]
+
+
+def test_nearest_matches_brute_force():
+    stations = make_stations()
+    index = StationsIndex(stations)
+    lat, lon = -34.6037, -58.3816
+
+    distances = haversine(
+        lat,
+        lon,
+        np.array([s["lat"] for s in stations]),
+        np.array([s["lon"] for s in stations]),
+    )
+    expected = np.argsort(distances)[:10]
+
+    nearest = index.nearest(lat, lon, k=10)
+    assert [station["station_id"] for station, _ in nearest] == expected.tolist()
+    np.testing.assert_allclose(
+        [distance for _, distance in nearest], distances[expected], rtol=1e-6
+    )
+
+    radius = float(distances[expected[3]]) + 1
+    assert len(index.nearest(lat, lon, k=10, radius=radius)) == 4
+    assert len(index.nearest(lat, lon, k=10_000)) == len(stations)
+    assert StationsIndex([]).nearest(lat, lon, k=5) == []
+
+
+def test_nearest_is_fast():
+    index = StationsIndex(make_stations())
+    n_queries = 1000
+    start = time.perf_counter()
+    for _ in range(n_queries):
+        index.nearest(-34.6037, -58.3816, k=10, radius=1000)
+    assert (time.perf_counter() - start) / n_queries < 1e-3
+
+
+def test_get_by_id():
+    stations = make_stations(10)
+    index = StationsIndex(stations)
+
+    assert index.get(3) == stations[3]
+    assert index.get(10) is None
@@ -0,0 +1,388 @@
+# pylint: disable=redefined-outer-name
+from unittest import mock
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from frame.constants import FrameModels
+from frame.api.metrics import CACHE_REQUESTS
+from frame.api import grid, spatial, snapshot
+from frame.models import Station, StationStatus
+from frame.exceptions import StationDoesNotExist
+from frame.api.snapshot import StationsStatusSnapshot
+from frame.api.schemas.stations import PredictionParams
+from frame.api.services import stations as station_service
+from frame.api.namespaces.stations import router as stations_router
+from frame.api.dependencies import (
+    LoadedModel,
+    MLFlowPredictor,
+    get_eta_predictor,
+    get_prediction_writer,
+    get_availability_predictor,
+)
+
+
+@pytest.fixture(autouse=True)
+def unpublished(monkeypatch):
+    """Start each test with no snapshot, stations index or grid published."""
+    monkeypatch.setattr(snapshot, "_snapshot", None)
+    monkeypatch.setattr(spatial, "_index", None)
+    monkeypatch.setattr(grid, "_grid", None)
+
+
+def station_status(station_id, bikes=1, status="IN_SERVICE"):
+    return {
+        "station_id": station_id,
+        "num_bikes_available": bikes,
+        "num_bikes_disabled": 0,
+        "num_docks_available": 10 - bikes,
+        "num_docks_disabled": 0,
+        "status": status,
+        "last_reported": 1000 + bikes,
+    }
+
+
+def refresh_status(db, stations_status):
+    with mock.patch.object(
+        station_service, "fetch_stations_status", return_value=stations_status
+    ):
+        return station_service.update_stations_status(db)
+
+
+def test_update_stations_status_accounting(db):
+    db.add_all(
+        [Station(station_id=i, name=f"s{i}", lat=-34.6, lon=-58.4) for i in (1, 2, 3)]
+    )
+    db.commit()
+
+    stats = refresh_status(
+        db,
+        [
+            station_status(1),
+            station_status(2),
+            station_status(3, status="END_OF_LIFE"),
+            station_status(9),
+        ],
+    )
+    assert stats == station_service.StatusRefreshStats(inserted=2, skipped=2)
+    first = snapshot.current_snapshot()
+    assert len(first) == 2 and 1 in first and 3 not in first
+
+    stats = refresh_status(db, [station_status(1), station_status(2)])
+    assert stats == station_service.StatusRefreshStats(unchanged=2)
+    assert stats.changed == 0
+    # Nothing changed, so the snapshot is kept
+    assert snapshot.current_snapshot() is first
+
+    stats = refresh_status(
+        db, [station_status(1, bikes=5), station_status(2), station_status(3)]
+    )
+    assert stats == station_service.StatusRefreshStats(
+        inserted=1, updated=1, unchanged=1
+    )
+    assert stats.changed == 2
+    assert {
+        row.station_id: row.num_bikes_available for row in db.query(StationStatus)
+    } == {1: 5, 2: 1, 3: 1}
+    assert snapshot.current_snapshot().get(1).num_bikes_available == 5
+
+
+def test_update_stations_status_unchanged_feed_loads_snapshot(db):
+    db.add(Station(station_id=1, name="s1", lat=-34.6, lon=-58.4))
+    db.add(StationStatus(**station_status(1)))
+    db.commit()
+
+    assert refresh_status(db, None) == station_service.StatusRefreshStats()
+    assert len(snapshot.current_snapshot()) == 1
+
+
+def station_info(station_id, name=None):
+    return {
+        "station_id": station_id,
+        "name": name or f"s{station_id}",
+        "lat": -34.6,
+        "lon": -58.4,
+        "address": "a",
+        "capacity": 10,
+    }
+
+
+def refresh_info(db, stations_info):
+    with mock.patch.object(
+        station_service, "fetch_stations_info", return_value=stations_info
+    ):
+        return station_service.update_stations_info(db)
+
+
+def test_update_stations_info_reports_each_removal_once(db, caplog):
+    stats = refresh_info(db, [station_info(i) for i in (1, 2, 3)])
+    assert stats == station_service.InfoRefreshStats(inserted=3)
+    refresh_status(db, [station_status(i) for i in (1, 2, 3)])
+
+    stats = refresh_info(db, [station_info(1), station_info(2, "renamed")])
+    assert stats == station_service.InfoRefreshStats(updated=1, unchanged=1, removed=1)
+    assert {row.station_id for row in db.query(StationStatus)} == {1, 2}
+    assert 3 not in snapshot.current_snapshot()
+    assert spatial.current_stations_index().get(3) is None
+
+    caplog.clear()
+    stats = refresh_info(db, [station_info(1), station_info(2, "renamed")])
+    assert stats == station_service.InfoRefreshStats(unchanged=2)
+    assert "no longer listed" not in caplog.text
+    # Removed stations are kept for the predictions that reference them
+    assert {row.station_id: row.active for row in db.query(Station)} == {
+        1: True,
+        2: True,
+        3: False,
+    }
+    # and their status is not written anymore
+    assert refresh_status(db, [station_status(3)]).skipped == 1
+
+    stats = refresh_info(db, [station_info(i) for i in (1, 3)])
+    assert stats == station_service.InfoRefreshStats(updated=1, unchanged=1, removed=1)
+    assert {row.station_id for row in db.query(Station).filter(Station.active)} == {
+        1,
+        3,
+    }
+
+
+def test_failed_status_refresh_resets_the_feed(db):
+    db.add(Station(station_id=1, name="s1", lat=-34.6, lon=-58.4))
+    db.commit()
+
+    with mock.patch.object(
+        station_service, "upsert", side_effect=RuntimeError("DB down")
+    ), mock.patch.object(station_service.STATUS_FEED, "reset") as reset:
+        with pytest.raises(RuntimeError):
+            refresh_status(db, [station_status(1)])
+    reset.assert_called_once()
+
+
+def test_nearby_stations_with_an_empty_snapshot(db):
+    refresh_info(db, [station_info(1), station_info(2)])
+    snapshot.publish_snapshot(StationsStatusSnapshot.from_rows([]))
+
+    nearby = station_service.get_nearby_stations(
+        -34.6, -58.4, 5, None, with_status=True
+    )
+    assert [station["status"] for station in nearby] == [None, None]
+
+
+def test_removed_stations_are_left_out_however_they_are_loaded(db):
+    refresh_info(db, [station_info(i) for i in (1, 2, 3)])
+    refresh_info(db, [station_info(1), station_info(2)])
+    refreshed = spatial.current_stations_index()
+
+    loaded = station_service.load_stations_index(db)
+    assert loaded is not refreshed
+    assert len(loaded) == len(refreshed) == 2
+    assert loaded.get(3) is None
+    assert [station.station_id for station in station_service.get_stations(db)] == [
+        1,
+        2,
+    ]
+    with pytest.raises(StationDoesNotExist):
+        station_service.get_station(3, db)
+
+
+@pytest.fixture
+def predictors(eta_pipeline, availability_pipeline):
+    eta = MLFlowPredictor(FrameModels.ETA, cache_size=0)
+    eta.publish(eta.load(eta_pipeline, version=1))
+    availability = MLFlowPredictor(
+        FrameModels.AVAILABILITY, probabilistic=True, cache_size=0
+    )
+    availability.publish(availability.load(availability_pipeline, version=1))
+    return eta, availability
+
+
+def grid_requests():
+    return {
+        result: CACHE_REQUESTS.labels("prediction_grid", result).value
+        for result in ("hit", "miss")
+    }
+
+
+def predict(db, predictors, station_id, user_eta):
+    """Predict for a station, returning the prediction and whether the grid hit."""
+    before = grid_requests()
+    prediction = station_service.predict(
+        station_id,
+        PredictionParams(user_eta=user_eta, user_lat=-34.6, user_lon=-58.4),
+        db,
+        *predictors,
+    )
+    after = grid_requests()
+    assert sum(after.values()) - sum(before.values()) == 1
+    return prediction, after["hit"] > before["hit"]
+
+
+def predict_live(db, predictors, station_id, user_eta):
+    published = grid.current_grid()
+    grid.publish_grid(None)
+    try:
+        return predict(db, predictors, station_id, user_eta)[0]
+    finally:
+        grid.publish_grid(published)
+
+
+def assert_same_prediction(prediction, expected):
+    assert prediction.bike_eta == pytest.approx(expected.bike_eta)
+    assert prediction.bike_availability_probability == pytest.approx(
+        expected.bike_availability_probability
+    )
+    assert prediction.eta_model_version == expected.eta_model_version
+    assert prediction.availability_model_version == expected.availability_model_version
+
+
+NOW = datetime(2026, 10, 14, 9, 30)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+@pytest.fixture
+def in_service(db, monkeypatch):
+    """Stations 1 to 3 in service, at a fixed time so grids don't expire."""
+    monkeypatch.setattr(station_service, "datetime", FrozenDatetime)
+    refresh_info(db, [station_info(i) for i in (1, 2, 3)])
+    refresh_status(db, [station_status(i, bikes=i) for i in (1, 2, 3)])
+
+
+@pytest.mark.usefixtures("in_service")
+def test_prediction_grid_matches_live_inference(db, predictors):
+    published = station_service.update_prediction_grid(*predictors)
+    assert grid.current_grid() is published
+    assert len(published) == 3 * len(station_service.GRID_USER_ETAS)
+
+    for station_id in (1, 2, 3):
+        for user_eta in (0, 15, 30):
+            prediction, hit = predict(db, predictors, station_id, user_eta)
+            assert hit
+            assert_same_prediction(
+                prediction, predict_live(db, predictors, station_id, user_eta)
+            )
+
+    # User ETAs out of the grid are scored live
+    for user_eta in (-1, 31):
+        prediction, hit = predict(db, predictors, 1, user_eta)
+        assert not hit
+        assert_same_prediction(prediction, predict_live(db, predictors, 1, user_eta))
+
+
+@pytest.mark.usefixtures("in_service")
+def test_prediction_grid_valid_for(predictors):
+    published = station_service.update_prediction_grid(*predictors)
+    current = snapshot.current_snapshot()
+
+    assert published.valid_for(current, NOW, 1, 1)
+    # An equal snapshot published later is a new status refresh
+    assert not published.valid_for(
+        StationsStatusSnapshot.from_rows(
+            [station_status(i, bikes=i) for i in (1, 2, 3)]
+        ),
+        NOW,
+        1,
+        1,
+    )
+    assert not published.valid_for(None, NOW, 1, 1)
+    assert not published.valid_for(current, NOW + timedelta(hours=1), 1, 1)
+    assert not published.valid_for(current, NOW + timedelta(days=1), 1, 1)
+    assert not published.valid_for(current, NOW, 2, 1)
+    assert not published.valid_for(current, NOW, 1, 2)
+
+
+@pytest.mark.usefixtures("in_service")
+def test_stale_prediction_grid_is_not_used(db, predictors, eta_pipeline):
+    station_service.update_prediction_grid(*predictors)
+    assert predict(db, predictors, 1, 5)[1]
+
+    refresh_status(db, [station_status(i, bikes=i + 1) for i in (1, 2, 3)])
+    prediction, hit = predict(db, predictors, 1, 5)
+    assert not hit
+    assert prediction.eta_features["num_bikes_available"] == 2
+    assert_same_prediction(prediction, predict_live(db, predictors, 1, 5))
+
+    station_service.update_prediction_grid(*predictors)
+    assert predict(db, predictors, 1, 5)[1]
+
+    eta, _ = predictors
+    eta.publish(eta.load(eta_pipeline, version=2))
+    prediction, hit = predict(db, predictors, 1, 5)
+    assert not hit
+    assert prediction.eta_model_version == 2
+
+
+@pytest.mark.usefixtures("in_service")
+def test_stations_missing_from_the_grid_are_scored_live(db, predictors):
+    published = station_service.update_prediction_grid(*predictors)
+    lookup = published.lookup
+
+    def lookup_without_station_2(station_id, user_eta):
+        return None if station_id == 2 else lookup(station_id, user_eta)
+
+    with mock.patch.object(published, "lookup", lookup_without_station_2):
+        assert predict(db, predictors, 1, 5)[1]
+        prediction, hit = predict(db, predictors, 2, 5)
+
+    assert not hit
+    assert_same_prediction(prediction, predict_live(db, predictors, 2, 5))
+    assert published.lookup(99, 5) is None
+
+
+class ListWriter:
+    def __init__(self):
+        self.predictions = []
+
+    def put(self, prediction):
+        self.predictions.append(prediction)
+
+
+@pytest.mark.usefixtures("in_service")
+def test_batch_predictions_endpoint(db, predictors):
+    eta, availability = predictors
+    writer = ListWriter()
+    app = FastAPI()
+    app.include_router(stations_router)
+    app.dependency_overrides[get_eta_predictor] = lambda: eta
+    app.dependency_overrides[get_availability_predictor] = lambda: availability
+    app.dependency_overrides[get_prediction_writer] = lambda: writer
+    params = {"user_eta": 5, "user_lat": -34.6, "user_lon": -58.4}
+
+    predict_many = LoadedModel.predict_many
+    with mock.patch.object(
+        LoadedModel, "predict_many", autospec=True, side_effect=predict_many
+    ) as scorer:
+        response = TestClient(app).post(
+            "/stations/predictions",
+            json={"station_ids": [2, 99, 1, 2, 3, 1], **params},
+        )
+
+    assert response.status_code == 200
+    # Unknown stations are skipped and repeated ones predicted once
+    predictions = response.json()
+    assert [p["station_id"] for p in predictions] == [2, 1, 3]
+    assert [call.args[0] for call in scorer.call_args_list] == [
+        eta.current(),
+        availability.current(),
+    ]
+    assert len(writer.predictions) == 3
+
+    for prediction in predictions:
+        expected = station_service.predict(
+            prediction["station_id"],
+            PredictionParams(**params),
+            None,
+            eta,
+            availability,
+            prediction_writer=writer,
+        )
+        assert prediction["bike_eta"] == pytest.approx(expected.bike_eta)
+        assert prediction["bike_availability_probability"] == pytest.approx(
+            expected.bike_availability_probability
+        )
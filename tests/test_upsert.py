@@ -0,0 +1,65 @@
+from unittest import mock
+
+from sqlalchemy.dialects import postgresql
+
+from frame.models.base import upsert
+from frame.models import Station, base
+
+
+def station(station_id, name):
+    return {
+        "station_id": station_id,
+        "name": name,
+        "lat": -34.6,
+        "lon": -58.4,
+        "address": "a",
+        "capacity": 10,
+    }
+
+
+def stored(db):
+    return {
+        row.station_id: row.name for row in db.query(Station).order_by("station_id")
+    }
+
+
+def test_upsert_sqlite_inserts_and_updates_in_batches(db):
+    upsert(db, Station.__table__, [station(i, "old") for i in range(3)], ["station_id"])
+    rows = [station(i, "new") for i in range(1, 6)]
+    upsert(db, Station.__table__, rows, ["station_id"], batch_size=2)
+    db.commit()
+
+    assert stored(db) == {0: "old", 1: "new", 2: "new", 3: "new", 4: "new", 5: "new"}
+
+
+def test_upsert_postgres_statement():
+    db = mock.Mock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+
+    upsert(
+        db, Station.__table__, [station(i, "s") for i in range(3)], ["station_id"], 2
+    )
+
+    statements = [
+        str(call.args[0].compile(dialect=postgresql.dialect()))
+        for call in db.execute.call_args_list
+    ]
+    assert len(statements) == 2
+    for statement in statements:
+        assert "ON CONFLICT (station_id) DO UPDATE SET" in statement
+        assert "name = excluded.name" in statement
+        assert "station_id = excluded" not in statement
+
+
+def test_upsert_falls_back_to_merging_rows(db):
+    upsert(db, Station.__table__, [station(1, "old")], ["station_id"])
+    with mock.patch.dict(base.DIALECT_INSERTS, clear=True):
+        upsert(
+            db,
+            Station.__table__,
+            [station(1, "new"), station(2, "new")],
+            ["station_id"],
+        )
+    db.commit()
+
+    assert stored(db) == {1: "new", 2: "new"}